@@ -6,14 +6,18 @@ parent_dir = os.path.dirname(current_dir)
 if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
     
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from contextlib import asynccontextmanager
+import json
 import logging
+import secrets
 import time
 import uvicorn
 
 from app.core.config import get_settings, initialize_settings
+from insight_automation.utils.report_cache import get_report_cache
 
 settings = initialize_settings()
 
@@ -114,6 +118,95 @@ async def health_check():
     
     return health_info
 
+@app.get("/metrics")
+def metrics():
+    from insight_automation.metrics import prometheus_metrics
+
+    body, content_type = prometheus_metrics()
+    return Response(content=body, media_type=content_type)
+
+def require_internal_api_key(x_internal_api_key: str | None = Header(None)):
+    """
+    유료 LLM 호출을 일으키는 엔드포인트 보호 (X-Internal-API-Key == INTERNAL_API_KEY)
+    키가 설정되지 않았으면 개발 환경에서만 통과, 프로덕션은 거부
+    """
+    if not settings.internal_api_key:
+        if settings.is_production:
+            raise HTTPException(status_code=503, detail="internal API key is not configured")
+        return
+    if not x_internal_api_key or not secrets.compare_digest(x_internal_api_key, settings.internal_api_key):
+        raise HTTPException(status_code=401, detail="invalid internal API key")
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.get("/insights/{cafe_id}/stream", dependencies=[Depends(require_internal_api_key)])
+def stream_insight(cafe_id: int, use_mock: bool = False):
+    """
+    카페 월간 인사이트를 SSE로 스트리밍
+    start → indicators → token... → result (실패 시 error) 순서로 이벤트 전송
+    """
+    def events():
+        # 첫 바이트는 KPI/트렌드 조회 전에 바로 전송
+        yield _sse("start", {"cafeId": cafe_id})
+        try:
+            # LLM 클라이언트(openai)는 이 엔드포인트에서만 필요 → 앱 시작(/health 등)이 LLM 설정에 묶이지 않게 지연 import
+            from insight_automation.logic.sources.insight_monthly import stream_monthly_insight
+
+            for event, data in stream_monthly_insight(cafe_id, use_mock=use_mock):
+                yield _sse(event, data)
+        except Exception as e:
+            logger.exception(f"인사이트 스트리밍 실패 (cafe_id={cafe_id})")
+            yield _sse("error", {"cafeId": cafe_id, "reason": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def _etag_matches(if_none_match: str | None, etag: str | None) -> bool:
+    if not if_none_match or not etag:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+@app.get("/reports")
+def get_reports_bulk(period: str, cafe_ids: str = Query(..., alias="cafeIds")):
+    """
+    여러 카페의 같은 기간 보고서를 병렬 조회 (cafeIds=1,2,3)
+    없는 카페는 null
+    """
+    try:
+        ids = [int(c) for c in cafe_ids.split(",") if c.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="cafeIds must be comma separated integers")
+
+    results = get_report_cache().get_many(ids, period)
+    return {
+        "period": period,
+        "reports": {str(cafe_id): item["report"] if item else None for cafe_id, item in results.items()},
+    }
+
+@app.get("/reports/{cafe_id}")
+def list_reports(cafe_id: int):
+    return {"cafeId": cafe_id, "periods": get_report_cache().list_periods(cafe_id)}
+
+@app.get("/reports/{cafe_id}/{period}")
+def get_report(cafe_id: int, period: str, request: Request):
+    """
+    보고서 1건 조회 (ETag 헤더 포함)
+    If-None-Match 가 현재 ETag 와 같으면 본문 없이 304
+    """
+    item = get_report_cache().get(cafe_id, period)
+    if item is None:
+        raise HTTPException(status_code=404, detail="report not found")
+
+    headers = {"ETag": item["etag"]} if item["etag"] else {}
+    if _etag_matches(request.headers.get("if-none-match"), item["etag"]):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(item["report"], headers=headers)
+
 if not settings.is_production:
     @app.get("/test")
     async def test_endpoint():
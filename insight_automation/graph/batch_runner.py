@@ -0,0 +1,326 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from insight_automation.graph.monthly_graph import build_graph, GState
+from insight_automation.logic.build_insight_from_data import (
+    INSIGHT_TREND_MAX_ITEMS, collect_insights_batch, submit_insights_batch
+)
+from insight_automation.logic.recommendation_rules import cafes_needing_llm, classify_cafes
+from insight_automation.logic.sources.insight_monthly import get_monthly_indicators
+from insight_automation.logic.template_insight import INSIGHT_MODE
+from insight_automation.logic.sources.perplexity import (
+    get_trending_menu_info, get_popular_cafe_features
+)
+from insight_automation.utils.athena import fetch_monthly_metrics_batch
+from insight_automation.utils.storage import (
+    INSIGHT_STORAGE_LAYOUT, batch_job_key, delete_batch_job, existing_report_ids, flush_bundle_staging,
+    list_batch_jobs, load_batch_job, save_batch_job, save_reports_to_s3,
+)
+from insight_automation.utils.trend_cache import warm_trend_cache
+
+# 동시에 그래프를 실행할 카페 수 (LLM/Perplexity rate limit 고려)
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+
+
+def select_cafe_ids(
+    candidates: List[int],
+    cafe_id_range: Optional[Tuple[int, int]] = None,
+    shard_index: Optional[int] = None,
+    shard_count: Optional[int] = None,
+) -> List[int]:
+    """
+    후보 카페 중 이번 실행 대상만 선택
+    - cafe_id_range: (lo, hi) 양 끝 포함
+    - shard_index/shard_count: cafe_id % shard_count == shard_index (목록 순서와 무관하게 안정적)
+    """
+    ids = sorted({int(c) for c in candidates})
+    if cafe_id_range is not None:
+        lo, hi = cafe_id_range
+        ids = [c for c in ids if lo <= c <= hi]
+    if shard_count:
+        ids = [c for c in ids if c % shard_count == (shard_index or 0)]
+    return ids
+
+
+def _run_one(graph, state: GState) -> Dict[str, Any]:
+    try:
+        out = graph.invoke(state)
+    except Exception as e:
+        print(f"❌ cafe {state.cafeId} graph failed: {e}")
+        return {"cafeId": state.cafeId, "status": "failed", "error": str(e), "logs": []}
+
+    logs = out.get("logs", [])
+    report = out.get("report") or {}
+    if "report:stored" in logs:
+        status = "succeeded"
+    elif "report:exists" in logs:
+        status = "skipped"  # overwrite=False 이고 이미 보고서가 있음 → 기존 것 유지
+    elif report.get("error"):
+        status = "failed"
+    else:
+        status = "skipped"  # 지표 없음 → 합성 생략
+    result = {"cafeId": state.cafeId, "status": status, "logs": logs}
+    period = (out.get("indicators") or {}).get("month")
+    if period:
+        result["period"] = period
+    if report.get("error"):
+        result["error"] = report["error"]
+    return result
+
+
+def _plan_insight_modes(
+    targets: List[int], indicators: Dict[int, Dict[str, Any]], insight_mode: str
+) -> Dict[int, Tuple[str, Optional[str]]]:
+    """
+    전체 카페 KPI를 규칙 표로 한 번에 분류 → {cafe_id: (insightMode, 추천 문구)}
+    auto 모드에서는 부정적 신호가 없는 카페는 LLM 없이 템플릿 (LLM 예산은 신호가 있는 카페에만)
+    지표가 없는 카페(목 데이터 등)는 그래프에서 조회하므로 분류하지 않음
+    """
+    classified = classify_cafes({c: indicators[c].get("kpis", {}) for c in targets if c in indicators})
+    needs_llm = set(cafes_needing_llm(classified))
+    plan = {}
+    for cafe_id in targets:
+        if cafe_id not in classified:
+            plan[cafe_id] = (insight_mode, None)
+            continue
+        mode = "template" if insight_mode == "auto" and cafe_id not in needs_llm else insight_mode
+        plan[cafe_id] = (mode, classified[cafe_id]["text"])
+    if insight_mode == "auto" and classified:
+        print(f"🧭 규칙 분류: {len(classified)}개 중 {len(needs_llm)}개만 LLM")
+    return plan
+
+
+def _shared_trends() -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """그래프 fetch_menus/fetch_features 와 같은 기준으로 트렌드 조회 (전 카페 공용)"""
+    try:
+        menus = [m.model_dump() for m in get_trending_menu_info()[:INSIGHT_TREND_MAX_ITEMS]]
+    except Exception as e:
+        print(f"⚠️ menu trends failed: {e}")
+        menus = [{"menu": "데이터 없음"}]
+    try:
+        features = [f.model_dump() for f in get_popular_cafe_features()[:INSIGHT_TREND_MAX_ITEMS]]
+    except Exception as e:
+        print(f"⚠️ feature trends failed: {e}")
+        features = [{"feature": "데이터 없음"}]
+    return menus, features
+
+
+def _submit_offline(
+    targets: List[int],
+    indicators: Dict[int, Dict[str, Any]],
+    overwrite: bool,
+    use_mock: bool,
+) -> List[Dict[str, Any]]:
+    """
+    LLM 호출을 OpenAI Batch 작업 하나로 모아 제출만 하고 바로 반환 (Lambda 실행 시간 제한)
+    보고서 조립/저장에 필요한 카페별 월·KPI 는 S3 작업 기록에 남기고 collect_monthly_batch 에서 이어서 처리
+    overwrite=False 면 이미 보고서가 있는 카페는 요청에서 빼고 생략 (저장되지 않을 응답에 비용을 쓰지 않음)
+    """
+    menus, features = _shared_trends()
+    if use_mock:
+        indicators = {cafe_id: get_monthly_indicators(cafe_id, use_mock=True) for cafe_id in targets}
+
+    results: List[Dict[str, Any]] = []
+    inputs = {}
+    for cafe_id in targets:
+        ind = indicators.get(cafe_id)
+        if not ind:
+            results.append({"cafeId": cafe_id, "status": "skipped", "logs": []})
+            continue
+        inputs[cafe_id] = (ind.get("kpis", {}), ind.get("month", ""), menus, features)
+
+    if not overwrite and inputs:
+        by_month: Dict[str, List[int]] = {}
+        for cafe_id, (_, month, _, _) in inputs.items():
+            by_month.setdefault(month, []).append(cafe_id)
+        for month, cafe_ids in by_month.items():
+            for cafe_id in sorted(existing_report_ids(cafe_ids, month)):
+                del inputs[cafe_id]
+                results.append({"cafeId": cafe_id, "status": "skipped", "logs": ["report:exists"]})
+    if not inputs:
+        return results
+
+    try:
+        batch_id, structured = submit_insights_batch(inputs)
+        save_batch_job(batch_id, {
+            "batchId": batch_id,
+            "createdAt": int(time.time()),
+            "overwrite": overwrite,
+            "structured": structured,
+            "cafes": {
+                str(cafe_id): {"month": indicators[cafe_id].get("month"), "kpis": indicators[cafe_id].get("kpis", {})}
+                for cafe_id in inputs
+            },
+        })
+    except Exception as e:
+        print(f"❌ OpenAI batch submit failed: {e}")
+        return results + [{"cafeId": cafe_id, "status": "failed", "error": str(e), "logs": []} for cafe_id in inputs]
+
+    return results + [
+        {"cafeId": cafe_id, "status": "submitted", "batchId": batch_id, "logs": ["batch:submitted"]}
+        for cafe_id in inputs
+    ]
+
+
+def _collect_one(batch_id: str) -> List[Dict[str, Any]]:
+    job = load_batch_job(batch_id)
+    if job is None:
+        print(f"⚠️ Unknown batch job: {batch_id}")
+        return []
+    cafes = {int(cafe_id): info for cafe_id, info in job["cafes"].items()}
+    try:
+        reports = collect_insights_batch(batch_id, list(cafes), structured=job.get("structured", False))
+    except Exception as e:
+        print(f"❌ OpenAI batch collect failed ({batch_id}): {e}")
+        return [{"cafeId": cafe_id, "status": "pending", "batchId": batch_id, "error": str(e), "logs": []} for cafe_id in cafes]
+    if reports is None:
+        return [{"cafeId": cafe_id, "status": "pending", "batchId": batch_id, "logs": []} for cafe_id in cafes]
+
+    results: List[Dict[str, Any]] = []
+    to_save = []
+    # 요청 실패(오류 응답 / 결과 파일에 없음): 다시 수집해도 같으므로 작업 기록의 failed 로 옮김
+    failed = dict(job.get("failed", {}))
+    for cafe_id, info in cafes.items():
+        report = reports.get(cafe_id)
+        if report is None:
+            error = "batch request failed or missing from output"
+            failed[str(cafe_id)] = {**info, "error": error}
+            results.append({"cafeId": cafe_id, "status": "failed", "batchId": batch_id, "error": error, "logs": []})
+            continue
+        report = {**report, "month": info.get("month"), "kpis": info.get("kpis", {}), "insightKpis": info.get("kpis", {})}
+        to_save.append((cafe_id, info.get("month"), report))
+
+    # 저장 실패: 배치 결과 파일은 OpenAI 에 남아 있으므로 작업 기록에 남겨 다음 수집에서 다시 저장
+    retry = {}
+    for saved in save_reports_to_s3(to_save, overwrite=job.get("overwrite", True)):
+        if saved["status"] == "failed":
+            retry[str(saved["cafeId"])] = cafes[saved["cafeId"]]
+            results.append({"cafeId": saved["cafeId"], "status": "failed", "batchId": batch_id, "error": saved["error"], "logs": []})
+        elif saved["status"] == "uploaded":
+            results.append({"cafeId": saved["cafeId"], "status": "succeeded", "logs": ["report:stored"]})
+        else:
+            results.append({"cafeId": saved["cafeId"], "status": "skipped", "logs": ["report:exists"]})
+
+    if retry:
+        save_batch_job(batch_id, {**job, "cafes": retry, "failed": failed})
+        return results
+    if failed:
+        # 수집은 끝났지만 실패한 카페가 있음 → 목록에서 빼고 _failed 아래에 남김 (조용히 사라지지 않게)
+        save_batch_job(batch_id, {**job, "cafes": {}, "failed": failed}, failed=True)
+        print(f"⚠️ batch {batch_id}: {len(failed)}개 카페 요청 실패 → {batch_job_key(batch_id, failed=True)}")
+    delete_batch_job(batch_id)
+    return results
+
+
+def _summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "total": len(results),
+        "succeeded": sum(r["status"] == "succeeded" for r in results),
+        "failed": sum(r["status"] == "failed" for r in results),
+        "skipped": sum(r["status"] == "skipped" for r in results),
+        # batch 모드: 제출됨 / 아직 진행 중 (collect_monthly_batch 로 다시 수집)
+        "pending": sum(r["status"] in ("submitted", "pending") for r in results),
+        "results": results,
+    }
+
+
+def collect_monthly_batch(batch_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    llm_mode="batch" 로 제출한 작업을 한 번씩 조회해 끝난 작업의 보고서를 저장
+    - batch_id 미지정 시 S3 에 기록된 대기 중 작업 전체
+    - 진행 중인 작업은 pending 으로 남고 다음 호출(스케줄)에서 다시 조회
+    """
+    batch_ids = [batch_id] if batch_id else list_batch_jobs()
+    results = [r for b in batch_ids for r in _collect_one(b)]
+    summary = _summarize(results)
+    print(f"📥 배치 수집: 작업 {len(batch_ids)}개, {summary['succeeded']} 성공 / {summary['failed']} 실패 / {summary['pending']} 대기")
+    return summary
+
+
+def _flush_staged(results: List[Dict[str, Any]]) -> None:
+    """그래프가 스테이징한 보고서를 기간 번들에 한 번에 병합 (이번 배치가 기록한 기간만), 병합 실패한 카페는 failed 로 표시"""
+    periods = sorted({r["period"] for r in results if r["status"] == "succeeded" and r.get("period")})
+    flushed: List[Dict[str, Any]] = []
+    for period in periods:
+        try:
+            flushed += flush_bundle_staging(period)
+        except Exception as e:
+            print(f"❌ Bundle flush failed ({period}): {e}")
+            flushed += [
+                {"cafeId": r["cafeId"], "status": "failed", "error": str(e)}
+                for r in results if r["status"] == "succeeded" and r.get("period") == period
+            ]
+    errors = {f["cafeId"]: f.get("error") for f in flushed if f["status"] == "failed"}
+    for result in results:
+        if result["cafeId"] in errors and result["status"] == "succeeded":
+            result["status"] = "failed"
+            result["error"] = errors[result["cafeId"]]
+
+
+def run_monthly_batch(
+    cafe_ids: Optional[List[int]] = None,
+    cafe_id_range: Optional[Tuple[int, int]] = None,
+    shard_index: Optional[int] = None,
+    shard_count: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+    overwrite: bool = True,
+    use_mock: bool = False,
+    llm_mode: str = "sync",
+    insight_mode: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    여러 카페의 월간 인사이트 그래프를 제한된 동시성으로 실행
+    - 그래프는 한 번만 컴파일, 트렌드 캐시는 시작 시 1회 채워 모든 카페가 공유
+    - KPI는 fetch_monthly_metrics_batch 한 번으로 조회해 각 카페 상태에 미리 채움
+      (cafe_ids 미지정 시 데이터가 있는 전체 카페가 후보, 샤드마다 같은 쿼리라
+       ATHENA_RESULT_REUSE_MINUTES 설정 시 결과 재사용, 이때 Athena 가 실패하면 RuntimeError)
+    - llm_mode="batch": 카페별 그래프 대신 OpenAI Batch 작업 하나를 제출만 하고 반환
+      (완료된 결과는 collect_monthly_batch 로 수집해 저장, 결과는 pending 으로 집계)
+    - insight_mode: 그래프 경로의 카페별 생성 방식 (llm | template | auto, 기본값 INSIGHT_MODE)
+      KPI는 logic/recommendation_rules.classify_cafes 로 전체를 한 번에 분류,
+      auto 에서는 부정적 신호가 있는 카페만 LLM (나머지는 템플릿)
+    반환: 카페별 성공/실패/생략 요약
+    """
+    try:
+        warm_trend_cache()
+    except Exception as e:
+        print(f"⚠️ Trend cache warm failed: {e}")
+
+    indicators: Dict[int, Dict[str, Any]] = {}
+    if use_mock:
+        candidates = cafe_ids or (list(range(cafe_id_range[0], cafe_id_range[1] + 1)) if cafe_id_range else [])
+        targets = select_cafe_ids(candidates, cafe_id_range, shard_index, shard_count)
+    elif cafe_ids is not None:
+        targets = select_cafe_ids(cafe_ids, cafe_id_range, shard_index, shard_count)
+        indicators = fetch_monthly_metrics_batch(targets)
+    else:
+        indicators = fetch_monthly_metrics_batch(None)
+        targets = select_cafe_ids(list(indicators), cafe_id_range, shard_index, shard_count)
+
+    print(f"▶️ 월간 인사이트 배치 시작: {len(targets)}개 카페 (llm_mode={llm_mode})")
+    if llm_mode == "batch":
+        results = _submit_offline(targets, indicators, overwrite, use_mock)
+    else:
+        graph = build_graph()
+        plan = _plan_insight_modes(targets, indicators, insight_mode or INSIGHT_MODE)
+        states = [
+            GState(
+                cafeId=cafe_id,
+                overwrite=overwrite,
+                useMock=use_mock,
+                indicators=indicators.get(cafe_id),
+                insightMode=plan[cafe_id][0],
+                recommendation=plan[cafe_id][1],
+            )
+            for cafe_id in targets
+        ]
+        with ThreadPoolExecutor(max_workers=max_concurrency or BATCH_MAX_CONCURRENCY) as pool:
+            results = list(pool.map(lambda s: _run_one(graph, s), states))
+        if INSIGHT_STORAGE_LAYOUT == "bundle":
+            _flush_staged(results)
+
+    summary = _summarize(results)
+    print(f"✅ 배치 완료: {summary['succeeded']} 성공 / {summary['failed']} 실패 / {summary['skipped']} 생략 / {summary['pending']} 대기")
+    return summary
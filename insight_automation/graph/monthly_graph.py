@@ -1,10 +1,11 @@
+import operator
 from dataclasses import dataclass, field
-from typing import Any, Dict, List
-from langgraph.graph import StateGraph, END
+from typing import Annotated, Any, Dict, List
+from langgraph.graph import StateGraph, START, END
 
-from insight_automation.logic.sources.insight_monthly import (
-    get_monthly_indicators, synthesize_monthly_insight
-)
+from insight_automation.logic.build_insight_from_data import INSIGHT_TREND_MAX_ITEMS
+from insight_automation.logic.template_insight import INSIGHT_MODE, synthesize_insight
+from insight_automation.logic.sources.insight_monthly import get_monthly_indicators
 from insight_automation.logic.sources.perplexity import (
     get_trending_menu_info, get_popular_cafe_features
 )
@@ -14,62 +15,91 @@ from insight_automation.utils.storage import save_report_to_s3 # type: ignore
 class GState:
     cafeId: int
     overwrite: bool = False
+    useMock: bool = True
+    # "llm" | "template" | "auto" (logic/template_insight.py)
+    insightMode: str = INSIGHT_MODE
+    # 배치에서 전체 카페 규칙 평가(classify_cafes)로 미리 만든 추천 문구 (템플릿 경로에서 사용)
+    recommendation: str | None = None
     indicators: Dict[str, Any] | None = None
     menus: List[Any] = field(default_factory=list)
     features: List[Any] = field(default_factory=list)
     report: Dict[str, Any] | None = None
-    logs: List[str] = field(default_factory=list)
+    # 병렬 브랜치가 동시에 기록하므로 리스트를 이어 붙이는 reducer 사용
+    logs: Annotated[List[str], operator.add] = field(default_factory=list)
+
+# 병렬 브랜치에서 실행되는 노드는 자기 필드만 부분 업데이트로 반환
 
-def fetch_indicators(state: GState) -> GState:
-    state.indicators = get_monthly_indicators(state.cafeId)
-    state.logs.append("indicators:fetched")
-    return state
+def fetch_indicators(state: GState) -> Dict[str, Any]:
+    # 배치 실행 시 한 번의 쿼리로 미리 채워 둔 지표는 다시 조회하지 않음
+    if state.indicators is not None:
+        return {"logs": ["indicators:prefetched"]}
+    return {
+        "indicators": get_monthly_indicators(state.cafeId, use_mock=state.useMock),
+        "logs": ["indicators:fetched"],
+    }
+
+def fetch_menus(state: GState) -> Dict[str, Any]:
+    try:
+        menus = [m.model_dump() for m in get_trending_menu_info()[:INSIGHT_TREND_MAX_ITEMS]]
+        return {"menus": menus, "logs": ["menus:fetched"]}
+    except Exception as e:
+        return {"menus": [{"menu": "데이터 없음"}], "logs": [f"menus:failed:{e}"]}
 
-def fetch_trends(state: GState) -> GState:
+def fetch_features(state: GState) -> Dict[str, Any]:
     try:
-        state.menus = get_trending_menu_info()[:3]
-        state.features = get_popular_cafe_features()[:3]
-        state.logs.append("trends:fetched")
+        features = [f.model_dump() for f in get_popular_cafe_features()[:INSIGHT_TREND_MAX_ITEMS]]
+        return {"features": features, "logs": ["features:fetched"]}
     except Exception as e:
-        state.logs.append(f"trends:failed:{e}")
-        state.menus = [{"menu": "데이터 없음"}]
-        state.features = [{"feature": "데이터 없음"}]
-    return state
+        return {"features": [{"feature": "데이터 없음"}], "logs": [f"features:failed:{e}"]}
+
+def join_fetches(state: GState) -> Dict[str, Any]:
+    # 세 브랜치가 모두 끝난 뒤 한 번만 실행되는 합류 지점
+    return {}
 
-def synthesize_and_store(state: GState) -> GState:
+def synthesize_and_store(state: GState) -> Dict[str, Any]:
     try:
-        state.report = synthesize_monthly_insight(
+        # llm: 이전 보고서와 KPI를 비교해 재사용 / 변경분만 / 전체 생성 중 선택
+        # template / auto: 규칙 기반 템플릿 (auto는 LLM이 느리거나 예산 초과 시)
+        report = synthesize_insight(
+            cafe_id=state.cafeId,
             indicators=state.indicators or {},
             menus=state.menus or [],
             features=state.features or [],
+            mode=state.insightMode,
+            recommendation=state.recommendation,
         )
-        save_report_to_s3(
+        stored = save_report_to_s3(
             cafe_id=state.cafeId,
-            period=state.report["period"],
-            payload=state.report,
+            period=(state.indicators or {}).get("month"),
+            payload=report,
             overwrite=state.overwrite
         )
-        state.logs.append("report:stored")
+        # overwrite=False 에서 조건부 PUT 이 거절되면 기존 보고서가 그대로 남음
+        return {"report": report, "logs": ["report:stored" if stored else "report:exists"]}
     except Exception as e:
-        state.logs.append(f"report:failed:{e}")
-        state.report = {"error": str(e)}
-    return state
+        return {"report": {"error": str(e)}, "logs": [f"report:failed:{e}"]}
 
 def build_graph():
     g = StateGraph(GState)
     g.add_node("fetch_indicators", fetch_indicators)
-    g.add_node("fetch_trends", fetch_trends)
+    g.add_node("fetch_menus", fetch_menus)
+    g.add_node("fetch_features", fetch_features)
+    g.add_node("join_fetches", join_fetches)
     g.add_node("synthesize_and_store", synthesize_and_store)
 
-    g.set_entry_point("fetch_indicators")
+    # Athena 지표와 Perplexity 트렌드는 서로 독립 → 동시에 실행
+    for node in ("fetch_indicators", "fetch_menus", "fetch_features"):
+        g.add_edge(START, node)
+    g.add_edge(["fetch_indicators", "fetch_menus", "fetch_features"], "join_fetches")
 
     def has_indicators(state: GState) -> bool:
         return bool(state.indicators)
 
-    g.add_edge("fetch_indicators", "fetch_trends", condition=has_indicators)
-    g.add_edge("fetch_indicators", END, condition=lambda s: not has_indicators(s))
-
-    g.add_edge("fetch_trends", "synthesize_and_store")
+    g.add_conditional_edges(
+        "join_fetches",
+        has_indicators,
+        {True: "synthesize_and_store", False: END},
+    )
     g.add_edge("synthesize_and_store", END)
 
     return g.compile()
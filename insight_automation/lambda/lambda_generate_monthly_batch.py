@@ -0,0 +1,54 @@
+import json
+from datetime import datetime
+from insight_automation.graph.batch_runner import collect_monthly_batch, run_monthly_batch
+
+def lambda_handler(event, context):
+    """
+    여러 카페 월간 인사이트 일괄 생성
+    event 예시:
+      {"cafeIds": [1, 2, 3]}
+      {"cafeIdRange": [1, 500]}
+      {"shardIndex": 0, "shardCount": 8}
+      (공통 옵션) "maxConcurrency": 4, "overwrite": true, "useMock": false,
+                "llmMode": "sync" | "batch" (OpenAI Batch 작업을 제출만 하고 반환),
+                "insightMode": "llm" | "template" | "auto" (LLM 지연/예산 초과 시 템플릿)
+      {"action": "collect"}                    제출된 OpenAI Batch 작업 수집 (주기적으로 실행)
+      {"action": "collect", "batchId": "..."}  특정 작업만 수집
+    """
+    event = event or {}
+    cafe_id_range = event.get("cafeIdRange")
+
+    # 현재 연월 (예: 2025-08)
+    month_str = datetime.utcnow().strftime("%Y-%m")
+
+    if event.get("action") == "collect":
+        summary = collect_monthly_batch(event.get("batchId"))
+        return {
+            "statusCode": 200 if summary["failed"] == 0 else 207,
+            "body": json.dumps({"month": month_str, **summary}, ensure_ascii=False),
+        }
+
+    try:
+        summary = run_monthly_batch(
+            cafe_ids=event.get("cafeIds"),
+            cafe_id_range=tuple(cafe_id_range) if cafe_id_range else None,
+            shard_index=event.get("shardIndex"),
+            shard_count=event.get("shardCount"),
+            max_concurrency=event.get("maxConcurrency"),
+            overwrite=event.get("overwrite", True),
+            use_mock=event.get("useMock", False),
+            llm_mode=event.get("llmMode", "sync"),
+            insight_mode=event.get("insightMode"),
+        )
+    except Exception as e:
+        # 대상 카페 조회(Athena) 실패 등 배치 자체가 돌지 못함 → 성공처럼 보이지 않게 오류로 반환
+        print(f"❌ 월간 인사이트 배치 실패: {e}")
+        return {
+            "statusCode": 502,
+            "body": json.dumps({"month": month_str, "error": str(e)}, ensure_ascii=False),
+        }
+
+    return {
+        "statusCode": 200 if summary["failed"] == 0 else 207,
+        "body": json.dumps({"month": month_str, **summary}, ensure_ascii=False),
+    }
@@ -2,6 +2,10 @@ import os
 from datetime import datetime
 from langgraph.graph import END
 from insight_automation.graph.monthly_graph import build_graph, GState
+from insight_automation.utils.trend_cache import warm_on_start
+
+# 콜드 스타트 시 트렌드 캐시 미리 채우기 (TREND_CACHE_WARM_ON_START=true)
+warm_on_start()
 
 def lambda_handler(event, context):
     cafe_id = int(os.environ.get("CAFE_ID", "1"))
@@ -14,9 +18,17 @@ def lambda_handler(event, context):
         cafeId=cafe_id,
         overwrite=True
     )
-    graph.invoke(state)
+    out = graph.invoke(state)
+    logs = out.get("logs", [])
+    report = out.get("report") or {}
 
-    return {
-        "statusCode": 200,
-        "body": f"Monthly insight for {month_str} generated for cafe {cafe_id}."
-    }
+    if report.get("error"):
+        return {"statusCode": 500, "body": f"Monthly insight for {month_str} failed for cafe {cafe_id}: {report['error']}"}
+    if "report:exists" in logs:
+        body = f"Monthly insight for {month_str} already exists for cafe {cafe_id}."
+    elif "report:stored" in logs:
+        body = f"Monthly insight for {month_str} generated for cafe {cafe_id}."
+    else:
+        # 지표가 없어 합성을 건너뜀 (batch_runner 의 skipped 와 같은 경우, 오류 아님)
+        body = f"Monthly insight for {month_str} skipped for cafe {cafe_id}: no indicators."
+    return {"statusCode": 200, "body": body}
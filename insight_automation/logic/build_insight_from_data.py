@@ -1,51 +1,179 @@
-import json
-from insight_automation.utils.openai_helper import run_gpt_analysis
+import os
+from typing import Any, Iterator, List, Optional, Tuple
+from pydantic import ValidationError
+from insight_automation.logic.schemas import InsightReport, strict_json_schema
+from insight_automation.utils.jsonsafe import extract_json
+from insight_automation.utils.openai_helper import (
+    LLM_STRUCTURED_OUTPUT, SYSTEM_PROMPT,
+    json_schema_format, record_llm_output, run_gpt_analysis, stream_gpt_analysis,
+)
+from insight_automation.utils.openai_batch import collect_gpt_batch, run_gpt_batch, submit_gpt_batch
 from insight_automation.utils.text import format_with_linebreaks
+from insight_automation.utils.token_budget import compact_json, count_tokens, fit_to_budget, truncate_text
 
+# 구조화 출력 모드에서 인사이트 응답에 강제할 형식 (build_insight_prompt 의 JSON 예시와 같은 형태)
+INSIGHT_RESPONSE_FORMAT = json_schema_format("insight_report", strict_json_schema(InsightReport))
 
-def build_insight_from_data(kpis, month, menu_trends, cafe_features):
+
+def insight_response_format() -> Optional[dict]:
+    """LLM_STRUCTURED_OUTPUT 이면 INSIGHT_RESPONSE_FORMAT, 아니면 None (프롬프트로만 JSON 요청)"""
+    return INSIGHT_RESPONSE_FORMAT if LLM_STRUCTURED_OUTPUT else None
+
+
+# 모든 카페에 똑같은 지시문. 프롬프트는 (시스템 프롬프트 + 지시문 + 트렌드) 공통 접두부 뒤에 카페별 월/KPI 를 붙임
+# → 같은 배치(트렌드 공용)의 카페들은 접두부가 같아 제공자 측 프롬프트 캐시가 재사용됨
+#   (OpenAI 는 접두부가 1024토큰 이상일 때만 캐시: 지시문만으로는 ≈490토큰 추정이라 트렌드까지 포함해야 함)
+INSIGHT_INSTRUCTIONS = """당신은 카페 경영 인사이트를 제공하는 데이터 분석가입니다.
+다음 두 가지를 JSON으로 생성하세요.
+
+1. insights_text:
+- 지난달 아테나 KPI 지표를 중심으로 작성 (핵심 분석 + 실행 조언)
+- 사장님께 직접 보고하듯 자연스러운 줄글 한 단락
+- 불릿포인트, 줄바꿈 없이 이어진 문장
+- 서비스 기능 추천 반드시 포함
+- 트렌드와 모니터링 내용은 한두 문장만 덧붙여 참고 수준으로 작성
+- 한국어
+
+2. insights 배열:
+- 아테나 KPI 기반 핵심 결론(insights) 2~3개
+- 각 결론은 { "title": "짧은 요약", "detail": "구체적 설명 (수치 근거 포함)" }
+
+3. 추천할 수 있는 실행 항목과 조언은 반드시 우리 서비스에서 제공하는 기능만 사용해야 합니다.
+새로운 외부 프로그램이나 우리 서비스에 없는 기능은 절대 제안하지 마세요.
+- 제공 기능 예시: 단골 고객 용 쿠폰 발급 및 사용, 포인트 알림, 챌린지 개설 및 참여, 스탬프 적립 및 관리
+
+4. 출력은 반드시 JSON 객체 하나로만 작성하세요.
+코드블록(````json`, ```)이나 설명 문구 없이 JSON만 반환하세요.
+
+{
+"insights_text": "<아테나 KPI 중심 줄글, 끝에 트렌드/모니터링 한두 줄 첨부>",
+"insights": [
+    {"title": "주말 방문 집중", "detail": "주말 방문 비중이 60% 이상으로 집중되었습니다."},
+    {"title": "인기 메뉴", "detail": "아메리카노와 라떼 판매가 전체의 60%를 차지했습니다."}
+]
+}
+"""
+
+# 인사이트 프롬프트 전체(지시문 + 데이터) 토큰 상한: 남는 만큼만 트렌드 항목을 넣음
+INSIGHT_PROMPT_MAX_TOKENS = int(os.getenv("INSIGHT_PROMPT_MAX_TOKENS", "1500"))
+# 트렌드 목록별 최대 항목 수 / 항목 문자열 필드 최대 길이
+INSIGHT_TREND_MAX_ITEMS = int(os.getenv("INSIGHT_TREND_MAX_ITEMS", "5"))
+INSIGHT_TREND_FIELD_MAX_CHARS = int(os.getenv("INSIGHT_TREND_FIELD_MAX_CHARS", "120"))
+# 예산 중 카페별 구간(월/KPI)에 떼어 두는 토큰 수
+INSIGHT_CAFE_SECTION_TOKENS = int(os.getenv("INSIGHT_CAFE_SECTION_TOKENS", "120"))
+# OpenAI 프롬프트 캐시가 적용되는 최소 접두부 길이
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+NO_DATA = "데이터 없음"
+
+
+def rank_trend_items(
+    items: Any,
+    name_key: str,
+    max_items: Optional[int] = None,
+    field_max_chars: Optional[int] = None,
+) -> List[dict]:
     """
-    이미 준비된 데이터(kpis, month, trends)를 받아 GPT 분석 실행
+    Perplexity 트렌드 항목 → 프롬프트에 넣을 순서대로 정리한 목록
+    - 이름(name_key)이 없거나 "데이터 없음" 인 항목, 같은 이름의 중복 항목 제거
+    - 빈 필드는 빼고 긴 문자열은 field_max_chars 로 자름
+    - 채워진 필드가 많은 항목 우선 (같으면 Perplexity 응답 순서)
     """
+    max_items = INSIGHT_TREND_MAX_ITEMS if max_items is None else max_items
+    field_max_chars = INSIGHT_TREND_FIELD_MAX_CHARS if field_max_chars is None else field_max_chars
+    ranked, seen = [], set()
+    for item in items or []:
+        if hasattr(item, "model_dump"):
+            item = item.model_dump()
+        if not isinstance(item, dict):
+            continue
+        name = str(item.get(name_key) or "").strip()
+        if not name or name == NO_DATA or name.casefold() in seen:
+            continue
+        seen.add(name.casefold())
+        ranked.append({
+            key: truncate_text(value.strip(), field_max_chars) if isinstance(value, str) else value
+            for key, value in item.items()
+            if value not in (None, "") and not (isinstance(value, str) and not value.strip())
+        })
+    ranked.sort(key=len, reverse=True)
+    return ranked[:max_items]
 
-    prompt = f"""
-    당신은 카페 경영 인사이트를 제공하는 데이터 분석가입니다.
-    다음 두 가지를 JSON으로 생성하세요.
 
-    1. insights_text:
-    - 지난달 아테나 KPI 지표를 중심으로 작성 (핵심 분석 + 실행 조언)
-    - 사장님께 직접 보고하듯 자연스러운 줄글 한 단락
-    - 불릿포인트, 줄바꿈 없이 이어진 문장
-    - 서비스 기능 추천 반드시 포함
-    - 트렌드와 모니터링 내용은 한두 문장만 덧붙여 참고 수준으로 작성
-    - 한국어
+def _trend_section(menu_trends, cafe_features) -> str:
+    return (
+        "\n[트렌드 참고 자료]\n"
+        f"- 메뉴 트렌드: {compact_json(menu_trends) if menu_trends else NO_DATA}\n"
+        f"- 인기 카페 특징: {compact_json(cafe_features) if cafe_features else NO_DATA}\n"
+    )
 
-    2. insights 배열:
-    - 아테나 KPI 기반 핵심 결론(insights) 2~3개
-    - 각 결론은 {{ "title": "짧은 요약", "detail": "구체적 설명 (수치 근거 포함)" }}
 
-    3. 추천할 수 있는 실행 항목과 조언은 반드시 우리 서비스에서 제공하는 기능만 사용해야 합니다.
-    새로운 외부 프로그램이나 우리 서비스에 없는 기능은 절대 제안하지 마세요.
-    - 제공 기능 예시: 단골 고객 용 쿠폰 발급 및 사용, 포인트 알림, 챌린지 개설 및 참여, 스탬프 적립 및 관리
+def _cafe_section(kpis, month) -> str:
+    return (
+        "\n[분석 데이터]\n"
+        f"- 대상 월: {month}\n"
+        f"- 아테나 KPI: {compact_json(kpis)}\n"
+    )
 
-    4. 출력은 반드시 JSON 객체 하나로만 작성하세요.
-    코드블록(````json`, ```)이나 설명 문구 없이 JSON만 반환하세요.
 
-    {{
-    "insights_text": "<아테나 KPI 중심 줄글, 끝에 트렌드/모니터링 한두 줄 첨부>",
-    "insights": [
-        {{"title": "주말 방문 집중", "detail": "주말 방문 비중이 60% 이상으로 집중되었습니다."}},
-        {{"title": "인기 메뉴", "detail": "아메리카노와 라떼 판매가 전체의 60%를 차지했습니다."}}
-    ]
-    }}
+def build_insight_prompt(kpis, month, menu_trends, cafe_features, max_tokens: Optional[int] = None) -> str:
+    """
+    인사이트 생성 프롬프트 (동기 호출/스트리밍/배치 제출 공용)
+    고정 지시문 → 트렌드(배치 내 모든 카페 공통) → 카페별 월/KPI 순서
+    트렌드 항목은 rank_trend_items 순위대로, 전체가 max_tokens(기본 INSIGHT_PROMPT_MAX_TOKENS) 안에 들도록 잘라서 넣음
+    (카페 구간 몫은 INSIGHT_CAFE_SECTION_TOKENS 로 고정 → 트렌드 선택이 카페 KPI 에 따라 달라지지 않아 접두부 유지)
     """
+    max_tokens = INSIGHT_PROMPT_MAX_TOKENS if max_tokens is None else max_tokens
+    menus = rank_trend_items(menu_trends, "menu")
+    features = rank_trend_items(cafe_features, "feature")
+
+    budget = max_tokens - INSIGHT_CAFE_SECTION_TOKENS - count_tokens(INSIGHT_INSTRUCTIONS + _trend_section([], []))
+    kept_menus, kept_features = fit_to_budget([menus, features], budget)
 
-    raw_result = run_gpt_analysis(prompt)
+    prefix = INSIGHT_INSTRUCTIONS + _trend_section(kept_menus, kept_features)
+    prompt = prefix + _cafe_section(kpis, month)
+    dropped = len(menus) - len(kept_menus) + len(features) - len(kept_features)
+    if dropped:
+        print(f"✂️ 인사이트 프롬프트 예산({max_tokens} tokens) 초과로 트렌드 항목 {dropped}개 제외")
+    prefix_tokens = count_tokens(SYSTEM_PROMPT) + count_tokens(prefix)
+    print(f"🧮 인사이트 프롬프트 ≈{count_tokens(prompt)} tokens, 공통 접두부 ≈{prefix_tokens} tokens"
+          f"{'' if prefix_tokens >= PROMPT_CACHE_MIN_TOKENS else f' (캐시 최소 {PROMPT_CACHE_MIN_TOKENS} 미만)'} "
+          f"(menus {len(kept_menus)}/{len(menus)}, features {len(kept_features)}/{len(features)})")
+    return prompt
 
+
+def _parse_structured(raw_result: str) -> Optional[dict]:
+    """스키마 강제 응답 → dict (스키마와 다르면 None)"""
     try:
-        result = json.loads(raw_result)
-    except Exception:
-        result = {"insights_text": raw_result, "insights": []}
+        return InsightReport.model_validate_json(raw_result).model_dump()
+    except ValidationError as e:
+        print(f"⚠️ 구조화 출력 검증 실패 → 관대한 파서로 처리: {e.error_count()}개 오류")
+        return None
+
+
+def parse_insight_result(raw_result: Optional[str], structured: bool = False) -> dict:
+    """
+    GPT 응답 → {insights_text, insights_summary, insights}
+    structured=True 면 InsightReport 스키마로 바로 검증, 실패 시 프롬프트 모드와 같은 관대한 파싱
+    파싱 결과는 llm_output_parse_total{provider="openai", target="insight"} 에 기록
+    (빈 응답은 거부/빈 응답으로 호출 시점에 이미 기록됨 → 여기서는 기록하지 않음)
+    """
+    raw_result = raw_result or ""
+    result = _parse_structured(raw_result) if structured and raw_result else None
+    if structured:
+        outcome = "ok" if result is not None else "invalid"
+    if result is None:
+        value, reason = extract_json(raw_result, accept=lambda v: isinstance(v, dict))
+        if isinstance(value, dict):
+            result = value
+            if not structured:
+                outcome = "ok" if reason == "ok" else "repaired"
+        else:
+            result = {"insights_text": raw_result, "insights": []}
+            if not structured:
+                outcome = "failed"
+    if raw_result:
+        record_llm_output("openai", "insight", "structured" if structured else "prompt", outcome)
 
     # 요약 만들기
     insights_items = result.get("insights", [])
@@ -60,3 +188,71 @@ def build_insight_from_data(kpis, month, menu_trends, cafe_features):
         "insights_summary": insights_summary,
         "insights": result.get("insights", []),
     }
+
+
+def build_insight_from_data(kpis, month, menu_trends, cafe_features, force_refresh: bool = False):
+    """
+    이미 준비된 데이터(kpis, month, trends)를 받아 GPT 분석 실행
+    force_refresh=True면 LLM 응답 캐시를 무시하고 새로 생성
+    """
+    prompt = build_insight_prompt(kpis, month, menu_trends, cafe_features)
+    response_format = insight_response_format()
+    raw_result = run_gpt_analysis(prompt, force_refresh=force_refresh, response_format=response_format, target="insight")
+    return parse_insight_result(raw_result, structured=response_format is not None)
+
+
+def stream_insight_from_data(kpis, month, menu_trends, cafe_features, force_refresh: bool = False) -> Iterator[Tuple[str, Any]]:
+    """
+    build_insight_from_data 의 스트리밍 버전
+    ("token", 응답 조각) 을 도착하는 대로, 마지막에 ("result", 인사이트 dict) 를 yield
+    """
+    prompt = build_insight_prompt(kpis, month, menu_trends, cafe_features)
+    response_format = insight_response_format()
+    parts = []
+    for delta in stream_gpt_analysis(prompt, force_refresh=force_refresh, response_format=response_format, target="insight"):
+        parts.append(delta)
+        yield "token", delta
+    yield "result", parse_insight_result("".join(parts), structured=response_format is not None)
+
+
+def build_insights_batch(inputs: dict, **batch_kwargs) -> dict:
+    """
+    여러 카페의 인사이트를 OpenAI Batch 작업 하나로 생성하고 끝날 때까지 대기 (로컬/개발용)
+    :param inputs: {cafe_id: (kpis, month, menu_trends, cafe_features)}
+    :param batch_kwargs: run_gpt_batch 옵션 (poll_interval, timeout)
+    :return: {cafe_id: 인사이트 dict 또는 None(배치에서 실패한 카페)}
+    """
+    prompts = {str(cafe_id): build_insight_prompt(*args) for cafe_id, args in inputs.items()}
+    response_format = insight_response_format()
+    raw_results = run_gpt_batch(prompts, response_format=response_format, target="insight", **batch_kwargs)
+    return parse_batch_insights(raw_results, list(inputs), structured=response_format is not None)
+
+
+def submit_insights_batch(inputs: dict) -> Tuple[str, bool]:
+    """
+    build_insights_batch 의 제출 단계만 (완료를 기다리지 않음)
+    :return: (batch id, 구조화 출력 여부 - collect_insights_batch 에 그대로 전달)
+    """
+    prompts = {str(cafe_id): build_insight_prompt(*args) for cafe_id, args in inputs.items()}
+    response_format = insight_response_format()
+    return submit_gpt_batch(prompts, response_format), response_format is not None
+
+
+def collect_insights_batch(batch_id: str, cafe_ids: List[Any], structured: bool = False) -> Optional[dict]:
+    """
+    제출한 배치를 한 번 조회
+    :return: 진행 중이면 None, 끝났으면 {cafe_id: 인사이트 dict 또는 None}
+    """
+    response_format = INSIGHT_RESPONSE_FORMAT if structured else None
+    raw_results = collect_gpt_batch(batch_id, response_format=response_format, target="insight")
+    if raw_results is None:
+        return None
+    return parse_batch_insights(raw_results, cafe_ids, structured)
+
+
+def parse_batch_insights(raw_results: dict, cafe_ids: List[Any], structured: bool = False) -> dict:
+    return {
+        cafe_id: parse_insight_result(raw_results[str(cafe_id)], structured=structured)
+        if raw_results.get(str(cafe_id)) is not None else None
+        for cafe_id in cafe_ids
+    }
@@ -35,7 +35,7 @@ def generate_insight(cafe_id: int = 1, enforce_schedule: bool = True) -> Dict[st
     features = get_popular_cafe_features() 
 
     # 3) LLM 종합(지표 → 결론/액션 중심, 마지막에 트렌드 참고)
-    result = synthesize_monthly_insight(indicators, menus, features)
+    result = synthesize_monthly_insight(indicators=indicators, menus=menus, features=features)
 
     # 4) 필요하면 여기서 result["content"]를 jsonsafe로 파싱해 dict로 바꿔 저장 가능
     return result
@@ -0,0 +1,164 @@
+import os
+import re
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from insight_automation.logic.build_insight_from_data import (
+    build_insight_from_data, insight_response_format, parse_insight_result
+)
+from insight_automation.utils.openai_helper import run_gpt_analysis
+from insight_automation.utils.storage import load_report_from_s3
+
+# KPI별 허용 오차: 건수는 상대 변화율, 비율(Rate)은 절대 차이
+DEFAULT_KPI_TOLERANCES: Dict[str, float] = {
+    "visits": 0.05,
+    "newCustomers": 0.10,
+    "revisitRate": 0.02,
+    "couponUseRate": 0.02,
+    "challengeJoin": 0.10,
+}
+KPI_TOLERANCES = {**DEFAULT_KPI_TOLERANCES, **json.loads(os.getenv("KPI_DELTA_TOLERANCES", "{}"))}
+# 이 개수 이하의 KPI만 바뀌었으면 "변경분만" 프롬프트, 넘으면 전체 재생성
+KPI_DELTA_MAX_CHANGED = int(os.getenv("KPI_DELTA_MAX_CHANGED", "2"))
+INSIGHT_DELTA_CHECK = os.getenv("INSIGHT_DELTA_CHECK", "true").lower() == "true"
+
+MONTH_RE = re.compile(r"^\d{4}-\d{2}$")
+
+
+def _prev_period(month: str) -> str:
+    y, m = (int(p) for p in month.split("-"))
+    y, m = (y - 1, 12) if m == 1 else (y, m - 1)
+    return f"{y}-{m:02d}"
+
+
+def changed_kpis(
+    current: Dict[str, Any],
+    previous: Dict[str, Any],
+    tolerances: Optional[Dict[str, float]] = None,
+) -> Dict[str, Tuple[Any, Any]]:
+    """허용 오차를 넘게 바뀐 KPI → {kpi: (이전 값, 현재 값)}"""
+    tolerances = tolerances or KPI_TOLERANCES
+    changed = {}
+    for name, cur in current.items():
+        prev = previous.get(name)
+        if prev is None:
+            changed[name] = (prev, cur)
+            continue
+        tol = tolerances.get(name, 0.0)
+        if name.endswith("Rate"):
+            diff = abs(cur - prev)
+        else:
+            diff = abs(cur - prev) / max(abs(prev), 1)
+        if diff > tol:
+            changed[name] = (prev, cur)
+    return changed
+
+
+def insight_basis_kpis(report: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    보고서 문장이 실제로 근거한 KPI
+    (재사용 보고서의 kpis 는 그 달의 KPI 라서 문장과 다름 → insightKpis, 없으면 예전 보고서라 kpis)
+    """
+    return report.get("insightKpis") or report.get("kpis") or {}
+
+
+def is_reusable_report(report: Optional[Dict[str, Any]]) -> bool:
+    """LLM 으로 생성된 정상 보고서만 재사용/수정 대상 (템플릿·오류 대체 보고서 제외)"""
+    if not report or report.get("error") or not insight_basis_kpis(report):
+        return False
+    return not str(report.get("synthesisMode", "")).startswith("template")
+
+
+def load_previous_report(cafe_id: int, month: str) -> Optional[Dict[str, Any]]:
+    """같은 기간(재실행) 보고서가 있으면 그것을, 없으면 전달 보고서를 반환 (재사용할 수 없는 보고서는 건너뜀)"""
+    if not MONTH_RE.match(month or ""):
+        return None
+    for period in (month, _prev_period(month)):
+        try:
+            report = load_report_from_s3(cafe_id, period)
+        except Exception as e:
+            print(f"⚠️ Previous report load failed ({cafe_id}, {period}): {e}")
+            report = None
+        if is_reusable_report(report):
+            return {**report, "period": report.get("period", period)}
+    return None
+
+
+def build_changes_prompt(previous: Dict[str, Any], changed: Dict[str, Tuple[Any, Any]], month: str) -> str:
+    """이전 인사이트 + 바뀐 KPI만 담은 짧은 수정 프롬프트"""
+    changes = "\n".join(f"- {name}: {prev} → {cur}" for name, (prev, cur) in changed.items())
+    return f"""
+    아래는 지난 카페 경영 인사이트입니다. {month} KPI 중 다음 항목만 의미 있게 바뀌었습니다.
+    {changes}
+
+    바뀐 지표와 관련된 문장과 결론만 새 수치에 맞게 고치고, 나머지는 그대로 유지하세요.
+    출력은 아래와 같은 키를 가진 JSON 객체 하나로만 작성하세요. 코드블록이나 설명 문구는 넣지 마세요.
+
+    {json.dumps({"insights_text": previous.get("insights_text", ""), "insights": previous.get("insights", [])}, ensure_ascii=False)}
+    """
+
+
+def plan_synthesis(kpis: Dict[str, Any], previous: Optional[Dict[str, Any]]) -> Tuple[str, Dict[str, Tuple[Any, Any]]]:
+    """
+    ("reuse" | "delta" | "full", 바뀐 KPI)
+    - reuse: 모든 KPI가 허용 오차 이내 → 이전 인사이트 재사용
+    - delta: 일부만 바뀜 → 변경분만 프롬프트
+    - full: 이전 보고서 없음 또는 많이 바뀜 → 전체 생성
+    """
+    if not previous:
+        return "full", {}
+    # 직전 달이 아니라 문장이 근거한 KPI 와 비교 (달마다 조금씩 누적된 변화도 잡힘)
+    changed = changed_kpis(kpis, insight_basis_kpis(previous))
+    if not changed:
+        return "reuse", changed
+    if len(changed) <= KPI_DELTA_MAX_CHANGED:
+        return "delta", changed
+    return "full", changed
+
+
+def synthesize_with_delta_check(
+    cafe_id: int,
+    indicators: Dict[str, Any],
+    menus: List[Any],
+    features: List[Any],
+    before_llm: Optional[Callable[[], None]] = None,
+) -> Dict[str, Any]:
+    """
+    KPI가 거의 그대로면 LLM 호출 없이 이전 인사이트 재사용,
+    일부만 바뀌면 짧은 "변경분만" 프롬프트, 그 외에는 기존 전체 생성
+    반환 보고서에는 다음 비교를 위해 month/kpis 와 문장의 근거 KPI(insightKpis) 포함
+    before_llm: LLM 을 실제로 호출하기 직전에만 실행 (예외를 던지면 호출하지 않음, 재사용 경로에서는 실행 안 됨)
+    """
+    kpis = indicators.get("kpis", {})
+    month = indicators.get("month", "")
+    previous = load_previous_report(cafe_id, month) if INSIGHT_DELTA_CHECK else None
+    mode, changed = plan_synthesis(kpis, previous)
+
+    if mode == "reuse":
+        report = {
+            "insights_text": previous.get("insights_text", ""),
+            "insights_summary": previous.get("insights_summary", ""),
+            "insights": previous.get("insights", []),
+            # 재사용이 이어져도 실제로 문장을 생성한 기간을 가리킴
+            "reusedFrom": previous.get("reusedFrom") or previous["period"],
+        }
+        insight_kpis = insight_basis_kpis(previous)
+    elif mode == "delta":
+        if before_llm is not None:
+            before_llm()
+        response_format = insight_response_format()
+        raw_result = run_gpt_analysis(
+            build_changes_prompt(previous, changed, month), response_format=response_format, target="insight"
+        )
+        report = parse_insight_result(raw_result, structured=response_format is not None)
+        report["updatedFrom"] = previous["period"]
+        # 바뀐 KPI 만 새 수치로 고쳤으므로 나머지는 이전 근거 그대로
+        insight_kpis = {**insight_basis_kpis(previous), **{name: cur for name, (_, cur) in changed.items()}}
+    else:
+        if before_llm is not None:
+            before_llm()
+        report = build_insight_from_data(kpis, month, menus, features)
+        insight_kpis = kpis
+
+    print(f"🧮 cafe {cafe_id} synthesis mode={mode} changed={list(changed)}")
+    return {**report, "month": month, "kpis": kpis, "insightKpis": insight_kpis, "synthesisMode": mode}
@@ -0,0 +1,103 @@
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# _generate_service_recommendations 의 if 체인을 표로 옮긴 것 (순서 = 출력 문구 순서)
+# (코드, KPI, 비교, 임계값, 신호 종류, 추천 문구)
+RECOMMENDATION_RULES: List[Tuple[str, str, str, float, str, str]] = [
+    # 부정적 신호
+    ("REVISIT_LOW", "revisitRate", "lt", 0.4, "negative",
+     "재방문율이 낮으므로 기존 고객을 위한 재방문 유도 쿠폰 이벤트를 진행하세요."),
+    ("NEW_CUSTOMERS_LOW", "newCustomers", "lt", 200, "negative",
+     "신규 고객 유입이 적으니 시즌 한정 메뉴나 이벤트를 주제로 한 챌린지를 개설하세요."),
+    ("COUPON_USE_LOW", "couponUseRate", "lt", 0.2, "negative",
+     "쿠폰 사용률이 낮으니 매장에서 쿠폰 혜택을 더 적극적으로 안내하세요."),
+    ("CHALLENGE_JOIN_LOW", "challengeJoin", "lt", 50, "negative",
+     "챌린지 참여율이 낮으니 참여 조건을 완화하거나 보상을 강화해보세요."),
+    # 긍정적 신호
+    ("REVISIT_HIGH", "revisitRate", "ge", 0.6, "positive",
+     "이번 달은 재방문율이 높아요. 지금처럼 단골 고객을 유지시켜주세요."),
+    ("VISITS_HIGH", "visits", "ge", 2000, "positive",
+     "방문자 수가 많아 안정적인 유입을 확보했습니다. 매장 운영에 강점이 있습니다."),
+    ("COUPON_USE_HIGH", "couponUseRate", "ge", 0.4, "positive",
+     "쿠폰 사용률이 높아 혜택이 잘 활용되고 있습니다. 추가 쿠폰 이벤트도 긍정적입니다."),
+]
+DEFAULT_RECOMMENDATION = ("STABLE", "지표가 전반적으로 양호하니 현재 캠페인을 유지하며 꾸준히 고객과 소통하세요.")
+
+KPI_COLUMNS = ["visits", "newCustomers", "revisitRate", "couponUseRate", "challengeJoin"]
+
+_RULE_COLS = np.array([KPI_COLUMNS.index(rule[1]) for rule in RECOMMENDATION_RULES])
+_RULE_THRESHOLDS = np.array([rule[3] for rule in RECOMMENDATION_RULES], dtype=float)
+_RULE_IS_LT = np.array([rule[2] == "lt" for rule in RECOMMENDATION_RULES])
+_RULE_IS_NEGATIVE = np.array([rule[4] == "negative" for rule in RECOMMENDATION_RULES])
+
+
+def kpi_matrix(kpis_list: Sequence[Dict[str, Any]]) -> np.ndarray:
+    """KPI dict 목록 → (카페 수, len(KPI_COLUMNS)) 행렬, 없는 값은 0"""
+    return np.array(
+        [[float(kpis.get(col) or 0) for col in KPI_COLUMNS] for kpis in kpis_list],
+        dtype=float,
+    ).reshape(len(kpis_list), len(KPI_COLUMNS))
+
+
+def evaluate_rules(matrix: np.ndarray) -> np.ndarray:
+    """(카페 수, 규칙 수) bool 행렬: 규칙별 조건 충족 여부를 한 번에 계산"""
+    values = matrix[:, _RULE_COLS]
+    return np.where(_RULE_IS_LT, values < _RULE_THRESHOLDS, values >= _RULE_THRESHOLDS)
+
+
+def _rule_masks(hits: np.ndarray) -> np.ndarray:
+    """규칙 충족 패턴 → 비트마스크 (같은 패턴 카페는 같은 추천 문구)"""
+    weights = np.left_shift(1, np.arange(hits.shape[1], dtype=np.int64))
+    return hits.astype(np.int64) @ weights
+
+
+def _pattern_result(mask: int) -> Dict[str, Any]:
+    idx = [i for i in range(len(RECOMMENDATION_RULES)) if mask >> i & 1]
+    if not idx:
+        codes, texts = [DEFAULT_RECOMMENDATION[0]], [DEFAULT_RECOMMENDATION[1]]
+    else:
+        codes = [RECOMMENDATION_RULES[i][0] for i in idx]
+        texts = [RECOMMENDATION_RULES[i][5] for i in idx]
+    return {
+        "codes": codes,
+        "texts": texts,
+        "text": " ".join(texts),
+        "hasNegative": bool(_RULE_IS_NEGATIVE[idx].any()) if idx else False,
+    }
+
+
+def classify_matrix(cafe_ids: Sequence[int], matrix: np.ndarray) -> Dict[int, Dict[str, Any]]:
+    """
+    (카페 수, len(KPI_COLUMNS)) 행렬을 바로 평가 (Athena fetch_frame 결과 등 열 단위 데이터용)
+    규칙 조합(최대 2^규칙 수)별로 결과를 한 번만 만들고 카페들이 공유함 (수정하지 말 것)
+    """
+    masks = _rule_masks(evaluate_rules(matrix))
+    uniques, inverse = np.unique(masks, return_inverse=True)
+    patterns = [_pattern_result(int(m)) for m in uniques]
+    return {cafe_id: patterns[j] for cafe_id, j in zip(cafe_ids, inverse.tolist())}
+
+
+def classify_cafes(kpis_by_cafe: Dict[int, Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+    """
+    전체 카페 KPI를 한 번에 규칙 평가
+    반환: {cafe_id: {"codes": [...], "texts": [...], "text": 이어 붙인 추천 문구, "hasNegative": bool}}
+    text 는 _generate_service_recommendations 결과와 동일
+    """
+    cafe_ids = list(kpis_by_cafe)
+    return classify_matrix(cafe_ids, kpi_matrix([kpis_by_cafe[c] for c in cafe_ids]))
+
+
+def cafes_needing_llm(classified: Dict[int, Dict[str, Any]]) -> List[int]:
+    """부정적 신호가 있는 카페만 (나머지는 템플릿으로 충분)"""
+    return [cafe_id for cafe_id, item in classified.items() if item["hasNegative"]]
+
+
+def recommendation_text(kpis: Dict[str, Any]) -> str:
+    """단일 카페 추천 문구 (같은 규칙 표, numpy 없이 평가)"""
+    texts = []
+    for _, kpi, op, threshold, _, text in RECOMMENDATION_RULES:
+        value = kpis.get(kpi) or 0
+        if (value < threshold) if op == "lt" else (value >= threshold):
+            texts.append(text)
+    return " ".join(texts or [DEFAULT_RECOMMENDATION[1]])
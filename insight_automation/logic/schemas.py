@@ -1,5 +1,5 @@
-from typing import Optional
-from pydantic import BaseModel, Field, validator
+from typing import Any, Dict, List, Optional, Type
+from pydantic import BaseModel, Field
 
 
 class MenuTrendItem(BaseModel):
@@ -8,15 +8,55 @@ class MenuTrendItem(BaseModel):
     whyPopular: Optional[str] = Field("", description="인기 있는 이유")
     exampleCafe: Optional[str] = Field("", description="예시 카페")
 
-    @validator("exampleCafe", pre=True, always=True)
-    def coerce_example_cafe(cls, v, values):
-        if v is not None:
-            return v
-        return v
-
 
 class CafeFeatureItem(BaseModel):
     feature: str = Field(..., description="특징 이름")
     description: Optional[str] = Field("", description="설명")
     whyEffective: Optional[str] = Field("", description="인기/효과 이유")
     exampleCafe: Optional[str] = Field("", description="예시 카페")
+
+
+class InsightItem(BaseModel):
+    title: str = Field(..., description="짧은 요약")
+    detail: str = Field(..., description="구체적 설명 (수치 근거 포함)")
+
+
+class InsightReport(BaseModel):
+    """build_insight_prompt 가 요구하는 LLM 응답 형태"""
+    insights_text: str = Field(..., description="KPI 중심 줄글 한 단락 (끝에 트렌드/모니터링 한두 줄)")
+    insights: List[InsightItem] = Field(default_factory=list, description="KPI 기반 핵심 결론 2~3개")
+
+
+class MenuTrendList(BaseModel):
+    """Perplexity 구조화 출력용 (응답 최상위는 객체여야 해서 배열을 items 로 감쌈)"""
+    items: List[MenuTrendItem]
+
+
+class CafeFeatureList(BaseModel):
+    items: List[CafeFeatureItem]
+
+
+def strict_json_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    구조화 출력(response_format json_schema)용 스키마
+    - $ref 를 펼치고 $defs 제거 (Perplexity 호환)
+    - 모든 객체: 모든 필드 required + additionalProperties false (OpenAI strict 모드 조건)
+    - default 제거 (strict 모드 미지원 키워드)
+    """
+    schema = model.model_json_schema()
+    defs = schema.pop("$defs", {})
+
+    def _convert(node: Any) -> Any:
+        if isinstance(node, list):
+            return [_convert(item) for item in node]
+        if not isinstance(node, dict):
+            return node
+        if "$ref" in node:
+            return _convert(defs[node["$ref"].split("/")[-1]])
+        node = {key: _convert(value) for key, value in node.items() if key != "default"}
+        if "properties" in node:
+            node["required"] = list(node["properties"])
+            node["additionalProperties"] = False
+        return node
+
+    return _convert(schema)
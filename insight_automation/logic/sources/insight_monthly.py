@@ -6,12 +6,13 @@ from openai_backup import OpenAI
 from datetime import datetime, timedelta, timezone
 from calendar import monthrange
 from dotenv import load_dotenv
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 from insight_automation.utils.athena import fetch_monthly_metrics
 from insight_automation.logic.schemas import MenuTrendItem, CafeFeatureItem
 from insight_automation.utils.perplexity import fetch_menu_trends, fetch_cafe_features, ensure_dict_array_from_text
 from insight_automation.utils.openai_helper import run_gpt_analysis
-from insight_automation.logic.build_insight_from_data import build_insight_from_data
+from insight_automation.logic.build_insight_from_data import build_insight_from_data, stream_insight_from_data
+from insight_automation.logic.recommendation_rules import recommendation_text
 from insight_automation.utils.text import format_with_linebreaks
 
 load_dotenv()
@@ -45,43 +46,15 @@ def _sample_indicators() -> Dict[str, Any]:
         }
     }
 
-def get_monthly_indicators(cafe_id: int, ref_dt: Optional[datetime] = None, use_mock=True) -> Dict[str, Any]:
+def get_monthly_indicators(cafe_id: int, ref_dt: Optional[datetime] = None, use_mock=True, use_cache=True) -> Dict[str, Any]:
     if use_mock:
         return _sample_indicators()
     else:
-        return fetch_monthly_metrics(cafe_id, ref_dt or datetime.now(KST))
+        return fetch_monthly_metrics(cafe_id, ref_dt or datetime.now(KST), use_cache=use_cache)
 
 def _generate_service_recommendations(kpis: Dict[str, Any]) -> str:
-    """KPI 상황에 따라 챌린지/쿠폰 등 서비스 기능 추천 문구 생성"""
-    recommendations = []
-    revisit_rate = kpis.get('revisitRate', 0)
-    visits = kpis.get('visits', 0)
-    new_customers = kpis.get('newCustomers', 0)
-    coupon_use_rate = kpis.get('couponUseRate', 0)
-    challenge_join = kpis.get('challengeJoin', 0)
-
-    # 부정적 신호
-    if revisit_rate < 0.4:
-        recommendations.append("재방문율이 낮으므로 기존 고객을 위한 재방문 유도 쿠폰 이벤트를 진행하세요.")
-    if new_customers < 200:
-        recommendations.append("신규 고객 유입이 적으니 시즌 한정 메뉴나 이벤트를 주제로 한 챌린지를 개설하세요.")
-    if coupon_use_rate < 0.2:
-        recommendations.append("쿠폰 사용률이 낮으니 매장에서 쿠폰 혜택을 더 적극적으로 안내하세요.")
-    if challenge_join < 50:
-        recommendations.append("챌린지 참여율이 낮으니 참여 조건을 완화하거나 보상을 강화해보세요.")
-
-    # 긍정적 신호
-    if revisit_rate >= 0.6:
-        recommendations.append("이번 달은 재방문율이 높아요. 지금처럼 단골 고객을 유지시켜주세요.")
-    if visits >= 2000:
-        recommendations.append("방문자 수가 많아 안정적인 유입을 확보했습니다. 매장 운영에 강점이 있습니다.")
-    if coupon_use_rate >= 0.4:
-        recommendations.append("쿠폰 사용률이 높아 혜택이 잘 활용되고 있습니다. 추가 쿠폰 이벤트도 긍정적입니다.")
-
-    if not recommendations:
-        recommendations.append("지표가 전반적으로 양호하니 현재 캠페인을 유지하며 꾸준히 고객과 소통하세요.")
-
-    return " ".join(recommendations)
+    """KPI 상황에 따라 챌린지/쿠폰 등 서비스 기능 추천 문구 생성 (규칙: logic/recommendation_rules.py)"""
+    return recommendation_text(kpis)
 
 PROMETHEUS_URL = "https://loopyxyz.duckdns.org/api/v1/query"
 
@@ -102,15 +75,43 @@ def fetch_prometheus_metrics():
 
     return results
 
-def synthesize_monthly_insight(cafe_id: int, use_mock=True, include_debug=False):
+def _as_dict_items(items: List[Any]) -> List[Any]:
+    """pydantic 모델(MenuTrendItem 등)이 섞여 있으면 dict로 변환"""
+    return [item.model_dump() if hasattr(item, "model_dump") else item for item in items]
+
+def synthesize_monthly_insight(
+    cafe_id: Optional[int] = None,
+    use_mock=True,
+    include_debug=False,
+    indicators: Optional[Dict[str, Any]] = None,
+    menus: Optional[List[Any]] = None,
+    features: Optional[List[Any]] = None,
+):
+    """
+    KPI + 트렌드 → GPT 인사이트
+    indicators/menus/features 를 넘기면 (그래프에서 미리 병렬 조회한 경우) 다시 조회하지 않음
+    """
     # 1. KPI 불러오기
+    if indicators is None:
+        indicators = get_monthly_indicators(cafe_id, use_mock=use_mock)
+    kpis = indicators.get("kpis", {})
+    month_label = indicators.get("month", "")
+
+    # 2. 트렌드 데이터
+    menus = ensure_dict_array_from_text(_as_dict_items(menus) if menus is not None else fetch_menu_trends())
+    features = ensure_dict_array_from_text(_as_dict_items(features) if features is not None else fetch_cafe_features())
+
+    # 3. GPT 분석 실행
+    return build_insight_from_data(kpis, month_label, menus, features)
+
+def stream_monthly_insight(cafe_id: int, use_mock=True) -> Iterator[Tuple[str, Any]]:
+    """
+    synthesize_monthly_insight 의 스트리밍 버전 (대시보드 온디맨드 요청용)
+    ("indicators", KPI) → ("token", 응답 조각)... → ("result", 인사이트 dict) 순서로 yield
+    """
     indicators = get_monthly_indicators(cafe_id, use_mock=use_mock)
-    kpis = indicators["kpis"]
-    month_label = indicators["month"]
+    yield "indicators", indicators
 
-    # 2. 트렌드 데이터    
     menus = ensure_dict_array_from_text(fetch_menu_trends())
     features = ensure_dict_array_from_text(fetch_cafe_features())
-    
-    # 3. GPT 분석 실행
-    return build_insight_from_data(kpis, month_label, menus, features)
\ No newline at end of file
+    yield from stream_insight_from_data(indicators.get("kpis", {}), indicators.get("month", ""), menus, features)
@@ -1,72 +1,25 @@
-import requests
 import os
 from typing import List
-from insight_automation.utils.perplexity import fetch_cafe_trend
+from insight_automation.utils.perplexity import fetch_cafe_features, fetch_menu_trends
 from insight_automation.utils.jsonsafe import coerce_json_array
 from insight_automation.logic.schemas import MenuTrendItem, CafeFeatureItem
+from insight_automation.logic.trend_validation import validate_cafe_features, validate_menu_trends
 
 PERPLEXITY_API_KEY = os.getenv("PERPLEXITY_API_KEY")
 
-def _map_legacy_keys(obj: dict) -> dict:
-    """프롬프트/모델에 따라 키가 살짝 다를 수 있어 호환 처리."""
-    mapped = dict(obj)
-    if "example" in mapped and "exampleCafe" not in mapped:
-        mapped["exampleCafe"] = mapped["example"]
-    if "whyPopular" in mapped and "whyEffective" not in mapped:
-        mapped["whyEffective"] = mapped["whyPopular"]
-    return mapped
-
+# 프롬프트는 utils/perplexity 의 MENU_TREND_PROMPT / CAFE_FEATURE_PROMPT 를 그대로 사용
+# (트렌드 캐시 키가 프롬프트 기준이라 warm_trend_cache 가 채운 항목을 그래프에서도 재사용)
+# max_tokens 도 warm 과 같은 값 (특징 목록은 fetch_cafe_features 기본값 1024, 예전 그래프 경로는 400)
 
 def get_trending_menu_info() -> List[MenuTrendItem]:
-    prompt = """당신은 F&B 트렌드 분석가입니다.
-2025년 현재 한국에서 인기 있는 카페 메뉴 트렌드를 조사해 주세요.
-신메뉴, 재조명된 음료, 고객 반응이 좋은 메뉴 등을 중심으로 요약해 주세요.
-결과는 JSON 배열로 다음 형식에 맞춰 주세요:
-
-[
-  {
-    "menu": "메뉴 이름",
-    "description": "이 메뉴가 어떤 특징을 가지고 있는지",
-    "whyPopular": "인기 있는 이유",
-    "exampleCafe": "이 메뉴를 제공하는 대표 카페 이름 또는 예시"
-  }
-]
-한국어로 응답해 주세요.
-"""
-    text = fetch_cafe_trend(prompt)
+    text = fetch_menu_trends()
     arr, _reason = coerce_json_array(text)
-    items: List[MenuTrendItem] = []
-    for obj in arr:
-        try:
-            items.append(MenuTrendItem(**_map_legacy_keys(obj)))
-        except Exception:
-            continue
+    items, _errors = validate_menu_trends(arr)
     return items
 
 
 def get_popular_cafe_features() -> List[CafeFeatureItem]:
-    prompt = """2025년 한국에서 인기가 많은 카페들이 공통적으로 갖고 있는 특징을 조사해 주세요.
-예: 분위기, 좌석 구성, 운영 시간, 서비스, 디저트 종류 등
-결과는 JSON 배열로 요약해 주세요.
-
-[
-  {
-    "feature": "특징 이름",
-    "description": "이 특징이 왜 중요한지",
-    "example": "이 특징을 갖춘 대표 카페 이름 또는 설명"
-  }
-]
-한국어로 응답해 주세요.
-"""
-    text = fetch_cafe_trend(prompt)
+    text = fetch_cafe_features()
     arr, _reason = coerce_json_array(text)
-    items: List[CafeFeatureItem] = []
-    for obj in arr:
-        # example -> exampleCafe 호환
-        if "example" in obj and "exampleCafe" not in obj:
-            obj["exampleCafe"] = obj["example"]
-        try:
-            items.append(CafeFeatureItem(**obj))
-        except Exception:
-            continue
-    return items
\ No newline at end of file
+    items, _errors = validate_cafe_features(arr)
+    return items
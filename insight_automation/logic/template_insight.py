@@ -0,0 +1,163 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from threading import Event, Lock
+from typing import Any, Dict, List, Optional
+
+from insight_automation.logic.kpi_delta import synthesize_with_delta_check
+from insight_automation.logic.sources.insight_monthly import _generate_service_recommendations
+from insight_automation.utils.text import format_with_linebreaks
+
+# "llm": 항상 LLM / "template": 규칙 기반 템플릿만 / "auto": LLM, 느리거나 예산 초과 시 템플릿
+INSIGHT_MODE = os.getenv("INSIGHT_MODE", "llm")
+# auto 모드에서 LLM 응답을 기다리는 최대 시간(초, _llm_pool 에서 실행이 시작된 시점부터)
+INSIGHT_LLM_TIMEOUT_SECONDS = float(os.getenv("INSIGHT_LLM_TIMEOUT_SECONDS", "30"))
+# 프로세스당 LLM 합성 호출 상한 (0이면 제한 없음)
+INSIGHT_LLM_MAX_CALLS = int(os.getenv("INSIGHT_LLM_MAX_CALLS", "0"))
+
+_llm_pool = ThreadPoolExecutor(max_workers=int(os.getenv("INSIGHT_LLM_WORKERS", "8")))
+_budget_lock = Lock()
+_llm_calls = 0
+
+
+def _names(items: List[Any], key: str) -> List[str]:
+    return [
+        str(item.get(key))
+        for item in items
+        if isinstance(item, dict) and item.get(key) and item.get(key) != "데이터 없음"
+    ]
+
+
+def build_template_insight(
+    kpis: Dict[str, Any],
+    month: str,
+    menus: List[Any],
+    features: List[Any],
+    recommendation: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    LLM 없이 KPI 규칙 + 트렌드로 보고서 생성 (build_insight_from_data 와 같은 형태)
+    recommendation: 배치에서 classify_cafes 로 미리 만든 추천 문구 (없으면 카페 하나만 규칙 평가)
+    """
+    visits = kpis.get("visits", 0)
+    new_customers = kpis.get("newCustomers", 0)
+    revisit_rate = kpis.get("revisitRate", 0)
+    coupon_use_rate = kpis.get("couponUseRate", 0)
+    challenge_join = kpis.get("challengeJoin", 0)
+
+    insights = [
+        {
+            "title": "방문 현황",
+            "detail": f"{month} 방문은 {visits:,}회, 신규 고객은 {new_customers:,}명입니다.",
+        },
+        {
+            "title": "재방문율",
+            "detail": f"재방문율은 {revisit_rate:.0%}로 "
+                      + ("단골 고객 유지가 잘 되고 있습니다." if revisit_rate >= 0.6
+                         else "재방문 유도가 필요합니다." if revisit_rate < 0.4
+                         else "평균 수준입니다."),
+        },
+        {
+            "title": "쿠폰·챌린지 참여",
+            "detail": f"쿠폰 사용률은 {coupon_use_rate:.0%}, 챌린지 참여는 {challenge_join:,}명입니다.",
+        },
+    ]
+
+    menu_names = _names(menus, "menu")[:3]
+    feature_names = _names(features, "feature")[:3]
+    trend_text = ""
+    if menu_names:
+        trend_text += f" 최근에는 {', '.join(menu_names)} 같은 메뉴가 인기입니다."
+    if feature_names:
+        trend_text += f" {', '.join(feature_names)} 같은 매장 특징도 주목받고 있으니 참고하세요."
+
+    insights_text = (
+        f"사장님, {month} 지표를 보면 방문 {visits:,}회, 신규 고객 {new_customers:,}명, "
+        f"재방문율 {revisit_rate:.0%}, 쿠폰 사용률 {coupon_use_rate:.0%}, 챌린지 참여 {challenge_join:,}명입니다. "
+        f"{recommendation if recommendation is not None else _generate_service_recommendations(kpis)}{trend_text}"
+    )
+    summary_text = " ".join(item["detail"] for item in insights)
+
+    return {
+        "insights_text": insights_text,
+        "insights_summary": format_with_linebreaks(summary_text, 20),
+        "insights": insights,
+    }
+
+
+class LLMDeclined(Exception):
+    """auto 모드에서 LLM 호출 직전 거절 (reason: budget | timeout)"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def _acquire_llm_budget() -> bool:
+    global _llm_calls
+    with _budget_lock:
+        if INSIGHT_LLM_MAX_CALLS and _llm_calls >= INSIGHT_LLM_MAX_CALLS:
+            return False
+        _llm_calls += 1
+        return True
+
+
+def synthesize_insight(
+    cafe_id: int,
+    indicators: Dict[str, Any],
+    menus: List[Any],
+    features: List[Any],
+    mode: str = INSIGHT_MODE,
+    recommendation: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    인사이트 생성 방식 선택
+    - template: 템플릿 (수 ms)
+    - llm: synthesize_with_delta_check (기존 경로)
+    - auto: 제한 시간 안에서 LLM (예산은 실제 LLM 호출 시에만 차감), 예산 초과/시간 초과/실패 시 템플릿
+    """
+    kpis = indicators.get("kpis", {})
+    month = indicators.get("month", "")
+
+    def _template(reason: str) -> Dict[str, Any]:
+        report = build_template_insight(kpis, month, menus, features, recommendation)
+        return {**report, "month": month, "kpis": kpis, "synthesisMode": reason}
+
+    if mode == "template":
+        return _template("template")
+    if mode == "llm":
+        return synthesize_with_delta_check(cafe_id, indicators, menus, features)
+    if mode != "auto":
+        raise ValueError(f"unknown insight mode: {mode}")
+
+    # 제한 시간이 지나 템플릿으로 응답한 뒤에는 작업이 LLM 을 호출하지 않도록 표시
+    abandoned = Event()
+
+    def _before_llm() -> None:
+        # 재사용 경로는 LLM 을 부르지 않으므로 예산은 실제 호출 직전에만 차감
+        if abandoned.is_set():
+            raise LLMDeclined("timeout")
+        if not _acquire_llm_budget():
+            raise LLMDeclined("budget")
+
+    started = Event()
+
+    def _run() -> Dict[str, Any]:
+        started.set()
+        return synthesize_with_delta_check(cafe_id, indicators, menus, features, _before_llm)
+
+    future = _llm_pool.submit(_run)
+    # 제한 시간은 풀에서 실행이 시작된 뒤부터 (배치 동시성이 워커 수보다 커서 대기열에 있던 시간은 제외)
+    started.wait()
+    try:
+        return future.result(timeout=INSIGHT_LLM_TIMEOUT_SECONDS)
+    except FutureTimeoutError:
+        # LLM 호출 전이면 멈춤 (이미 보낸 요청은 끝까지 진행)
+        abandoned.set()
+        print(f"⚠️ cafe {cafe_id}: LLM timeout ({INSIGHT_LLM_TIMEOUT_SECONDS}s) → template")
+        return _template("template:timeout")
+    except LLMDeclined as e:
+        print(f"⚠️ cafe {cafe_id}: LLM {e.reason} → template")
+        return _template(f"template:{e.reason}")
+    except Exception as e:
+        print(f"⚠️ cafe {cafe_id}: LLM failed ({e}) → template")
+        return _template("template:error")
@@ -0,0 +1,77 @@
+import time
+from threading import Lock
+from typing import Any, Dict, List, Tuple
+
+from pydantic import TypeAdapter, ValidationError
+
+from insight_automation.logic.schemas import CafeFeatureItem, MenuTrendItem
+
+# Perplexity 가 키를 살짝 다르게 줄 때 호환 처리 (옛 키 → 모델 필드)
+MENU_LEGACY_KEYS = {"example": "exampleCafe"}
+FEATURE_LEGACY_KEYS = {"example": "exampleCafe", "whyPopular": "whyEffective"}
+
+_menu_list = TypeAdapter(List[MenuTrendItem])
+_feature_list = TypeAdapter(List[CafeFeatureItem])
+
+_stats_lock = Lock()
+_stats: Dict[str, Dict[str, float]] = {}
+
+
+def normalize_legacy_keys(obj: Dict[str, Any], legacy_keys: Dict[str, str]) -> Dict[str, Any]:
+    """옛 키 값을 새 필드로 복사 (새 필드가 이미 있으면 유지)"""
+    mapped = dict(obj)
+    for old, new in legacy_keys.items():
+        if new not in mapped and old in mapped:
+            mapped[new] = mapped[old]
+    return mapped
+
+
+def _record(name: str, items: int, errors: int, seconds: float) -> None:
+    with _stats_lock:
+        stat = _stats.setdefault(name, {"calls": 0, "items": 0, "errors": 0, "seconds": 0.0})
+        stat["calls"] += 1
+        stat["items"] += items
+        stat["errors"] += errors
+        stat["seconds"] += seconds
+
+
+def _validate(adapter: TypeAdapter, name: str, dicts: List[Any], legacy_keys: Dict[str, str]) -> Tuple[List[Any], List[Dict[str, Any]]]:
+    """
+    목록 전체를 pydantic-core 호출 한 번으로 검증
+    실패 항목이 있으면 오류를 항목별로 모으고, 나머지만 한 번 더 검증 (최대 2회)
+    :return: (검증된 모델 목록, [{"index", "item", "errors"}])
+    """
+    started = time.perf_counter()
+    rows = [normalize_legacy_keys(obj, legacy_keys) if isinstance(obj, dict) else obj for obj in dicts]
+    errors: List[Dict[str, Any]] = []
+    try:
+        items = adapter.validate_python(rows)
+    except ValidationError as e:
+        by_index: Dict[int, List[Dict[str, Any]]] = {}
+        for err in e.errors(include_url=False):
+            by_index.setdefault(err["loc"][0], []).append({**err, "loc": err["loc"][1:]})
+        errors = [{"index": i, "item": rows[i], "errors": by_index[i]} for i in sorted(by_index)]
+        items = adapter.validate_python([row for i, row in enumerate(rows) if i not in by_index])
+
+    _record(name, len(items), len(errors), time.perf_counter() - started)
+    return items, errors
+
+
+def validate_menu_trends(dicts: List[Any]) -> Tuple[List[MenuTrendItem], List[Dict[str, Any]]]:
+    return _validate(_menu_list, "MenuTrendItem", dicts, MENU_LEGACY_KEYS)
+
+
+def validate_cafe_features(dicts: List[Any]) -> Tuple[List[CafeFeatureItem], List[Dict[str, Any]]]:
+    return _validate(_feature_list, "CafeFeatureItem", dicts, FEATURE_LEGACY_KEYS)
+
+
+def log_validation_errors(name: str, errors: List[Dict[str, Any]]) -> None:
+    for err in errors:
+        reasons = "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in err["errors"])
+        print(f"⚠️ {name} 변환 실패: {reasons} | 데이터: {err['item']}")
+
+
+def validation_stats() -> Dict[str, Dict[str, float]]:
+    """모델별 누적 검증 호출/항목/오류 수와 소요 시간(초)"""
+    with _stats_lock:
+        return {name: dict(stat) for name, stat in _stats.items()}
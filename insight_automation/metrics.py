@@ -1,4 +1,4 @@
-from prometheus_client import Counter, generate_latest, REGISTRY, CONTENT_TYPE_LATEST
+from prometheus_client import Counter, Histogram, generate_latest, REGISTRY, CONTENT_TYPE_LATEST
 
 # 검색 키워드 카운터
 search_keyword_counter = Counter(
@@ -7,6 +7,32 @@ search_keyword_counter = Counter(
     ["keyword"]
 )
 
+# LLM/Perplexity 응답 파싱 결과 (실패율 = outcome!="ok" 비율)
+# mode: structured(JSON 스키마 강제) | prompt(프롬프트로만 JSON 요청)
+# outcome: ok | repaired(관대한 파서로 복구) | invalid | failed | refusal | empty (refusal/empty 는 호출 시점에 1회)
+llm_output_parse_counter = Counter(
+    "llm_output_parse_total",
+    "LLM output parse outcomes",
+    ["provider", "target", "mode", "outcome"]
+)
+
+def record_llm_output(provider: str, target: str, mode: str, outcome: str):
+    llm_output_parse_counter.labels(provider=provider, target=target, mode=mode, outcome=outcome).inc()
+
+# LLM 호출 1건당 토큰 수 (kind: prompt | completion | cached_prompt)
+# _sum 으로 총 사용량, 분포로 카페당 비용 편차 확인
+llm_call_tokens = Histogram(
+    "llm_call_tokens",
+    "Tokens used per LLM call",
+    ["model", "kind"],
+    buckets=(64, 128, 256, 512, 1024, 1536, 2048, 3072, 4096, 8192, 16384),
+)
+
+def record_llm_usage(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0):
+    llm_call_tokens.labels(model=model, kind="prompt").observe(prompt_tokens)
+    llm_call_tokens.labels(model=model, kind="completion").observe(completion_tokens)
+    llm_call_tokens.labels(model=model, kind="cached_prompt").observe(cached_tokens)
+
 # 메트릭 노출 함수
 def prometheus_metrics():
     return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
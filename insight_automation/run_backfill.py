@@ -0,0 +1,39 @@
+import argparse
+import json
+from dotenv import load_dotenv
+from insight_automation.utils.athena import add_kpi_deltas, fetch_monthly_metrics_series
+
+load_dotenv()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="월별 KPI 백필 (월 버킷 쿼리 1회)")
+    parser.add_argument("--start", required=True, help="시작 월 (YYYY-MM)")
+    parser.add_argument("--end", required=True, help="마지막 월 (YYYY-MM, 포함)")
+    parser.add_argument("--cafe-ids", type=int, nargs="*", help="대상 카페 ID (생략 시 전체 카페)")
+    parser.add_argument("--source", choices=["raw", "rollup"], help="KPI 원천 (기본값 ATHENA_KPI_SOURCE)")
+    parser.add_argument("--first-visit-mode", choices=["scan", "table"], help="첫 방문 계산 방식")
+    parser.add_argument("--no-cache", action="store_true", help="KPI 캐시 사용 안 함")
+    parser.add_argument("--deltas", action="store_true", help="전월/전년 동월 대비 차이 포함")
+    parser.add_argument("--output", help="결과 JSON 저장 경로 (생략 시 stdout)")
+    args = parser.parse_args()
+
+    print(f"▶️ KPI 백필 시작: {args.start} ~ {args.end}, cafes={args.cafe_ids or '전체'}")
+    series = fetch_monthly_metrics_series(
+        args.cafe_ids or None,
+        args.start,
+        args.end,
+        use_cache=not args.no_cache,
+        first_visit_mode=args.first_visit_mode,
+        source=args.source,
+    )
+    if args.deltas:
+        series = {cafe_id: add_kpi_deltas(items) for cafe_id, items in series.items()}
+    print(f"📊 {len(series)}개 카페 KPI 수집 완료")
+
+    out = json.dumps({str(k): v for k, v in series.items()}, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(out)
+        print(f"💾 저장 완료: {args.output}")
+    else:
+        print(out)
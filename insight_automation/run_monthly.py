@@ -27,6 +27,6 @@ if __name__ == "__main__":
     features = parse_cafe_features(features_raw, max_items=3) or features_raw
 
     # 4. GPT로 종합 인사이트 생성
-    insight = synthesize_monthly_insight(indicators, menus, features)
+    insight = synthesize_monthly_insight(indicators=indicators, menus=menus, features=features)
     print("💡 생성된 인사이트 JSON:")
     print(json.dumps(insight, ensure_ascii=False, indent=2))
\ No newline at end of file
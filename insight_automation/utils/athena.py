@@ -1,24 +1,120 @@
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime, timedelta, timezone, date
+from threading import BoundedSemaphore, Lock
 from pyathena import connect
 from botocore.exceptions import BotoCoreError, ClientError
 import os
+from insight_automation.utils.kpi_cache import get_kpi_cache
 
 KST = timezone(timedelta(hours=9))
 ATHENA_DB = os.getenv("ATHENA_DB", "cafe_analytics")
+# 사용자별 첫 방문일 테이블 (utils/athena_tables.py 에서 월별 증분 유지)
+FIRST_VISIT_TABLE = os.getenv("ATHENA_FIRST_VISIT_TABLE", "user_first_visit")
+# "scan": visits_table 전체 이력에서 MIN(visited_at) 계산 / "table": FIRST_VISIT_TABLE 조인
+# 미설정 시 source 에 따라 결정 (raw → scan, rollup → table: 롤업 경로에서 원본 전체 스캔 방지)
+FIRST_VISIT_MODE = os.getenv("ATHENA_FIRST_VISIT_MODE")
+# 일별 롤업 테이블 (utils/athena_tables.py 에서 하루 1회 기록)
+DAILY_ROLLUP_TABLE = os.getenv("ATHENA_DAILY_ROLLUP_TABLE", "cafe_daily_rollup")
+USER_DAILY_ROLLUP_TABLE = os.getenv("ATHENA_USER_DAILY_ROLLUP_TABLE", "cafe_user_daily_rollup")
+# "raw": 원본 이벤트 테이블 / "rollup": 일별 롤업 테이블
+KPI_SOURCE = os.getenv("ATHENA_KPI_SOURCE", "raw")
+# 프로세스 전체에서 동시에 실행 중인 Athena 쿼리 상한 (워크그룹 동시 실행 한도보다 작게)
+ATHENA_MAX_CONCURRENCY = int(os.getenv("ATHENA_MAX_CONCURRENCY", "5"))
+# 같은 쿼리의 이전 결과를 재사용할 최대 경과 시간(분), 0이면 재사용 안 함
+ATHENA_RESULT_REUSE_MINUTES = int(os.getenv("ATHENA_RESULT_REUSE_MINUTES", "0"))
+# "rows": 기본 DB-API 커서 (GetQueryResults 를 1000행씩 페이지 조회)
+# "arrow": ArrowCursor 로 S3 결과 파일을 한 번에 내려받음 (pyarrow 필요, 결과 행이 많을 때만 이득)
+ATHENA_FETCH_MODE = os.getenv("ATHENA_FETCH_MODE", "rows")
+# arrow 모드에서 UNLOAD(Parquet)로 결과를 받을지 여부 (대용량 결과에 유리)
+ATHENA_ARROW_UNLOAD = os.getenv("ATHENA_ARROW_UNLOAD", "false").lower() == "true"
+
+_shared_conn = None
+_conn_lock = Lock()
+_inflight = BoundedSemaphore(ATHENA_MAX_CONCURRENCY)
 
 def _conn():
+    """프로세스 공용 Athena 연결 (커서는 쿼리마다 새로 열어 스레드 간 공유 가능)"""
+    global _shared_conn
+    if _shared_conn is not None:
+        return _shared_conn
+    with _conn_lock:
+        if _shared_conn is not None:
+            return _shared_conn
+        try:
+            _shared_conn = connect(
+                s3_staging_dir=os.getenv("ATHENA_STAGING_DIR"),
+                region_name=os.getenv("AWS_REGION", "ap-northeast-2"),
+                work_group=os.getenv("ATHENA_WORKGROUP", "primary"),
+            )
+        except Exception as e:
+            # Athena 연결 자체가 안되면 바로 fallback
+            print(f"❌ Athena connection failed: {e}")
+            return None
+    return _shared_conn
+
+def _reuse_kwargs(reuse_minutes: Optional[int] = None) -> Dict[str, Any]:
+    """SELECT 결과 재사용 옵션 (Athena engine v3 필요)"""
+    minutes = ATHENA_RESULT_REUSE_MINUTES if reuse_minutes is None else reuse_minutes
+    if minutes <= 0:
+        return {}
+    return {"result_reuse_enable": True, "result_reuse_minutes": minutes}
+
+def _run_query(
+    q: str, fetch: bool = True, reuse_minutes: Optional[int] = None
+) -> Optional[List[Tuple]]:
+    """
+    쿼리 1건 실행 (완료까지 대기). 실패 시 예외 전파
+    - 동시 실행 수는 ATHENA_MAX_CONCURRENCY 로 제한
+    - fetch=True(SELECT)일 때만 결과 재사용 옵션 적용
+    """
+    conn = _conn()
+    if conn is None:
+        raise ConnectionError("Athena connection unavailable")
+    with _inflight:
+        with conn.cursor() as cur:
+            if not fetch:
+                cur.execute(q)
+                return None
+            cur.execute(q, **_reuse_kwargs(reuse_minutes))
+            return cur.fetchall()
+
+def fetch_arrow(q: str, reuse_minutes: Optional[int] = None):
+    """
+    쿼리 결과를 pyarrow.Table 로 한 번에 로드 (ArrowCursor)
+    - pyarrow 미설치 시 None → 호출 측에서 행 단위 경로로 fallback
+    - ATHENA_ARROW_UNLOAD=true 면 UNLOAD(Parquet) 결과를 직접 읽음
+      (pyathena 가 "UNLOAD (쿼리) TO ..." 로 감싸므로 끝의 ';' 는 제거)
+    """
     try:
-        return connect(
-            s3_staging_dir=os.getenv("ATHENA_STAGING_DIR"),
-            region_name=os.getenv("AWS_REGION", "ap-northeast-2"),
-            work_group=os.getenv("ATHENA_WORKGROUP", "primary"),
-        )
-    except Exception as e:
-        # Athena 연결 자체가 안되면 바로 fallback
-        print(f"❌ Athena connection failed: {e}")
+        from pyathena.arrow.cursor import ArrowCursor
+    except ImportError:
+        print("⚠️ pyarrow not installed → row cursor fallback")
         return None
 
+    conn = _conn()
+    if conn is None:
+        raise ConnectionError("Athena connection unavailable")
+    with _inflight:
+        with conn.cursor(ArrowCursor, unload=ATHENA_ARROW_UNLOAD) as cur:
+            return cur.execute(q.strip().rstrip(";"), **_reuse_kwargs(reuse_minutes)).as_arrow()
+
+def fetch_frame(q: str, reuse_minutes: Optional[int] = None):
+    """fetch_arrow 결과를 pandas DataFrame 으로 반환 (pyarrow 미설치 시 None)"""
+    table = fetch_arrow(q, reuse_minutes)
+    return table.to_pandas() if table is not None else None
+
+def _fetch_rows(q: str) -> List[Tuple]:
+    """
+    ATHENA_FETCH_MODE 에 따라 행 목록 조회
+    arrow 도 결과는 행 튜플로 바꿔 반환 (KPI 결과는 카페당 1행이라 이득은 결과 다운로드 단계뿐,
+    컬럼 그대로 쓰려면 fetch_arrow / fetch_frame 사용)
+    """
+    if ATHENA_FETCH_MODE == "arrow":
+        table = fetch_arrow(q)
+        if table is not None:
+            return list(zip(*table.to_pydict().values()))
+    return _run_query(q)
+
 def prev_month_range(ref_dt: Optional[datetime] = None) -> Tuple[date, date]:
     ref_dt = ref_dt or datetime.now(KST)
     y, m = ref_dt.year, ref_dt.month
@@ -28,113 +124,450 @@ def prev_month_range(ref_dt: Optional[datetime] = None) -> Tuple[date, date]:
            - timedelta(days=1))
     return start, end
 
-def fetch_monthly_metrics(cafe_id: int, ref_dt: Optional[datetime] = None) -> Dict[str, Any]:
+def _month_label(start: date) -> str:
+    return f"{start.year}-{start.month:02d}"
+
+def _default_kpis() -> Dict[str, Any]:
+    return {
+        "visits": 0,
+        "newCustomers": 0,
+        "revisitRate": 0.0,
+        "couponUseRate": 0.0,
+        "challengeJoin": 0,
+    }
+
+def _row_to_kpis(row) -> Dict[str, Any]:
+    """(visits, new_customers, revisit_rate, coupon_use_rate, challenge_join) → KPI dict"""
+    return {
+        "visits": int(row[0] or 0),
+        "newCustomers": int(row[1] or 0),
+        "revisitRate": float(row[2] or 0.0),
+        "couponUseRate": float(row[3] or 0.0),
+        "challengeJoin": int(row[4] or 0),
+    }
+
+def _default_metrics(start: date) -> Dict[str, Any]:
+    """Athena 실패/데이터 없음 시 반환할 안전한 기본값"""
+    return {"month": _month_label(start), "kpis": _default_kpis()}
+
+def _cafe_filter(cafe_ids: Optional[List[int]]) -> str:
+    """cafe_ids가 None이면 전체 카페, 아니면 IN 조건"""
+    if cafe_ids is None:
+        return "TRUE"
+    ids = ", ".join(str(int(c)) for c in cafe_ids)
+    return f"cafe_id IN ({ids})"
+
+def _first_visit_cte(cafe_filter: str, start_dt: str, end_dt: str, mode: str) -> str:
     """
-    전달 기준 월간 KPI 조회
-    실패하면 빈 KPI를 반환 (서비스는 죽지 않음)
+    first_visit CTE 본문
+    - scan: 파티션 필터 없이 전체 이력 스캔 (테이블이 없어도 동작)
+    - table: first_month 파티션만 읽으므로 비용이 조회 기간에 비례
     """
-    start, end = prev_month_range(ref_dt) 
-    start_dt = start.strftime("%Y-%m-%d")
-    end_dt = end.strftime("%Y-%m-%d")
-    cafe_id = int(cafe_id)
+    if mode == "table":
+        return f"""
+      SELECT cafe_id, user_id, first_date
+      FROM {ATHENA_DB}.{FIRST_VISIT_TABLE}
+      WHERE {cafe_filter}
+        AND first_month BETWEEN '{start_dt[:7]}' AND '{end_dt[:7]}'"""
+    if mode != "scan":
+        raise ValueError(f"unknown first_visit mode: {mode}")
+    return f"""
+      SELECT cafe_id, user_id, MIN(DATE(visited_at)) AS first_date
+      FROM {ATHENA_DB}.visits_table
+      WHERE {cafe_filter}
+      GROUP BY cafe_id, user_id"""
 
-    q = f"""
+def _bucket_sql(start_dt: str, end_dt: str, by_month: bool) -> Tuple[str, str]:
+    """
+    (버킷 컬럼 식, 신규 고객 판정 조건)
+    - by_month: dt 파티션의 연월("YYYY-MM")로 버킷, 첫 방문 월이 같으면 신규
+    - 아니면 기간 전체가 하나의 버킷(start_dt), 첫 방문일이 기간 안이면 신규
+    """
+    if by_month:
+        return "substr(dt, 1, 7)", "date_format(fv.first_date, '%Y-%m') = uc.bucket"
+    return f"'{start_dt}'", f"fv.first_date BETWEEN DATE '{start_dt}' AND DATE '{end_dt}'"
+
+def _build_metrics_query(
+    cafe_ids: Optional[List[int]],
+    start_dt: str,
+    end_dt: str,
+    first_visit_mode: str = "scan",
+    by_month: bool = False,
+) -> str:
+    """
+    카페별(by_month면 카페×월별) KPI를 한 번의 스캔으로 계산하는 쿼리
+    컬럼 순서: cafe_id, bucket, visits, new_customers, revisit_rate, coupon_use_rate, challenge_join
+    """
+    cafe_filter = _cafe_filter(cafe_ids)
+    first_visit = _first_visit_cte(cafe_filter, start_dt, end_dt, first_visit_mode)
+    bucket, is_new = _bucket_sql(start_dt, end_dt, by_month)
+    return f"""
     WITH visits AS (
-      SELECT user_id, DATE(visited_at) AS v_date
+      SELECT cafe_id, {bucket} AS bucket, user_id, DATE(visited_at) AS v_date
       FROM {ATHENA_DB}.visits_table
-      WHERE cafe_id = {cafe_id}
-        AND dt BETWEEN '{start_dt}' AND '{end_dt}'     
+      WHERE {cafe_filter}
+        AND dt BETWEEN '{start_dt}' AND '{end_dt}'
     ),
-    first_visit AS (
-      SELECT user_id, MIN(DATE(visited_at)) AS first_date
-      FROM {ATHENA_DB}.visits_table
-      WHERE cafe_id = {cafe_id}
-      GROUP BY user_id
+    first_visit AS ({first_visit}
+    ),
+    user_counts AS (
+      SELECT cafe_id, bucket, user_id, COUNT(*) AS c
+      FROM visits
+      GROUP BY cafe_id, bucket, user_id
     ),
-    month_users AS (
-      SELECT DISTINCT user_id FROM visits
+    visit_stats AS (
+      SELECT
+        uc.cafe_id,
+        uc.bucket,
+        SUM(uc.c) AS visits,
+        COUNT(*) AS month_users,
+        COUNT_IF(uc.c >= 2) AS returning_users,
+        COUNT_IF({is_new}) AS new_customers
+      FROM user_counts uc
+      LEFT JOIN first_visit fv
+        ON uc.cafe_id = fv.cafe_id AND uc.user_id = fv.user_id
+      GROUP BY uc.cafe_id, uc.bucket
     ),
-    new_users AS (
-      SELECT mu.user_id
-      FROM month_users mu
-      JOIN first_visit fv ON mu.user_id = fv.user_id
-      WHERE fv.first_date BETWEEN DATE '{start_dt}' AND DATE '{end_dt}'
+    coupon_stats AS (
+      SELECT cafe_id, {bucket} AS bucket, COUNT(*) AS issued, COUNT(used_at) AS used
+      FROM {ATHENA_DB}.coupons
+      WHERE {cafe_filter}
+        AND dt BETWEEN '{start_dt}' AND '{end_dt}'
+      GROUP BY 1, 2
     ),
-    user_counts AS (
-      SELECT user_id, COUNT(*) AS c FROM visits GROUP BY user_id
+    chg AS (
+      SELECT cafe_id, {bucket} AS bucket, COUNT(*) AS joined
+      FROM {ATHENA_DB}.challenge_participants
+      WHERE {cafe_filter}
+        AND dt BETWEEN '{start_dt}' AND '{end_dt}'
+      GROUP BY 1, 2
     ),
-    returning_users AS (
-      SELECT user_id FROM user_counts WHERE c >= 2
+    cafes AS (
+      SELECT cafe_id, bucket FROM visit_stats
+      UNION SELECT cafe_id, bucket FROM coupon_stats
+      UNION SELECT cafe_id, bucket FROM chg
+    )
+    SELECT
+      c.cafe_id,
+      c.bucket,
+      COALESCE(vs.visits, 0) AS visits,
+      COALESCE(vs.new_customers, 0) AS new_customers,
+      CAST(vs.returning_users AS DOUBLE) / NULLIF(vs.month_users, 0) AS revisit_rate,
+      CAST(cs.used AS DOUBLE) / NULLIF(cs.issued, 0) AS coupon_use_rate,
+      COALESCE(ch.joined, 0) AS challenge_join
+    FROM cafes c
+    LEFT JOIN visit_stats vs ON c.cafe_id = vs.cafe_id AND c.bucket = vs.bucket
+    LEFT JOIN coupon_stats cs ON c.cafe_id = cs.cafe_id AND c.bucket = cs.bucket
+    LEFT JOIN chg ch ON c.cafe_id = ch.cafe_id AND c.bucket = ch.bucket;
+    """
+
+def _build_rollup_metrics_query(
+    cafe_ids: Optional[List[int]],
+    start_dt: str,
+    end_dt: str,
+    first_visit_mode: str = "table",
+    by_month: bool = False,
+) -> str:
+    """
+    일별 롤업 테이블(utils/athena_tables.py)로 기간 KPI를 계산하는 쿼리
+    컬럼 순서는 _build_metrics_query 와 동일
+    - 방문/쿠폰/챌린지: cafe_daily_rollup (카페당 하루 1행)
+    - 재방문율: cafe_user_daily_rollup (사용자별 일 방문수를 기간 합산)
+    """
+    cafe_filter = _cafe_filter(cafe_ids)
+    first_visit = _first_visit_cte(cafe_filter, start_dt, end_dt, first_visit_mode)
+    bucket, is_new = _bucket_sql(start_dt, end_dt, by_month)
+    return f"""
+    WITH daily AS (
+      SELECT
+        cafe_id,
+        {bucket} AS bucket,
+        SUM(visits) AS visits,
+        SUM(coupons_issued) AS issued,
+        SUM(coupons_used) AS used,
+        SUM(challenge_joins) AS joined
+      FROM {ATHENA_DB}.{DAILY_ROLLUP_TABLE}
+      WHERE {cafe_filter}
+        AND dt BETWEEN '{start_dt}' AND '{end_dt}'
+      GROUP BY 1, 2
     ),
-    coupon_use AS (
-      SELECT COUNT(*) AS used
-      FROM  {ATHENA_DB}.coupons
-      WHERE cafe_id = {cafe_id}
-        AND dt BETWEEN '{start_dt}' AND '{end_dt}'   
-        AND used_at IS NOT NULL
+    user_counts AS (
+      SELECT cafe_id, {bucket} AS bucket, user_id, SUM(visits) AS c
+      FROM {ATHENA_DB}.{USER_DAILY_ROLLUP_TABLE}
+      WHERE {cafe_filter}
+        AND dt BETWEEN '{start_dt}' AND '{end_dt}'
+      GROUP BY 1, 2, 3
     ),
-    coupon_issued AS (
-      SELECT COUNT(*) AS issued
-      FROM  {ATHENA_DB}.coupons
-      WHERE cafe_id = {cafe_id}
-        AND dt BETWEEN '{start_dt}' AND '{end_dt}'   
+    first_visit AS ({first_visit}
     ),
-    chg AS (
-      SELECT COUNT(*) AS joined
-      FROM  {ATHENA_DB}.challenge_participants
-      WHERE cafe_id = {cafe_id}
-        AND dt BETWEEN '{start_dt}' AND '{end_dt}' 
+    user_stats AS (
+      SELECT
+        uc.cafe_id,
+        uc.bucket,
+        COUNT(*) AS period_users,
+        COUNT_IF(uc.c >= 2) AS returning_users,
+        COUNT_IF({is_new}) AS new_customers
+      FROM user_counts uc
+      LEFT JOIN first_visit fv
+        ON uc.cafe_id = fv.cafe_id AND uc.user_id = fv.user_id
+      GROUP BY uc.cafe_id, uc.bucket
     )
     SELECT
-      (SELECT COUNT(*) FROM visits) AS visits,
-      (SELECT COUNT(*) FROM new_users) AS new_customers,
-      (
-        SELECT CAST(COUNT(*) AS DOUBLE)
-               / NULLIF((SELECT COUNT(*) FROM month_users), 0)
-        FROM returning_users
-      ) AS revisit_rate,                             
-      (
-        SELECT CAST(cu.used AS DOUBLE) / NULLIF(ci.issued, 0)
-        FROM coupon_use cu CROSS JOIN coupon_issued ci
-      ) AS coupon_use_rate,
-      (SELECT joined FROM chg) AS challenge_join;
-    """
-
-    # 안전한 기본값 (Athena 실패 시 반환)
-    default_metrics = {
-        "month": f"{start.year}-{start.month:02d}",
-        "kpis": {
-            "visits": 0,
-            "newCustomers": 0,
-            "revisitRate": 0.0,
-            "couponUseRate": 0.0,
-            "challengeJoin": 0,
-        },
-    }
+      d.cafe_id,
+      d.bucket,
+      COALESCE(d.visits, 0) AS visits,
+      COALESCE(us.new_customers, 0) AS new_customers,
+      CAST(us.returning_users AS DOUBLE) / NULLIF(us.period_users, 0) AS revisit_rate,
+      CAST(d.used AS DOUBLE) / NULLIF(d.issued, 0) AS coupon_use_rate,
+      COALESCE(d.joined, 0) AS challenge_join
+    FROM daily d
+    LEFT JOIN user_stats us ON d.cafe_id = us.cafe_id AND d.bucket = us.bucket;
+    """
+
+def _first_visit_mode(first_visit_mode: Optional[str], source: str) -> str:
+    """인자 > ATHENA_FIRST_VISIT_MODE > source 기본값 (rollup 은 table, raw 는 scan)"""
+    return first_visit_mode or FIRST_VISIT_MODE or ("table" if source == "rollup" else "scan")
 
+def _query_metric_rows(
+    cafe_ids: Optional[List[int]],
+    start: date,
+    end: date,
+    first_visit_mode: str = "scan",
+    source: str = "raw",
+    by_month: bool = False,
+) -> Optional[List[Tuple]]:
+    """
+    KPI 쿼리 실행 후 원본 행 반환. 실패 시 None (기본값과 구분하기 위해)
+    source: "raw"(원본 이벤트 테이블) | "rollup"(일별 롤업 테이블)
+    """
+    if source == "rollup":
+        build = _build_rollup_metrics_query
+    elif source == "raw":
+        build = _build_metrics_query
+    else:
+        raise ValueError(f"unknown KPI source: {source}")
+    q = build(
+        cafe_ids, start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"), first_visit_mode, by_month
+    )
     try:
-        conn = _conn()
-        if conn is None:
-            return default_metrics
+        return _fetch_rows(q)
+    except (ClientError, BotoCoreError, Exception) as e:
+        print(f"❌ Athena query failed: {e}")
+        return None
 
-        with conn.cursor() as cur:
-            cur.execute(q)
-            row = cur.fetchone()
+def _query_metrics(
+    cafe_ids: Optional[List[int]],
+    start: date,
+    end: date,
+    first_visit_mode: str = "scan",
+    source: str = "raw",
+) -> Optional[Dict[int, Dict[str, Any]]]:
+    """기간 전체를 하나로 집계한 카페별 KPI. 반환: {cafe_id: kpis}, 실패 시 None"""
+    rows = _query_metric_rows(cafe_ids, start, end, first_visit_mode, source)
+    if rows is None:
+        return None
+    return {int(row[0]): _row_to_kpis(row[2:]) for row in rows}
 
-        if not row:
+def fetch_monthly_metrics_batch(
+    cafe_ids: Optional[List[int]] = None,
+    ref_dt: Optional[datetime] = None,
+    use_cache: bool = True,
+    first_visit_mode: Optional[str] = None,
+    source: Optional[str] = None,
+) -> Dict[int, Dict[str, Any]]:
+    """
+    여러 카페의 전달 월간 KPI를 한 번의 Athena 쿼리로 조회
+    - cafe_ids=None 이면 데이터가 있는 전체 카페
+    - use_cache=True면 끝난 달의 KPI는 캐시에서 읽고, 없는 카페만 Athena 조회
+    - first_visit_mode: "scan" | "table" (기본값 ATHENA_FIRST_VISIT_MODE, 미설정 시 rollup 이면 table / raw 면 scan)
+    - source: "raw" | "rollup" (기본값 ATHENA_KPI_SOURCE)
+    - 결과에 없는 카페(또는 Athena 실패)는 빈 KPI로 채움 (서비스는 죽지 않음)
+    - 단 cafe_ids=None 에서 Athena 가 실패하면 대상 카페를 알 수 없으므로 RuntimeError
+      (빈 결과로 "0개 카페 처리 완료" 처럼 보이지 않도록)
+    반환: {cafe_id: {"month": ..., "kpis": {...}}}
+    """
+    start, end = prev_month_range(ref_dt)
+    month = _month_label(start)
+    if cafe_ids is not None:
+        cafe_ids = sorted({int(c) for c in cafe_ids})
+        if not cafe_ids:
+            return {}
+
+    source = source or KPI_SOURCE
+    query_path = {"source": source, "first_visit_mode": _first_visit_mode(first_visit_mode, source)}
+    cache = get_kpi_cache() if use_cache else None
+    results: Dict[int, Dict[str, Any]] = {}
+    missing = cafe_ids
+    if cache is not None and cafe_ids is not None:
+        for cafe_id in cafe_ids:
+            cached = cache.get(cafe_id, month, **query_path)
+            if cached is not None:
+                results[cafe_id] = cached
+        missing = [c for c in cafe_ids if c not in results]
+        if not missing:
+            return results
+
+    kpis_by_cafe = _query_metrics(missing, start, end, query_path["first_visit_mode"], source)
+    if kpis_by_cafe is None:
+        if cafe_ids is None:
+            raise RuntimeError(f"Athena KPI query failed for {month}: cannot list cafes")
+        # Athena 실패 → 기본값은 캐시에 남기지 않음
+        for cafe_id in missing or []:
+            results[cafe_id] = _default_metrics(start)
+        return results
+
+    queried = {cafe_id: {"month": month, "kpis": kpis} for cafe_id, kpis in kpis_by_cafe.items()}
+    for cafe_id in missing or []:
+        if cafe_id not in queried:
             print(f"⚠️ No data returned for cafe_id={cafe_id}")
-            return default_metrics
-
-        return {
-            "month": f"{start.year}-{start.month:02d}",
-            "kpis": {
-                "visits": int(row[0] or 0),
-                "newCustomers": int(row[1] or 0),
-                "revisitRate": float(row[2] or 0.0),
-                "couponUseRate": float(row[3] or 0.0),
-                "challengeJoin": int(row[4] or 0),
-            },
+            queried[cafe_id] = _default_metrics(start)
+    if cache is not None:
+        for cafe_id, metrics in queried.items():
+            cache.put(cafe_id, month, metrics, **query_path)
+    results.update(queried)
+    return results
+
+def fetch_monthly_metrics(
+    cafe_id: int,
+    ref_dt: Optional[datetime] = None,
+    use_cache: bool = True,
+    first_visit_mode: Optional[str] = None,
+    source: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    전달 기준 월간 KPI 조회
+    실패하면 빈 KPI를 반환 (서비스는 죽지 않음)
+    """
+    cafe_id = int(cafe_id)
+    return fetch_monthly_metrics_batch(
+        [cafe_id], ref_dt, use_cache=use_cache, first_visit_mode=first_visit_mode, source=source
+    )[cafe_id]
+
+def month_range(start_month: str, end_month: str) -> List[str]:
+    """"YYYY-MM" ~ "YYYY-MM" (양 끝 포함) 월 목록"""
+    y, m = (int(p) for p in start_month.split("-"))
+    end_y, end_m = (int(p) for p in end_month.split("-"))
+    months = []
+    while (y, m) <= (end_y, end_m):
+        months.append(f"{y}-{m:02d}")
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return months
+
+def _month_bounds(month: str) -> Tuple[date, date]:
+    y, m = (int(p) for p in month.split("-"))
+    start = date(y, m, 1)
+    end = (date(y + 1, 1, 1) if m == 12 else date(y, m + 1, 1)) - timedelta(days=1)
+    return start, end
+
+def fetch_monthly_metrics_series(
+    cafe_ids: Optional[List[int]],
+    start_month: str,
+    end_month: str,
+    use_cache: bool = True,
+    first_visit_mode: Optional[str] = None,
+    source: Optional[str] = None,
+) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    start_month ~ end_month 월별 KPI 시계열을 월 버킷 쿼리 한 번으로 조회 (백필용)
+    - cafe_ids=None 이면 데이터가 있는 전체 카페
+    - use_cache=True면 캐시에 없는 (카페, 월)이 있는 카페만 Athena 조회, 끝난 달은 캐시에 기록
+    - 데이터 없는 달 / Athena 실패는 빈 KPI (실패 결과는 캐시하지 않음)
+    - first_visit_mode 기본값은 fetch_monthly_metrics_batch 와 같음 (rollup 이면 table)
+    반환: {cafe_id: [{"month": "YYYY-MM", "kpis": {...}}, ...]} (월 오름차순)
+    """
+    months = month_range(start_month, end_month)
+    if not months:
+        return {}
+    if cafe_ids is not None:
+        cafe_ids = sorted({int(c) for c in cafe_ids})
+        if not cafe_ids:
+            return {}
+
+    source = source or KPI_SOURCE
+    query_path = {"source": source, "first_visit_mode": _first_visit_mode(first_visit_mode, source)}
+    cache = get_kpi_cache() if use_cache else None
+    found: Dict[int, Dict[str, Dict[str, Any]]] = {}
+    targets = cafe_ids
+    if cache is not None and cafe_ids is not None:
+        for cafe_id in cafe_ids:
+            for month in months:
+                cached = cache.get(cafe_id, month, **query_path)
+                if cached is not None:
+                    found.setdefault(cafe_id, {})[month] = cached
+        targets = [c for c in cafe_ids if len(found.get(c, {})) < len(months)]
+
+    if targets is None or targets:
+        start, _ = _month_bounds(months[0])
+        _, end = _month_bounds(months[-1])
+        rows = _query_metric_rows(
+            targets, start, end, query_path["first_visit_mode"], source, by_month=True,
+        )
+        if rows is not None:
+            queried: Dict[int, Dict[str, Dict[str, Any]]] = {}
+            for row in rows:
+                cafe_id, month = int(row[0]), str(row[1])
+                queried.setdefault(cafe_id, {})[month] = {"month": month, "kpis": _row_to_kpis(row[2:])}
+            for cafe_id in targets if targets is not None else list(queried):
+                by_month = queried.setdefault(cafe_id, {})
+                for month in months:
+                    by_month.setdefault(month, {"month": month, "kpis": _default_kpis()})
+                    if cache is not None:
+                        cache.put(cafe_id, month, by_month[month], **query_path)
+                found.setdefault(cafe_id, {}).update(by_month)
+
+    series: Dict[int, List[Dict[str, Any]]] = {}
+    for cafe_id in cafe_ids if cafe_ids is not None else sorted(found):
+        by_month = found.get(cafe_id, {})
+        series[cafe_id] = [
+            by_month.get(month) or {"month": month, "kpis": _default_kpis()} for month in months
+        ]
+    return series
+
+def add_kpi_deltas(series: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    월별 KPI 시계열에 전월 대비(mom) / 전년 동월 대비(yoy) 차이를 추가
+    비교 대상 월이 시계열에 없으면 해당 키는 None
+    """
+    by_month = {item["month"]: item["kpis"] for item in series}
+
+    def _shift(month: str, months_back: int) -> str:
+        y, m = (int(p) for p in month.split("-"))
+        idx = y * 12 + (m - 1) - months_back
+        return f"{idx // 12}-{idx % 12 + 1:02d}"
+
+    def _diff(cur: Dict[str, Any], base: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if base is None:
+            return None
+        return {k: round(cur[k] - base.get(k, 0), 4) for k in cur}
+
+    return [
+        {
+            **item,
+            "mom": _diff(item["kpis"], by_month.get(_shift(item["month"], 1))),
+            "yoy": _diff(item["kpis"], by_month.get(_shift(item["month"], 12))),
         }
-    except (ClientError, BotoCoreError, Exception) as e:
-        print(f"❌ Athena query failed: {e}")
-        return default_metrics
+        for item in series
+    ]
+
+def fetch_range_metrics(
+    cafe_ids: Optional[List[int]],
+    start: date,
+    end: date,
+    first_visit_mode: Optional[str] = None,
+) -> Dict[int, Dict[str, Any]]:
+    """
+    임의 기간(start ~ end, 양 끝 포함) KPI를 일별 롤업에서 조회
+    - 롤업은 카페당 하루 1행이라 기간이 길어도 스캔량이 작음
+    - first_visit_mode 기본값은 "table" (롤업 경로에서 원본 전체 스캔을 피하기 위해)
+    반환: {cafe_id: {"start": ..., "end": ..., "kpis": {...}}}
+    """
+    if cafe_ids is not None:
+        cafe_ids = sorted({int(c) for c in cafe_ids})
+        if not cafe_ids:
+            return {}
+    label = {"start": start.strftime("%Y-%m-%d"), "end": end.strftime("%Y-%m-%d")}
+    kpis_by_cafe = _query_metrics(cafe_ids, start, end, first_visit_mode or "table", "rollup") or {}
+    results = {cafe_id: {**label, "kpis": kpis} for cafe_id, kpis in kpis_by_cafe.items()}
+    for cafe_id in cafe_ids or []:
+        results.setdefault(cafe_id, {**label, "kpis": _default_kpis()})
+    return results
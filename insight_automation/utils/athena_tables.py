@@ -0,0 +1,186 @@
+# KPI 쿼리 비용을 줄이기 위한 Athena 파생 테이블 관리
+# - user_first_visit: (cafe_id, user_id) 별 첫 방문일, first_month 파티션
+#   최초 1회 build 후 매달 extend 로 증분 추가
+# - cafe_daily_rollup / cafe_user_daily_rollup: 카페(사용자)별 일 집계, dt 파티션
+#   하루 1회 write_daily_rollups 로 기록
+import os
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from insight_automation.utils.athena import (
+    ATHENA_DB, DAILY_ROLLUP_TABLE, FIRST_VISIT_TABLE, KST, USER_DAILY_ROLLUP_TABLE,
+    _run_query, prev_month_range,
+)
+
+# CTAS 결과 저장 위치 (미설정 시 워크그룹 기본 위치 사용)
+ATHENA_TABLES_LOCATION = os.getenv("ATHENA_TABLES_LOCATION")
+
+
+def _execute(q: str) -> bool:
+    """DDL/DML 실행. 실패 시 False"""
+    try:
+        _run_query(q, fetch=False)
+        return True
+    except Exception as e:
+        print(f"❌ Athena statement failed: {e}")
+        return False
+
+
+def _table_properties(table: str, partitioned_by: str) -> str:
+    props = ["format = 'PARQUET'", f"partitioned_by = ARRAY['{partitioned_by}']"]
+    if ATHENA_TABLES_LOCATION:
+        props.append(f"external_location = '{ATHENA_TABLES_LOCATION.rstrip('/')}/{table}/'")
+    return ",\n      ".join(props)
+
+
+def build_first_visit_table(through: Optional[date] = None) -> bool:
+    """
+    첫 방문일 테이블을 전체 이력으로 1회 생성 (CTAS)
+    through: 포함할 마지막 날짜 (기본값: 전달 말일)
+    """
+    through = through or prev_month_range()[1]
+    q = f"""
+    CREATE TABLE IF NOT EXISTS {ATHENA_DB}.{FIRST_VISIT_TABLE}
+    WITH (
+      {_table_properties(FIRST_VISIT_TABLE, "first_month")}
+    ) AS
+    SELECT
+      cafe_id,
+      user_id,
+      MIN(DATE(visited_at)) AS first_date,
+      date_format(MIN(DATE(visited_at)), '%Y-%m') AS first_month
+    FROM {ATHENA_DB}.visits_table
+    WHERE dt <= '{through.strftime("%Y-%m-%d")}'
+    GROUP BY cafe_id, user_id
+    """
+    ok = _execute(q)
+    print(f"{'✅' if ok else '❌'} first visit table build through {through}")
+    return ok
+
+
+def extend_first_visit_table(ref_dt: Optional[datetime] = None, since: Optional[date] = None) -> bool:
+    """
+    전달(또는 since ~ 전달 말일) 방문 중 테이블에 없는 (cafe_id, user_id)만 추가
+    - 이미 있는 사용자는 제외하므로 같은 달을 다시 돌려도 중복되지 않음
+    - 한 달 이상 밀렸다면 since 로 누락 구간 시작일을 지정
+    - 월간 KPI 쿼리(first_visit_mode="table") 전에 실행해야 함
+    """
+    start, end = prev_month_range(ref_dt)
+    start = since or start
+    q = f"""
+    INSERT INTO {ATHENA_DB}.{FIRST_VISIT_TABLE}
+    SELECT n.cafe_id, n.user_id, n.first_date, date_format(n.first_date, '%Y-%m') AS first_month
+    FROM (
+      SELECT cafe_id, user_id, MIN(DATE(visited_at)) AS first_date
+      FROM {ATHENA_DB}.visits_table
+      WHERE dt BETWEEN '{start.strftime("%Y-%m-%d")}' AND '{end.strftime("%Y-%m-%d")}'
+      GROUP BY cafe_id, user_id
+    ) n
+    LEFT JOIN {ATHENA_DB}.{FIRST_VISIT_TABLE} fv
+      ON n.cafe_id = fv.cafe_id AND n.user_id = fv.user_id
+    WHERE fv.user_id IS NULL
+    """
+    ok = _execute(q)
+    print(f"{'✅' if ok else '❌'} first visit table extended {start} ~ {end}")
+    return ok
+
+
+def create_rollup_tables() -> bool:
+    """일별 롤업 테이블 2개를 빈 상태로 생성 (CTAS WITH NO DATA)"""
+    daily = f"""
+    CREATE TABLE IF NOT EXISTS {ATHENA_DB}.{DAILY_ROLLUP_TABLE}
+    WITH (
+      {_table_properties(DAILY_ROLLUP_TABLE, "dt")}
+    ) AS
+    SELECT
+      CAST(NULL AS BIGINT) AS cafe_id,
+      CAST(NULL AS BIGINT) AS visits,
+      CAST(NULL AS BIGINT) AS visitors,
+      CAST(NULL AS BIGINT) AS coupons_issued,
+      CAST(NULL AS BIGINT) AS coupons_used,
+      CAST(NULL AS BIGINT) AS challenge_joins,
+      CAST(NULL AS VARCHAR) AS dt
+    WITH NO DATA
+    """
+    user_daily = f"""
+    CREATE TABLE IF NOT EXISTS {ATHENA_DB}.{USER_DAILY_ROLLUP_TABLE}
+    WITH (
+      {_table_properties(USER_DAILY_ROLLUP_TABLE, "dt")}
+    ) AS
+    SELECT
+      CAST(NULL AS BIGINT) AS cafe_id,
+      CAST(NULL AS BIGINT) AS user_id,
+      CAST(NULL AS BIGINT) AS visits,
+      CAST(NULL AS VARCHAR) AS dt
+    WITH NO DATA
+    """
+    return _execute(daily) and _execute(user_daily)
+
+
+def write_daily_rollups(day: Optional[date] = None) -> bool:
+    """
+    하루치 원본 이벤트를 카페별/사용자별 일 집계로 기록 (기본값: 어제)
+    - 해당 dt 파티션이 이미 있으면 아무것도 쓰지 않으므로 재실행해도 중복되지 않음
+    """
+    day = day or (datetime.now(KST).date() - timedelta(days=1))
+    dt = day.strftime("%Y-%m-%d")
+    daily = f"""
+    INSERT INTO {ATHENA_DB}.{DAILY_ROLLUP_TABLE}
+    SELECT
+      cafe_id,
+      SUM(visits) AS visits,
+      SUM(visitors) AS visitors,
+      SUM(coupons_issued) AS coupons_issued,
+      SUM(coupons_used) AS coupons_used,
+      SUM(challenge_joins) AS challenge_joins,
+      '{dt}' AS dt
+    FROM (
+      SELECT cafe_id, COUNT(*) AS visits, COUNT(DISTINCT user_id) AS visitors,
+             0 AS coupons_issued, 0 AS coupons_used, 0 AS challenge_joins
+      FROM {ATHENA_DB}.visits_table
+      WHERE dt = '{dt}'
+      GROUP BY cafe_id
+      UNION ALL
+      SELECT cafe_id, 0, 0, COUNT(*), COUNT(used_at), 0
+      FROM {ATHENA_DB}.coupons
+      WHERE dt = '{dt}'
+      GROUP BY cafe_id
+      UNION ALL
+      SELECT cafe_id, 0, 0, 0, 0, COUNT(*)
+      FROM {ATHENA_DB}.challenge_participants
+      WHERE dt = '{dt}'
+      GROUP BY cafe_id
+    ) t
+    WHERE NOT EXISTS (
+      SELECT 1 FROM {ATHENA_DB}.{DAILY_ROLLUP_TABLE} WHERE dt = '{dt}'
+    )
+    GROUP BY cafe_id
+    """
+    user_daily = f"""
+    INSERT INTO {ATHENA_DB}.{USER_DAILY_ROLLUP_TABLE}
+    SELECT cafe_id, user_id, COUNT(*) AS visits, '{dt}' AS dt
+    FROM {ATHENA_DB}.visits_table
+    WHERE dt = '{dt}'
+      AND NOT EXISTS (
+        SELECT 1 FROM {ATHENA_DB}.{USER_DAILY_ROLLUP_TABLE} WHERE dt = '{dt}'
+      )
+    GROUP BY cafe_id, user_id
+    """
+    ok = _execute(daily) and _execute(user_daily)
+    print(f"{'✅' if ok else '❌'} daily rollups written for {dt}")
+    return ok
+
+
+if __name__ == "__main__":
+    import sys
+
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "extend"
+    if cmd == "build":
+        build_first_visit_table()
+    elif cmd == "create-rollups":
+        create_rollup_tables()
+    elif cmd == "rollup":
+        day = date.fromisoformat(sys.argv[2]) if len(sys.argv) > 2 else None
+        write_daily_rollups(day)
+    else:
+        extend_first_visit_table()
@@ -0,0 +1,101 @@
+import os
+import json
+import tempfile
+from typing import Any, Dict, Optional
+from botocore.exceptions import ClientError
+
+DEFAULT_CACHE_ROOT = os.path.join(tempfile.gettempdir(), "loopy_cache")
+
+
+class LocalDiskBackend:
+    """로컬 디스크에 key 단위 JSON 파일로 저장하는 캐시 백엔드"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Cache read failed ({key}): {e}")
+            return None
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 부분 기록된 파일을 읽지 않도록 임시 파일에 쓰고 교체
+        # (임시 파일 이름은 쓰기마다 고유 → 같은 프로세스의 여러 스레드가 같은 key 를 써도 충돌 없음)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3Backend:
+    """S3 버킷의 prefix 아래에 key 단위 JSON 객체로 저장하는 캐시 백엔드"""
+
+    def __init__(self, bucket: str, prefix: str = "cache"):
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        from insight_automation.utils.storage import get_s3_client
+
+        try:
+            obj = get_s3_client().get_object(Bucket=self.bucket, Key=self._key(key))
+            return json.loads(obj["Body"].read().decode("utf-8"))
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in ("NoSuchKey", "404"):
+                print(f"⚠️ Cache read failed (s3://{self.bucket}/{self._key(key)}): {e}")
+            return None
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        from insight_automation.utils.storage import get_s3_client
+
+        get_s3_client().put_object(
+            Bucket=self.bucket,
+            Key=self._key(key),
+            Body=json.dumps(value, ensure_ascii=False),
+            ContentType="application/json",
+        )
+
+    def delete(self, key: str) -> None:
+        from insight_automation.utils.storage import get_s3_client
+
+        get_s3_client().delete_object(Bucket=self.bucket, Key=self._key(key))
+
+
+def backend_from_env(kind: str, name: str):
+    """
+    환경변수 값(kind)에 맞는 캐시 백엔드 생성
+    - "local": {CACHE_DIR 또는 tmp}/loopy_cache/{name}
+    - "s3": s3://{CACHE_BUCKET 또는 INSIGHT_BUCKET}/cache/{name}
+    - 그 외("none" 등): None (캐시 비활성화)
+    """
+    kind = (kind or "none").lower()
+    if kind == "local":
+        root = os.getenv("CACHE_DIR", DEFAULT_CACHE_ROOT)
+        return LocalDiskBackend(os.path.join(root, name))
+    if kind == "s3":
+        bucket = os.getenv("CACHE_BUCKET", os.getenv("INSIGHT_BUCKET", "loopy-insight"))
+        return S3Backend(bucket, prefix=f"cache/{name}")
+    return None
@@ -1,28 +1,239 @@
 import json
 import re
-from typing import Any, Dict, List, Tuple
+from json.decoder import scanstring
+from json.scanner import NUMBER_RE
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 
-FENCE_RE = re.compile(r"```(?:json)?(.*?)```", re.DOTALL | re.IGNORECASE)
+WS_RE = re.compile(r"[ \t\n\r]*")
+LITERALS = (("true", True), ("false", False), ("null", None))
 
 
-def _strip_code_fences(text: str) -> str:
-    m = FENCE_RE.search(text)
+class _ScanError(Exception):
+    def __init__(self, pos: int):
+        self.pos = pos
+        # 실패 시점에 열려 있던 괄호 위치 (_scan_container 가 채움)
+        self.open_at: Tuple[int, ...] = ()
+
+
+class _Truncated(Exception):
+    """입력이 값 중간에서 끝남 (max_tokens 로 잘린 LLM 응답)"""
+
+
+def _scan_scalar(s: str, i: int) -> Tuple[Any, int]:
+    """s[i] 에서 시작하는 문자열/숫자/리터럴 하나 → (값, 끝 위치)"""
+    n = len(s)
+    ch = s[i]
+    if ch == '"':
+        try:
+            return scanstring(s, i + 1)
+        except json.JSONDecodeError as e:
+            if e.msg.startswith("Unterminated string"):
+                raise _Truncated()
+            raise _ScanError(e.pos)
+
+    m = NUMBER_RE.match(s, i)
     if m:
-        return m.group(1).strip()
-    return text.strip()
+        end = m.end()
+        if end == n:
+            # 끝에 걸친 숫자는 잘렸을 수 있음 ("12" ← "1234")
+            raise _Truncated()
+        integer, frac, exp = m.groups()
+        return (float(integer + (frac or "") + (exp or "")) if frac or exp else int(integer)), end
+
+    for word, value in LITERALS:
+        if s.startswith(word, i):
+            return value, i + len(word)
+        if n - i < len(word) and word.startswith(s[i:]):
+            raise _Truncated()
+    raise _ScanError(i)
+
+
+def _scan_container(s: str, start: int) -> Tuple[Any, int, Dict[str, bool]]:
+    """
+    s[start] 의 '[' 또는 '{' 부터 짝이 맞는 닫는 괄호까지 한 번에 스캔 (명시적 스택, 재귀/백트래킹 없음)
+    - 트레일링 콤마 허용
+    - 입력이 중간에 끝나면 완성된 원소만 남기고 열린 괄호를 닫아 반환
+    :return: (값, 끝 위치, {"trailing_commas": bool, "truncated": bool})
+    :raises _ScanError: JSON 이 아닌 문자를 만난 위치 (open_at: 그때 열려 있던 괄호 위치)
+    """
+    n = len(s)
+    flags = {"trailing_commas": False, "truncated": False}
+    # 프레임: [컨테이너, 대기 중인 키, 여는 괄호 위치]
+    stack: List[list] = [[[] if s[start] == "[" else {}, None, start]]
+    i = start + 1
+    # 다음에 올 수 있는 토큰: value | first_value | key | first_key | colon | comma
+    # (닫는 괄호는 first_value/first_key/comma, 트레일링 콤마면 value/key 뒤에서도 허용)
+    expect = "first_value" if s[start] == "[" else "first_key"
 
+    def _attach(value: Any) -> Optional[Any]:
+        if not stack:
+            return value
+        frame = stack[-1]
+        if isinstance(frame[0], list):
+            frame[0].append(value)
+        else:
+            frame[0][frame[1]] = value
+            frame[1] = None
+        return None
 
-def _try_json(text: str):
     try:
-        return json.loads(text)
-    except Exception:
+        while True:
+            i = WS_RE.match(s, i).end()
+            if i >= n:
+                raise _Truncated()
+            ch = s[i]
+
+            if expect in ("value", "first_value"):
+                if ch == "]" and isinstance(stack[-1][0], list):
+                    # "[]" 또는 "[1, 2,]"
+                    if expect == "value":
+                        flags["trailing_commas"] = True
+                elif ch in "[{":
+                    stack.append([[] if ch == "[" else {}, None, i])
+                    expect = "first_value" if ch == "[" else "first_key"
+                    i += 1
+                    continue
+                else:
+                    value, i = _scan_scalar(s, i)
+                    _attach(value)
+                    expect = "comma"
+                    continue
+
+            elif expect in ("key", "first_key"):
+                if ch == "}":
+                    if expect == "key":
+                        flags["trailing_commas"] = True
+                elif ch == '"':
+                    key, i = _scan_scalar(s, i)
+                    stack[-1][1] = key
+                    expect = "colon"
+                    continue
+                else:
+                    raise _ScanError(i)
+
+            elif expect == "colon":
+                if ch != ":":
+                    raise _ScanError(i)
+                i += 1
+                expect = "value"
+                continue
+
+            elif expect == "comma":
+                if ch == ",":
+                    i += 1
+                    expect = "value" if isinstance(stack[-1][0], list) else "key"
+                    continue
+                if ch not in "]}":
+                    raise _ScanError(i)
+
+            # 닫는 괄호
+            container = stack[-1][0]
+            if (ch == "]") != isinstance(container, list):
+                raise _ScanError(i)
+            stack.pop()
+            i += 1
+            root = _attach(container)
+            if not stack:
+                return root, i, flags
+            expect = "comma"
+
+    except _ScanError as e:
+        e.open_at = tuple(frame[2] for frame in stack)
+        raise
+
+    except _Truncated:
+        flags["truncated"] = True
+        # 열린 컨테이너를 안쪽부터 닫음: 배열 원소였던 미완성 컨테이너(잘린 레코드)는 버리고,
+        # 객체 필드 값이었던 것은 완성된 부분까지 유지 (대기 중인 키만 있던 항목은 버림)
+        while len(stack) > 1:
+            container = stack.pop()[0]
+            if isinstance(stack[-1][0], dict):
+                _attach(container)
+        return stack[0][0], n, flags
+
+
+def _fenced_block(text: str) -> Optional[str]:
+    """첫 ``` 코드펜스 내용 (닫는 펜스가 없으면 끝까지 - 잘린 응답)"""
+    open_at = text.find("```")
+    if open_at < 0:
         return None
+    body_at = text.find("\n", open_at)
+    if body_at < 0:
+        return ""
+    close_at = text.find("```", body_at)
+    return text[body_at + 1:] if close_at < 0 else text[body_at + 1:close_at]
 
 
-def _fix_trailing_commas(text: str) -> str:
-    text = re.sub(r",\s*([}\]])", r"\1", text)
-    return text
+def _scan_first(text: str, accept: Optional[Callable[[Any], bool]]) -> Tuple[Any, str]:
+    stripped = text.strip()
+    if stripped[:1] in ("[", "{"):
+        # 이미 올바른 JSON 이면 C 디코더로 바로 (가장 흔한 경우)
+        try:
+            value = json.loads(stripped)
+        except (ValueError, RecursionError):
+            pass
+        else:
+            if accept is None or accept(value):
+                return value, "ok"
+
+    i, n = 0, len(text)
+    # 다음 '[' / '{' 위치 (앞으로만 이동하도록 캐시해 find 가 같은 구간을 다시 훑지 않게)
+    next_at = {"[": -1, "{": -1}
+    # 실패한 후보 안에서 같은 위치에서 실패할 것이 확실한 여는 괄호
+    dead: set = set()
+    while i < n:
+        for ch in next_at:
+            if next_at[ch] < i:
+                next_at[ch] = text.find(ch, i)
+                if next_at[ch] < 0:
+                    next_at[ch] = n
+        start = min(next_at.values())
+        if start >= n:
+            break
+        if start in dead:
+            i = start + 1
+            continue
+        try:
+            value, end, flags = _scan_container(text, start)
+        except _ScanError as e:
+            # 실패 시점에 열려 있던 괄호는 거기서 시작해도 같은 토큰을 읽고 같은 위치에서 실패 → 건너뜀
+            # 그 밖의 괄호(문자열 리터럴 안, 이미 닫힌 하위 값)는 다시 시도 ('"[" 뒤의 [ ... ]' 같은 경우)
+            dead.update(e.open_at)
+            i = start + 1
+            continue
+        if accept is not None and not accept(value):
+            i = end
+            continue
+
+        if flags["truncated"]:
+            reason = "salvaged_truncated"
+        elif flags["trailing_commas"]:
+            reason = "fixed_trailing_commas"
+        elif text[:start].strip() or text[end:].strip():
+            reason = "extracted_brackets"
+        else:
+            reason = "ok"
+        return value, reason
+    return None, "failed"
+
+
+def extract_json(text: str, accept: Optional[Callable[[Any], bool]] = None) -> Tuple[Any, str]:
+    """
+    텍스트에서 첫 번째 완전한 JSON 배열/객체를 한 번의 선형 스캔으로 찾아 디코드
+    - 코드펜스가 있으면 펜스 안을 먼저 스캔
+    - accept 가 주어지면 통과하는 첫 값 (예: dict 를 포함한 배열)
+    :return: (값 또는 None, reason)
+      reason: ok | extracted_brackets | fixed_trailing_commas | salvaged_truncated | empty | failed
+    """
+    if not text or not text.strip():
+        return None, "empty"
+    fenced = _fenced_block(text)
+    if fenced is not None:
+        value, reason = _scan_first(fenced, accept)
+        if value is not None:
+            return value, reason
+    return _scan_first(text, accept)
 
 
 def normalize_to_array(data: Any) -> List[Dict]:
@@ -36,28 +247,52 @@ def normalize_to_array(data: Any) -> List[Dict]:
     return []
 
 
-def coerce_json_array(text: str) -> Tuple[List[Dict], str]:
+def _has_dicts(value: Any) -> bool:
+    return isinstance(value, dict) or any(isinstance(x, dict) for x in value)
+
+
+def coerce_json_array(text: Any) -> Tuple[List[Dict], str]:
     """
-    - 코드펜스 제거
-    - JSON 로드
-    - 실패 시 트레일링 콤마 제거 후 재시도
-    - 최종적으로 배열[dict] 반환 (실패 시 빈 배열)
-    - 디버그용 reason 문자열 함께 반환
+    LLM 응답 → 배열[dict] (실패 시 빈 배열) + 디버그용 reason
+    이미 파싱된 list/dict 가 들어오면 그대로 정규화 (reason: already_parsed)
     """
-    raw = _strip_code_fences(text)
-    data = _try_json(raw)
-    if data is not None:
-        return normalize_to_array(data), "ok"
+    if isinstance(text, (list, dict)):
+        return normalize_to_array(text), "already_parsed"
+    if not isinstance(text, str):
+        return [], "failed"
+    data, reason = extract_json(text, accept=_has_dicts)
+    return normalize_to_array(data), reason
+
+
+if __name__ == "__main__":
+    # 벤치마크: 입력 크기를 두 배씩 늘려도 시간이 두 배 정도로만 늘어야 함 (선형)
+    import time
+
+    item = '{"menu": "흑임자 라떼", "description": "고소한 맛", "whyPopular": "건강 트렌드", "price": 5500},\n'
 
-    fixed = _fix_trailing_commas(raw)
-    data2 = _try_json(fixed)
-    if data2 is not None:
-        return normalize_to_array(data2), "fixed_trailing_commas"
+    def _cases(n: int) -> Dict[str, str]:
+        body = item * n
+        return {
+            "valid_fenced": "결과입니다\n```json\n[" + body.rstrip(",\n") + "]\n```",
+            "trailing_commas": "[" + body + "]",
+            "truncated": "[" + body + body[: len(item) // 2],
+            "open_brackets": "[" * n * 10,
+            "unclosed_prose": "참고 [" * n * 10 + "끝",
+            "brackets_in_strings": '[{"a": "' + "[{" * n * 10 + '"}]',
+        }
 
-    bracket_match = re.search(r"(\[.*\]|\{.*\})", raw, re.DOTALL)
-    if bracket_match:
-        data3 = _try_json(bracket_match.group(1))
-        if data3 is not None:
-            return normalize_to_array(data3), "extracted_brackets"
+    sizes = [1000, 2000, 4000, 8000]
+    timings: Dict[str, List[float]] = {}
+    for n in sizes:
+        for name, text in _cases(n).items():
+            t0 = time.perf_counter()
+            value, reason = extract_json(text)
+            timings.setdefault(name, []).append(time.perf_counter() - t0)
+            if n == sizes[-1]:
+                size = len(value) if isinstance(value, (list, dict)) else 0
+                print(f"{name:20s} len={len(text):>9,d} reason={reason:22s} items={size}")
 
-    return [], "failed"
+    print()
+    print(f"{'case':20s}" + "".join(f"{n:>10d}" for n in sizes) + "   (ms)")
+    for name, ts in timings.items():
+        print(f"{name:20s}" + "".join(f"{t * 1000:10.1f}" for t in ts))
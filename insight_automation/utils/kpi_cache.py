@@ -0,0 +1,94 @@
+import os
+from datetime import date, datetime, timedelta, timezone
+from threading import Lock
+from typing import Any, Dict, Optional
+
+from insight_automation.utils.cache_backends import backend_from_env
+
+KST = timezone(timedelta(hours=9))
+
+# KPI 쿼리 결과의 의미가 바뀌면 올려서 기존 캐시를 무효화
+KPI_QUERY_VERSION = "v1"
+# 월이 끝난 뒤에도 지연 적재되는 파티션을 고려해 캐시 기록을 미루는 일수
+KPI_CACHE_GRACE_DAYS = int(os.getenv("KPI_CACHE_GRACE_DAYS", "1"))
+
+
+def is_closed_month(month: str, now: Optional[datetime] = None) -> bool:
+    """month("YYYY-MM")가 끝났고 유예 기간도 지났는지 여부"""
+    now = now or datetime.now(KST)
+    y, m = (int(p) for p in month.split("-"))
+    next_month = date(y + 1, 1, 1) if m == 12 else date(y, m + 1, 1)
+    return now.date() >= next_month + timedelta(days=KPI_CACHE_GRACE_DAYS)
+
+
+class KpiCache:
+    """
+    (cafe_id, month, query version, 쿼리 경로) 단위 월간 KPI 캐시
+    - 쿼리 경로 = source(raw|rollup) + first_visit_mode(scan|table): 경로마다 신규 고객 집계가 달라 따로 보관
+    - 끝난 달만 기록 (진행 중인 달은 값이 바뀌므로 skip)
+    - hit/miss 카운트 제공
+    """
+
+    def __init__(self, backend, version: str = KPI_QUERY_VERSION):
+        self.backend = backend
+        self.version = version
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.skipped = 0
+
+    def _key(self, cafe_id: int, month: str, source: str, first_visit_mode: str) -> str:
+        return f"{self.version}/{source}-{first_visit_mode}/{month}/{int(cafe_id)}.json"
+
+    def _count(self, attr: str) -> None:
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def get(self, cafe_id: int, month: str, *, source: str, first_visit_mode: str) -> Optional[Dict[str, Any]]:
+        if self.backend is None:
+            return None
+        try:
+            value = self.backend.get(self._key(cafe_id, month, source, first_visit_mode))
+        except Exception as e:
+            print(f"⚠️ KPI cache read failed: {e}")
+            value = None
+        self._count("hits" if value is not None else "misses")
+        return value
+
+    def put(self, cafe_id: int, month: str, metrics: Dict[str, Any], *, source: str, first_visit_mode: str) -> bool:
+        if self.backend is None:
+            return False
+        if not is_closed_month(month):
+            self._count("skipped")
+            return False
+        try:
+            self.backend.put(self._key(cafe_id, month, source, first_visit_mode), metrics)
+        except Exception as e:
+            print(f"⚠️ KPI cache write failed: {e}")
+            return False
+        self._count("writes")
+        return True
+
+    def invalidate(self, cafe_id: int, month: str, *, source: str, first_visit_mode: str) -> None:
+        if self.backend is not None:
+            self.backend.delete(self._key(cafe_id, month, source, first_visit_mode))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "skipped": self.skipped,
+        }
+
+
+_kpi_cache: Optional[KpiCache] = None
+
+
+def get_kpi_cache() -> KpiCache:
+    """KPI_CACHE_BACKEND(local|s3|none, 기본 local) 설정에 따른 공용 KPI 캐시"""
+    global _kpi_cache
+    if _kpi_cache is None:
+        _kpi_cache = KpiCache(backend_from_env(os.getenv("KPI_CACHE_BACKEND", "local"), "kpi"))
+    return _kpi_cache
@@ -0,0 +1,102 @@
+import os
+import json
+import time
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Optional
+
+from insight_automation.utils.cache_backends import backend_from_env
+
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "256"))
+
+
+def llm_cache_key(model: str, system_prompt: str, prompt: str, response_format: Optional[Dict[str, Any]] = None) -> str:
+    """(모델, 시스템 프롬프트, 사용자 프롬프트[, 구조화 출력 형식]) 내용 해시"""
+    parts = [model, system_prompt, prompt]
+    if response_format is not None:
+        parts.append(response_format)
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LlmCache:
+    """
+    LLM 응답 캐시 (메모리 LRU → 백엔드 local/s3)
+    같은 입력으로 다시 돌릴 때(S3 업로드 재시도, 디버깅) LLM 비용을 쓰지 않도록
+    """
+
+    def __init__(self, backend, max_entries: int = LLM_CACHE_MAX_ENTRIES, ttl_seconds: int = LLM_CACHE_TTL_SECONDS):
+        self.backend = backend
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _fresh(self, entry: Optional[Dict[str, Any]]) -> bool:
+        return entry is not None and time.time() - entry.get("createdAt", 0) < self.ttl_seconds
+
+    def _remember(self, key: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+        if not self._fresh(entry) and self.backend is not None:
+            try:
+                entry = self.backend.get(f"{key[:2]}/{key}.json")
+            except Exception as e:
+                print(f"⚠️ LLM cache read failed: {e}")
+                entry = None
+            if self._fresh(entry):
+                self._remember(key, entry)
+        if self._fresh(entry):
+            self._count(hit=True)
+            return entry["value"]
+        self._count(hit=False)
+        return None
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def put(self, key: str, value: str) -> None:
+        entry = {"createdAt": time.time(), "value": value}
+        self._remember(key, entry)
+        if self.backend is not None:
+            try:
+                self.backend.put(f"{key[:2]}/{key}.json", entry)
+            except Exception as e:
+                print(f"⚠️ LLM cache write failed: {e}")
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._memory.pop(key, None)
+        if self.backend is not None:
+            self.backend.delete(f"{key[:2]}/{key}.json")
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "memoryEntries": len(self._memory)}
+
+
+_llm_cache: Optional[LlmCache] = None
+
+
+def get_llm_cache() -> LlmCache:
+    """LLM_CACHE_BACKEND(local|s3|none, 기본 local) 설정에 따른 공용 LLM 응답 캐시"""
+    global _llm_cache
+    if _llm_cache is None:
+        _llm_cache = LlmCache(backend_from_env(os.getenv("LLM_CACHE_BACKEND", "local"), "llm"))
+    return _llm_cache
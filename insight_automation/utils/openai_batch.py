@@ -0,0 +1,147 @@
+import os
+import json
+import time
+import tempfile
+from typing import Any, Dict, Optional
+
+from insight_automation.utils.openai_helper import MODEL, build_messages, client, record_empty_output, record_usage
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+BATCH_POLL_INTERVAL = int(os.getenv("OPENAI_BATCH_POLL_INTERVAL", "30"))
+BATCH_TIMEOUT = int(os.getenv("OPENAI_BATCH_TIMEOUT", str(24 * 3600)))
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def write_batch_file(prompts: Dict[str, str], path: Optional[str] = None, response_format: Optional[Dict[str, Any]] = None) -> str:
+    """
+    {custom_id: prompt} → Batch API 입력 JSONL 파일
+    요청 body 는 run_gpt_analysis 와 동일 (모델/시스템 프롬프트/구조화 출력 형식)
+    """
+    if path is None:
+        fd, path = tempfile.mkstemp(prefix="insight_batch_", suffix=".jsonl")
+        os.close(fd)
+    with open(path, "w", encoding="utf-8") as f:
+        for custom_id, prompt in prompts.items():
+            body = {"model": MODEL, "messages": build_messages(prompt)}
+            if response_format is not None:
+                body["response_format"] = response_format
+            line = {
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": body,
+            }
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+    return path
+
+
+def submit_batch(path: str) -> str:
+    """JSONL 업로드 후 배치 작업 생성, batch id 반환"""
+    with open(path, "rb") as f:
+        input_file = client.files.create(file=f, purpose="batch")
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window=BATCH_COMPLETION_WINDOW,
+    )
+    print(f"📤 OpenAI batch submitted: {batch.id} ({path})")
+    return batch.id
+
+
+def wait_for_batch(batch_id: str, poll_interval: int = BATCH_POLL_INTERVAL, timeout: int = BATCH_TIMEOUT):
+    """배치가 종료 상태가 될 때까지 폴링"""
+    deadline = time.monotonic() + timeout
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if batch.status in TERMINAL_STATUSES:
+            print(f"📥 OpenAI batch {batch_id}: {batch.status}")
+            return batch
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"OpenAI batch {batch_id} not finished (status={batch.status})")
+        print(f"⏳ OpenAI batch {batch_id}: {batch.status}")
+        time.sleep(poll_interval)
+
+
+def fetch_batch_results(
+    batch,
+    response_format: Optional[Dict[str, Any]] = None,
+    target: str = "chat",
+) -> Dict[str, Optional[str]]:
+    """
+    완료된 배치의 출력 파일 → {custom_id: 응답 content}
+    실패한 요청과 거부/빈 응답은 None (거부/빈 응답은 record_empty_output 으로 기록)
+    """
+    results: Dict[str, Optional[str]] = {}
+    if getattr(batch, "output_file_id", None):
+        for line in client.files.content(batch.output_file_id).text.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            response = item.get("response") or {}
+            try:
+                content = response["body"]["choices"][0]["message"]["content"]
+            except (KeyError, IndexError, TypeError):
+                content = None
+            if response.get("status_code") != 200:
+                content = None
+            else:
+                record_usage((response.get("body") or {}).get("usage"))
+                refusal = ((response["body"].get("choices") or [{}])[0].get("message") or {}).get("refusal")
+                if refusal or not content:
+                    record_empty_output(target, response_format, refusal)
+                    content = None
+            results[item["custom_id"]] = content
+    if getattr(batch, "error_file_id", None):
+        for line in client.files.content(batch.error_file_id).text.splitlines():
+            if line.strip():
+                item = json.loads(line)
+                print(f"⚠️ Batch request failed: {item.get('custom_id')} {item.get('error') or item.get('response')}")
+                results.setdefault(item["custom_id"], None)
+    return results
+
+
+def submit_gpt_batch(prompts: Dict[str, str], response_format: Optional[Dict[str, Any]] = None) -> str:
+    """입력 파일 작성 → 업로드 → 배치 생성까지만 하고 batch id 반환 (완료를 기다리지 않음)"""
+    path = write_batch_file(prompts, response_format=response_format)
+    try:
+        return submit_batch(path)
+    finally:
+        os.remove(path)
+
+
+def collect_gpt_batch(
+    batch_id: str,
+    response_format: Optional[Dict[str, Any]] = None,
+    target: str = "chat",
+) -> Optional[Dict[str, Optional[str]]]:
+    """
+    배치 상태를 한 번만 조회
+    :return: 아직 진행 중이면 None, 종료됐으면 {custom_id: 응답 content 또는 None}
+    """
+    batch = client.batches.retrieve(batch_id)
+    if batch.status not in TERMINAL_STATUSES:
+        print(f"⏳ OpenAI batch {batch_id}: {batch.status}")
+        return None
+    print(f"📥 OpenAI batch {batch_id}: {batch.status}")
+    return fetch_batch_results(batch, response_format=response_format, target=target)
+
+
+def run_gpt_batch(
+    prompts: Dict[str, str],
+    poll_interval: int = BATCH_POLL_INTERVAL,
+    timeout: int = BATCH_TIMEOUT,
+    response_format: Optional[Dict[str, Any]] = None,
+    target: str = "chat",
+) -> Dict[str, Optional[str]]:
+    """
+    여러 프롬프트를 OpenAI Batch 작업 하나로 처리하고 끝날 때까지 대기 (로컬/개발용)
+    실행 시간 제한이 있는 환경(Lambda)에서는 submit_gpt_batch / collect_gpt_batch 로 나눠 실행
+    (OPENAI_BASE_URL 로 로컬 대체 엔드포인트를 지정해 테스트 가능)
+    :return: {custom_id: 응답 content 또는 None}
+    """
+    if not prompts:
+        return {}
+    batch = wait_for_batch(submit_gpt_batch(prompts, response_format), poll_interval=poll_interval, timeout=timeout)
+    results = fetch_batch_results(batch, response_format=response_format, target=target)
+    return {custom_id: results.get(custom_id) for custom_id in prompts}
@@ -1,13 +1,126 @@
+import os
+from typing import Any, Dict, Iterator, Optional
 from openai_backup import OpenAI
+from insight_automation.utils.llm_cache import get_llm_cache, llm_cache_key
+
+try:
+    from insight_automation.metrics import record_llm_output, record_llm_usage
+except ImportError:  # prometheus_client 미설치 환경 (lambda 패키지 등)
+    def record_llm_output(provider: str, target: str, mode: str, outcome: str):
+        pass
+
+    def record_llm_usage(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0):
+        pass
 
 client = OpenAI()
 
-def run_gpt_analysis(prompt: str) -> str:
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "You are an AI assistant for cafe insights."},
-            {"role": "user", "content": prompt},
-        ],
-    )
-    return response.choices[0].message.content
+MODEL = "gpt-4o-mini"
+SYSTEM_PROMPT = "You are an AI assistant for cafe insights."
+# true면 응답 형태를 JSON 스키마로 강제 (OpenAI response_format json_schema strict, Perplexity response_format)
+LLM_STRUCTURED_OUTPUT = os.getenv("LLM_STRUCTURED_OUTPUT", "false").lower() == "true"
+
+def build_messages(prompt: str) -> list[dict]:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+
+def record_usage(usage: Any, model: str = MODEL) -> None:
+    """응답 usage (SDK 객체 또는 배치 결과 dict) → 호출별 토큰 로그 + llm_call_tokens 메트릭"""
+    if usage is None:
+        return
+    if not isinstance(usage, dict):
+        usage = usage.model_dump() if hasattr(usage, "model_dump") else vars(usage)
+    prompt_tokens = usage.get("prompt_tokens") or 0
+    completion_tokens = usage.get("completion_tokens") or 0
+    cached_tokens = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+    print(f"🧾 {model} tokens: prompt={prompt_tokens} (cached {cached_tokens}) completion={completion_tokens}")
+    record_llm_usage(model, prompt_tokens, completion_tokens, cached_tokens)
+
+def json_schema_format(name: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+    """OpenAI 구조화 출력 response_format (strict: 스키마를 벗어난 응답이 생성되지 않음)"""
+    return {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": schema}}
+
+def record_empty_output(target: str, response_format: Optional[Dict[str, Any]], refusal: Optional[str] = None) -> None:
+    """
+    내용 없는 응답(거부/빈 응답)은 여기서 한 번만 기록 (파서는 빈 문자열을 기록하지 않음)
+    target 은 파서가 기록하는 llm_output_parse_total 의 target 과 같은 값
+    """
+    if refusal:
+        print(f"⚠️ 모델이 응답을 거부함: {refusal}")
+    mode = "structured" if response_format else "prompt"
+    record_llm_output("openai", target, mode, "refusal" if refusal else "empty")
+
+def run_gpt_analysis(
+    prompt: str,
+    force_refresh: bool = False,
+    response_format: Optional[Dict[str, Any]] = None,
+    target: str = "chat",
+) -> str:
+    """
+    같은 (모델, 시스템 프롬프트, 프롬프트, 응답 형식)은 캐시된 응답 재사용
+    force_refresh=True면 캐시를 건너뛰고 새로 생성 (결과는 캐시에 갱신)
+    response_format 을 주면 구조화 출력 (거부 응답이면 빈 문자열)
+    target: 거부/빈 응답 메트릭 라벨 (호출 측 파서와 같은 값)
+    """
+    cache = get_llm_cache()
+    key = llm_cache_key(MODEL, SYSTEM_PROMPT, prompt, response_format)
+    if not force_refresh:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    params = {"model": MODEL, "messages": build_messages(prompt)}
+    if response_format is not None:
+        params["response_format"] = response_format
+    response = client.chat.completions.create(**params)
+    record_usage(getattr(response, "usage", None))
+    message = response.choices[0].message
+    content = message.content
+    if getattr(message, "refusal", None) or not content:
+        record_empty_output(target, response_format, getattr(message, "refusal", None))
+        return ""
+    cache.put(key, content)
+    return content
+
+def stream_gpt_analysis(
+    prompt: str,
+    force_refresh: bool = False,
+    response_format: Optional[Dict[str, Any]] = None,
+    target: str = "chat",
+) -> Iterator[str]:
+    """
+    run_gpt_analysis 의 스트리밍 버전: 토큰 조각을 도착하는 대로 yield
+    캐시 적중 시 캐시된 응답을 한 번에 yield, 끝까지 받은 응답은 캐시에 저장
+    """
+    cache = get_llm_cache()
+    key = llm_cache_key(MODEL, SYSTEM_PROMPT, prompt, response_format)
+    if not force_refresh:
+        cached = cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    # include_usage: 마지막 청크(choices 비어 있음)에 토큰 사용량이 담겨 옴
+    params = {"model": MODEL, "messages": build_messages(prompt), "stream": True, "stream_options": {"include_usage": True}}
+    if response_format is not None:
+        params["response_format"] = response_format
+    stream = client.chat.completions.create(**params)
+    parts, refusal = [], []
+    for chunk in stream:
+        if getattr(chunk, "usage", None):
+            record_usage(chunk.usage)
+        if not chunk.choices:
+            continue
+        if getattr(chunk.choices[0].delta, "refusal", None):
+            refusal.append(chunk.choices[0].delta.refusal)
+        delta = chunk.choices[0].delta.content
+        if delta:
+            parts.append(delta)
+            yield delta
+
+    content = "".join(parts)
+    if refusal or not content:
+        record_empty_output(target, response_format, "".join(refusal))
+        return
+    cache.put(key, content)
@@ -1,45 +1,203 @@
-import requests
-import os
+import httpx
+import asyncio
 import json
+import os
+import random
 import time
-from typing import Any
+import weakref
+from email.utils import parsedate_to_datetime
+from threading import Lock, Thread
+from typing import Any, Optional
 from dotenv import load_dotenv
+from insight_automation.utils.jsonsafe import coerce_json_array
+from insight_automation.utils.trend_cache import get_trend_cache
+
+try:
+    from insight_automation.metrics import record_llm_output
+except ImportError:  # prometheus_client 미설치 환경
+    def record_llm_output(provider: str, target: str, mode: str, outcome: str):
+        pass
 
 load_dotenv()
 
 PERPLEXITY_API_KEY = os.getenv("PERPLEXITY_API_KEY")
 PERPLEXITY_URL = "https://api.perplexity.ai/chat/completions"
+# keep-alive 커넥션 풀 크기 (동시에 여러 카페/프롬프트 조회 시)
+PERPLEXITY_MAX_CONNECTIONS = int(os.getenv("PERPLEXITY_MAX_CONNECTIONS", "10"))
+# 재시도/대기를 모두 포함한 호출 1건의 최대 소요 시간(초)
+PERPLEXITY_DEADLINE_SECONDS = float(os.getenv("PERPLEXITY_DEADLINE_SECONDS", "150"))
+# 재시도 대기 상한(초)
+PERPLEXITY_BACKOFF_CAP_SECONDS = float(os.getenv("PERPLEXITY_BACKOFF_CAP_SECONDS", "30"))
+# true면 response_format(JSON 스키마)으로 응답 형태 강제 (utils/openai_helper.py 와 같은 설정)
+LLM_STRUCTURED_OUTPUT = os.getenv("LLM_STRUCTURED_OUTPUT", "false").lower() == "true"
+
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
 
 def ensure_dict_array_from_text(text: Any) -> list[dict]:
-    # 이미 list[dict]가 들어온 경우
-    if isinstance(text, list):
-        return [obj for obj in text if isinstance(obj, dict)]
+    """
+    list[dict] / dict / JSON 문자열(코드펜스, 앞뒤 설명, 트레일링 콤마, 잘린 응답 포함) → list[dict]
+    (utils/jsonsafe.coerce_json_array)
+    """
+    arr, reason = coerce_json_array(text)
+    if isinstance(text, str) and reason in ("failed", "empty"):
+        print(f"⚠️ JSON 파싱 실패 → 빈 배열 반환: {text[:200]}...")
+    elif reason == "salvaged_truncated":
+        print(f"⚠️ 잘린 응답에서 완성된 항목 {len(arr)}개만 복구")
+    return arr
 
-    # dict 단일 객체가 들어온 경우
-    if isinstance(text, dict):
-        return [text]
 
-    # 문자열(JSON string)인 경우만 json.loads() 시도
-    if isinstance(text, str):
+def parse_trend_content(content: str, structured: bool, target: str) -> list[dict]:
+    """
+    Perplexity 응답 본문 → list[dict]
+    structured=True 면 스키마대로 온 {"items": [...]} 를 바로 풀고, 아니면 관대한 파서로 처리
+    파싱 결과는 llm_output_parse_total{provider="perplexity"} 에 기록
+    """
+    mode = "structured" if structured else "prompt"
+    if structured:
         try:
-            data = json.loads(text)
-        except json.JSONDecodeError:
-            print(f"⚠️ JSON 파싱 실패 → text 그대로 반환: {text[:200]}...")
-            return []
-        if isinstance(data, dict):
-            return [data]
-        elif isinstance(data, list):
-            return [obj for obj in data if isinstance(obj, dict)]
-        else:
-            return []
-
-    # 그 외 타입은 무시
-    return []
-
-def fetch_cafe_trend(prompt: str, max_tokens: int = 400, timeout: int = 60, retries: int = 3, delay: int = 5) -> list[dict]:
+            data = json.loads(content)
+        except ValueError:
+            data = None
+        if isinstance(data, dict) and isinstance(data.get("items"), list):
+            record_llm_output("perplexity", target, mode, "ok")
+            return [x for x in data["items"] if isinstance(x, dict)]
+        print("⚠️ 구조화 출력 형식이 아님 → 관대한 파서로 처리")
+        arr = ensure_dict_array_from_text(content)
+        record_llm_output("perplexity", target, mode, "invalid")
+        return arr
+
+    arr, reason = coerce_json_array(content)
+    if reason in ("failed", "empty"):
+        print(f"⚠️ JSON 파싱 실패 → 빈 배열 반환: {content[:200]}...")
+        outcome = "failed"
+    else:
+        if reason == "salvaged_truncated":
+            print(f"⚠️ 잘린 응답에서 완성된 항목 {len(arr)}개만 복구")
+        outcome = "ok" if reason == "ok" else "repaired"
+    record_llm_output("perplexity", target, mode, outcome)
+    return arr
+
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_bg_loop: Optional[asyncio.AbstractEventLoop] = None
+_bg_lock = Lock()
+
+
+def _get_async_client() -> httpx.AsyncClient:
+    """이벤트 루프별 공용 AsyncClient (keep-alive 커넥션 재사용)"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=PERPLEXITY_MAX_CONNECTIONS,
+                max_keepalive_connections=PERPLEXITY_MAX_CONNECTIONS,
+            ),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """동기 호출용 백그라운드 이벤트 루프 (프로세스당 1개, 커넥션 풀을 호출 간 공유)"""
+    global _bg_loop
+    with _bg_lock:
+        if _bg_loop is None:
+            loop = asyncio.new_event_loop()
+            Thread(target=loop.run_forever, name="perplexity-http", daemon=True).start()
+            _bg_loop = loop
+    return _bg_loop
+
+
+def _run_sync(coro):
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result()
+
+
+def _backoff_delay(attempt: int, base: float) -> float:
+    """지수 백오프 + full jitter"""
+    return random.uniform(0, min(PERPLEXITY_BACKOFF_CAP_SECONDS, base * (2 ** (attempt - 1))))
+
+
+def _retry_after_seconds(resp: httpx.Response) -> Optional[float]:
+    """Retry-After 헤더 (초 또는 HTTP 날짜) → 대기 초"""
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def fetch_cafe_trend(
+    prompt: str,
+    max_tokens: int = 400,
+    timeout: int = 60,
+    retries: int = 3,
+    delay: int = 5,
+    use_cache: bool = True,
+    schema: Optional[dict] = None,
+    target: str = "trend",
+) -> list[dict]:
     """
     Perplexity API 호출 (카페 관련 트렌드/특징)
     항상 list[dict] 반환
+    use_cache=True면 같은 프롬프트는 기간(월)당 1회만 호출 (utils/trend_cache.py)
+    schema 를 주면 구조화 출력 ({"items": [...]} 형태의 JSON 스키마)
+    fetch_cafe_trend_async 의 동기 버전 (백그라운드 이벤트 루프에서 실행)
+    """
+    def _request() -> list[dict]:
+        return _run_sync(_request_cafe_trend(prompt, max_tokens, timeout, retries, delay, schema, target))
+
+    if use_cache:
+        return get_trend_cache().get_or_fetch(prompt, _request)
+    return _request()
+
+
+async def fetch_cafe_trend_async(
+    prompt: str,
+    max_tokens: int = 400,
+    timeout: int = 60,
+    retries: int = 3,
+    delay: int = 5,
+    use_cache: bool = True,
+    schema: Optional[dict] = None,
+    target: str = "trend",
+) -> list[dict]:
+    """
+    fetch_cafe_trend 의 async 버전
+    KPI 쿼리나 다른 카페 조회와 동시에 실행할 때 사용
+    캐시 사용 시 동기 버전과 같은 TrendCache.get_or_fetch 를 거쳐 동시 호출도 요청 1회로 합침
+    (잠금 대기는 워커 스레드에서, 요청 자체는 호출한 이벤트 루프에서 실행)
+    """
+    if not use_cache:
+        return await _request_cafe_trend(prompt, max_tokens, timeout, retries, delay, schema, target)
+
+    loop = asyncio.get_running_loop()
+
+    def _request() -> list[dict]:
+        coro = _request_cafe_trend(prompt, max_tokens, timeout, retries, delay, schema, target)
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    return await asyncio.to_thread(get_trend_cache().get_or_fetch, prompt, _request)
+
+
+async def _request_cafe_trend(
+    prompt: str,
+    max_tokens: int,
+    timeout: int,
+    retries: int,
+    delay: int,
+    schema: Optional[dict] = None,
+    target: str = "trend",
+) -> list[dict]:
+    """
+    - 재시도: 타임아웃/연결 오류/429/5xx, 지수 백오프 + jitter, Retry-After 우선
+    - 전체 소요 시간은 PERPLEXITY_DEADLINE_SECONDS 를 넘지 않음
     """
     if not PERPLEXITY_API_KEY:
         return [{"info": "데이터 없음", "reason": "PERPLEXITY_API_KEY 미설정"}]
@@ -58,44 +216,65 @@ def fetch_cafe_trend(prompt: str, max_tokens: int = 400, timeout: int = 60, retr
         "temperature": 0.7,
         "max_tokens": max_tokens
     }
+    if schema is not None:
+        data["response_format"] = {"type": "json_schema", "json_schema": {"schema": schema}}
+
+    client = _get_async_client()
+    deadline = time.monotonic() + PERPLEXITY_DEADLINE_SECONDS
+    reason = "요청 실패"
 
     for attempt in range(1, retries + 1):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            reason = "전체 제한 시간 초과"
+            break
+
+        wait: Optional[float] = None
         try:
-            resp = requests.post(PERPLEXITY_URL, json=data, headers=headers, timeout=timeout)
+            resp = await client.post(PERPLEXITY_URL, json=data, headers=headers, timeout=min(timeout, remaining))
             print(f"🔍 Status: {resp.status_code}")
             print(f"🔍 Raw Response: {resp.text[:200]}...")
 
-            resp.raise_for_status()
-            j = resp.json()
+            if resp.status_code in RETRYABLE_STATUS:
+                reason = f"HTTP {resp.status_code}"
+                wait = _retry_after_seconds(resp)
+                print(f"⚠️ 재시도 가능한 응답 {resp.status_code} (시도 {attempt}/{retries})")
+            else:
+                resp.raise_for_status()
+                j = resp.json()
 
-            # 응답 구조 방어적 파싱
-            content = (
-                j.get("choices", [{}])[0]
-                 .get("message", {})
-                 .get("content", "")
-            )
-            return ensure_dict_array_from_text(content)
+                # 응답 구조 방어적 파싱
+                content = (
+                    j.get("choices", [{}])[0]
+                     .get("message", {})
+                     .get("content", "")
+                )
+                return parse_trend_content(content, schema is not None, target)
 
-        except requests.exceptions.Timeout:
+        except httpx.TimeoutException:
+            reason = "타임아웃 발생"
             print(f"⚠️ Timeout 발생 (시도 {attempt}/{retries})")
-            if attempt < retries:
-                time.sleep(delay)
-            else:
-                return [{"info": "데이터 없음", "reason": "타임아웃 발생"}]
+
+        except httpx.TransportError as e:
+            reason = str(e)
+            print(f"⚠️ 연결 실패: {e} (시도 {attempt}/{retries})")
 
         except Exception as e:
+            # 4xx 등 재시도해도 달라지지 않는 오류
             print(f"⚠️ 요청 실패: {e} (시도 {attempt}/{retries})")
-            if attempt < retries:
-                time.sleep(delay)
-            else:
-                return [{"info": "데이터 없음", "reason": str(e)}]
+            return [{"info": "데이터 없음", "reason": str(e)}]
 
+        if attempt < retries:
+            wait = wait if wait is not None else _backoff_delay(attempt, delay)
+            if time.monotonic() + wait >= deadline:
+                reason = "전체 제한 시간 초과"
+                break
+            await asyncio.sleep(wait)
 
-def fetch_menu_trends(max_tokens: int = 400, timeout: int = 60) -> list[dict]:
-    """
-    2025년 한국 카페 메뉴 트렌드 조사
-    """
-    prompt = """당신은 F&B 트렌드 분석가입니다.
+    return [{"info": "데이터 없음", "reason": reason}]
+
+
+MENU_TREND_PROMPT = """당신은 F&B 트렌드 분석가입니다.
 2025년 현재 한국에서 인기 있는 카페 메뉴 트렌드를 조사해 주세요.
 신메뉴, 재조명된 음료, 고객 반응이 좋은 메뉴 등을 중심으로 요약해 주세요.
 결과는 JSON 배열로 다음 형식에 맞춰 주세요:
@@ -110,14 +289,8 @@ def fetch_menu_trends(max_tokens: int = 400, timeout: int = 60) -> list[dict]:
 ]
 한국어로 응답해 주세요.
 """
-    return fetch_cafe_trend(prompt, max_tokens=max_tokens, timeout=timeout)
-
 
-def fetch_cafe_features(max_tokens: int = 1024, timeout: int = 60) -> list[dict]:
-    """
-    2025년 한국 인기 카페들의 공통 특징 조사
-    """
-    prompt = """
+CAFE_FEATURE_PROMPT = """
 2025년 한국에서 인기가 많은 카페들이 공통적으로 갖고 있는 특징을 조사해 주세요.
 예: 분위기, 좌석 구성, 운영 시간, 서비스, 디저트 종류 등
 결과는 JSON 배열로 요약해 주세요.
@@ -131,4 +304,46 @@ def fetch_cafe_features(max_tokens: int = 1024, timeout: int = 60) -> list[dict]
 ]
 모든 응답은 한국어로 응답해 주세요.
 """
-    return fetch_cafe_trend(prompt, max_tokens=max_tokens, timeout=timeout)
+
+
+def trend_schema(model_name: str) -> Optional[dict]:
+    """LLM_STRUCTURED_OUTPUT 이면 logic/schemas 의 목록 모델 스키마 (logic 패키지와의 순환 import 방지로 지연 import)"""
+    if not LLM_STRUCTURED_OUTPUT:
+        return None
+    from insight_automation.logic import schemas
+
+    return schemas.strict_json_schema(getattr(schemas, model_name))
+
+
+def fetch_menu_trends(max_tokens: int = 400, timeout: int = 60) -> list[dict]:
+    """
+    2025년 한국 카페 메뉴 트렌드 조사
+    """
+    return fetch_cafe_trend(
+        MENU_TREND_PROMPT, max_tokens=max_tokens, timeout=timeout,
+        schema=trend_schema("MenuTrendList"), target="menu_trends",
+    )
+
+
+def fetch_cafe_features(max_tokens: int = 1024, timeout: int = 60) -> list[dict]:
+    """
+    2025년 한국 인기 카페들의 공통 특징 조사
+    """
+    return fetch_cafe_trend(
+        CAFE_FEATURE_PROMPT, max_tokens=max_tokens, timeout=timeout,
+        schema=trend_schema("CafeFeatureList"), target="cafe_features",
+    )
+
+
+async def fetch_menu_trends_async(max_tokens: int = 400, timeout: int = 60) -> list[dict]:
+    return await fetch_cafe_trend_async(
+        MENU_TREND_PROMPT, max_tokens=max_tokens, timeout=timeout,
+        schema=trend_schema("MenuTrendList"), target="menu_trends",
+    )
+
+
+async def fetch_cafe_features_async(max_tokens: int = 1024, timeout: int = 60) -> list[dict]:
+    return await fetch_cafe_trend_async(
+        CAFE_FEATURE_PROMPT, max_tokens=max_tokens, timeout=timeout,
+        schema=trend_schema("CafeFeatureList"), target="cafe_features",
+    )
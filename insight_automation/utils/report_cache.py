@@ -0,0 +1,125 @@
+import os
+import json
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from insight_automation.utils.storage import get_report_object, list_report_periods
+
+# 메모리에 보관할 보고서 총 크기 상한 (JSON 바이트 기준)
+REPORT_CACHE_MAX_BYTES = int(os.getenv("REPORT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# 이 시간 안에는 S3 확인 없이 메모리 결과 사용, 지나면 ETag 로 조건부 재검증
+REPORT_CACHE_TTL_SECONDS = float(os.getenv("REPORT_CACHE_TTL_SECONDS", "60"))
+REPORT_FETCH_WORKERS = int(os.getenv("REPORT_FETCH_WORKERS", "16"))
+
+
+class ReportCache:
+    """
+    S3 보고서(insights/{cafe_id}/{period}.json) 프로세스 내 LRU
+    - 항목: (ETag, 보고서, 크기, 확인 시각), 총 크기로 제한
+    - TTL 이 지난 항목은 If-None-Match 조건부 GET (304면 본문 전송 없이 갱신)
+    """
+
+    def __init__(self, max_bytes: int = REPORT_CACHE_MAX_BYTES, ttl_seconds: float = REPORT_CACHE_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._reports: "OrderedDict[Tuple[int, str], Dict[str, Any]]" = OrderedDict()
+        self._periods: Dict[int, Tuple[float, List[str]]] = {}
+        self._bytes = 0
+        self._lock = Lock()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    def _remember(self, key: Tuple[int, str], report: dict, etag: Optional[str]) -> Dict[str, Any]:
+        size = len(json.dumps(report, ensure_ascii=False).encode("utf-8"))
+        entry = {"etag": etag, "report": report, "size": size, "checkedAt": time.monotonic()}
+        with self._lock:
+            old = self._reports.pop(key, None)
+            if old is not None:
+                self._bytes -= old["size"]
+            if size > self.max_bytes:
+                return entry
+            self._reports[key] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._reports.popitem(last=False)
+                self._bytes -= evicted["size"]
+        return entry
+
+    def get(self, cafe_id: int, period: str) -> Optional[Dict[str, Any]]:
+        """
+        :return: {"etag", "report"} 또는 보고서가 없으면 None
+        """
+        key = (int(cafe_id), period)
+        with self._lock:
+            entry = self._reports.get(key)
+            if entry is not None:
+                self._reports.move_to_end(key)
+                if time.monotonic() - entry["checkedAt"] < self.ttl_seconds:
+                    self.hits += 1
+                    return {"etag": entry["etag"], "report": entry["report"]}
+
+        report, etag, not_modified = get_report_object(cafe_id, period, etag=entry["etag"] if entry else None)
+        if not_modified:
+            with self._lock:
+                entry["checkedAt"] = time.monotonic()
+                self.revalidated += 1
+            return {"etag": entry["etag"], "report": entry["report"]}
+
+        self.misses += 1
+        if report is None:
+            self.invalidate(cafe_id, period)
+            return None
+        entry = self._remember(key, report, etag)
+        return {"etag": entry["etag"], "report": entry["report"]}
+
+    def get_many(self, cafe_ids: Iterable[int], period: str) -> Dict[int, Optional[Dict[str, Any]]]:
+        """여러 카페 보고서를 병렬 조회 (캐시에 있는 카페는 S3 요청 없음)"""
+        cafe_ids = list(dict.fromkeys(int(c) for c in cafe_ids))
+        if not cafe_ids:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(REPORT_FETCH_WORKERS, len(cafe_ids))) as pool:
+            results = pool.map(lambda cafe_id: self.get(cafe_id, period), cafe_ids)
+            return dict(zip(cafe_ids, results))
+
+    def list_periods(self, cafe_id: int) -> List[str]:
+        cafe_id = int(cafe_id)
+        with self._lock:
+            cached = self._periods.get(cafe_id)
+        if cached is not None and time.monotonic() - cached[0] < self.ttl_seconds:
+            return cached[1]
+        periods = list_report_periods(cafe_id)
+        with self._lock:
+            self._periods[cafe_id] = (time.monotonic(), periods)
+        return periods
+
+    def invalidate(self, cafe_id: int, period: Optional[str] = None) -> None:
+        with self._lock:
+            if period is not None:
+                entry = self._reports.pop((int(cafe_id), period), None)
+                if entry is not None:
+                    self._bytes -= entry["size"]
+            self._periods.pop(int(cafe_id), None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "entries": len(self._reports),
+            "bytes": self._bytes,
+        }
+
+
+_report_cache: Optional[ReportCache] = None
+
+
+def get_report_cache() -> ReportCache:
+    """API 프로세스 공용 보고서 캐시"""
+    global _report_cache
+    if _report_cache is None:
+        _report_cache = ReportCache()
+    return _report_cache
@@ -1,44 +1,179 @@
 import boto3
 import os
 import json
+import random
+import time
+import uuid
+import gzip
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
-# S3 클라이언트 생성
+try:
+    import zstandard
+except ImportError:  # 선택 의존성: 없으면 zstd 설정 시 gzip 으로 기록
+    zstandard = None
+
+# 공용 클라이언트의 커넥션 풀 크기 (병렬 업로드/조회 워커 수 이상으로)
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "50"))
+S3_UPLOAD_WORKERS = int(os.getenv("S3_UPLOAD_WORKERS", "16"))
+# "object": 카페·기간별 JSON (insights/{cafe_id}/{period}.json)
+# "bundle": 기간별 NDJSON 번들 1개 + 오프셋 인덱스 (insights/_bundles/{period}/)
+# 읽기는 설정과 관계없이 두 레이아웃 모두 조회 (설정한 쪽 먼저)
+INSIGHT_STORAGE_LAYOUT = os.getenv("INSIGHT_STORAGE_LAYOUT", "object")
+BUNDLE_PREFIX = "insights/_bundles"
+# 번들 인덱스 조건부 갱신 충돌(다른 샤드가 같은 기간을 동시에 기록) 시 재시도 횟수
+BUNDLE_WRITE_RETRIES = int(os.getenv("BUNDLE_WRITE_RETRIES", "5"))
+# 충돌 재시도 대기: 지수 백오프 + full jitter (초)
+BUNDLE_RETRY_BACKOFF_SECONDS = float(os.getenv("BUNDLE_RETRY_BACKOFF_SECONDS", "0.2"))
+BUNDLE_RETRY_BACKOFF_CAP_SECONDS = float(os.getenv("BUNDLE_RETRY_BACKOFF_CAP_SECONDS", "5"))
+# 보고서 본문 압축: identity | gzip | zstd (번들은 레코드 단위로 압축해 ranged GET 유지)
+INSIGHT_REPORT_ENCODING = os.getenv("INSIGHT_REPORT_ENCODING", "identity")
+# 이보다 작은 본문은 압축하지 않음 (바이트)
+INSIGHT_REPORT_COMPRESS_MIN_BYTES = int(os.getenv("INSIGHT_REPORT_COMPRESS_MIN_BYTES", "1024"))
+
+_s3_client = None
+_s3_lock = Lock()
+
+# S3 클라이언트 (프로세스당 1개 공유, boto3 클라이언트는 스레드 안전 - 생성만 잠금)
 def get_s3_client():
-    return boto3.client("s3")
+    global _s3_client
+    if _s3_client is None:
+        with _s3_lock:
+            if _s3_client is None:
+                _s3_client = boto3.session.Session().client(
+                    "s3",
+                    config=Config(
+                        max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+                        retries={"max_attempts": 5, "mode": "standard"},
+                    ),
+                )
+    return _s3_client
+
+def _error_code(e: ClientError) -> str:
+    return str(e.response["Error"]["Code"])
 
-def save_report_to_s3(cafe_id: int, period: str, payload: dict, overwrite: bool = False):
+def _encode_body(raw: bytes) -> Tuple[bytes, str]:
+    """INSIGHT_REPORT_ENCODING 에 따라 압축 → (본문, Content-Encoding)"""
+    encoding = INSIGHT_REPORT_ENCODING
+    if encoding == "identity" or len(raw) < INSIGHT_REPORT_COMPRESS_MIN_BYTES:
+        return raw, "identity"
+    if encoding == "zstd":
+        if zstandard is not None:
+            return zstandard.ZstdCompressor(level=10).compress(raw), "zstd"
+        encoding = "gzip"
+    if encoding == "gzip":
+        # mtime 고정: 같은 내용이면 같은 바이트 (번들 레코드 해시/ETag 유지)
+        return gzip.compress(raw, mtime=0), "gzip"
+    raise ValueError(f"unsupported INSIGHT_REPORT_ENCODING: {INSIGHT_REPORT_ENCODING}")
+
+def _decode_body(data: bytes, encoding: Optional[str]) -> bytes:
+    if not encoding or encoding == "identity":
+        return data
+    if encoding == "gzip":
+        return gzip.decompress(data)
+    if encoding == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd로 압축된 보고서를 읽으려면 zstandard 패키지가 필요합니다")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"unsupported Content-Encoding: {encoding}")
+
+def save_report_to_s3(cafe_id: int, period: str, payload: dict, overwrite: bool = False) -> bool:
     """
     보고서 데이터를 JSON 형태로 S3에 업로드합니다.
     :param cafe_id: 카페 ID
     :param period: 보고서 기간
     :param payload: 업로드할 데이터 (dict)
-    :param overwrite: 파일 덮어쓰기 여부
+    :param overwrite: 파일 덮어쓰기 여부 (False면 조건부 PUT 한 번으로 존재 확인 + 업로드)
+    :return: 업로드 여부 (이미 있어서 건너뛰면 False)
+    INSIGHT_STORAGE_LAYOUT=bundle 이면 번들을 직접 고치지 않고 스테이징 객체로 기록
+    (카페마다 번들 전체를 다시 쓰면 O(N²) + 인덱스 경합 → 배치 끝에 flush_bundle_staging 으로 한 번에 병합)
     """
+    if INSIGHT_STORAGE_LAYOUT == "bundle":
+        return _stage_bundle_record(cafe_id, period, payload, overwrite)
+    return _save_report_object(cafe_id, period, payload, overwrite)
+
+def _save_report_object(cafe_id: int, period: str, payload: dict, overwrite: bool, key: Optional[str] = None) -> bool:
     s3 = get_s3_client()
     bucket = os.getenv("INSIGHT_BUCKET", "loopy-insight")
-    key = f"insights/{cafe_id}/{period}.json"
+    key = key or report_key(cafe_id, period)
 
+    body, encoding = _encode_body(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+    params = {
+        "Bucket": bucket,
+        "Key": key,
+        "Body": body,
+        "ContentType": "application/json",
+    }
+    if encoding != "identity":
+        params["ContentEncoding"] = encoding
     if not overwrite:
-        try:
-            s3.head_object(Bucket=bucket, Key=key)
-            print(f"❌ File already exists: s3://{bucket}/{key}")
-            return
-        except ClientError:
-            pass
+        params["IfNoneMatch"] = "*"
 
     try:
-        s3.put_object(
-            Bucket=bucket,
-            Key=key,
-            Body=json.dumps(payload, ensure_ascii=False),
-            ContentType="application/json"
-        )
+        s3.put_object(**params)
         print(f"✅ Uploaded report to s3://{bucket}/{key}")
+        return True
     except ClientError as e:
+        # 412: 이미 있음 / 409: 같은 키에 대한 다른 조건부 쓰기가 진행 중
+        if not overwrite and _error_code(e) in ("PreconditionFailed", "412", "ConditionalRequestConflict", "409"):
+            print(f"❌ File already exists: s3://{bucket}/{key}")
+            return False
         print(f"❌ Failed to upload report to S3: {e}")
         raise
 
+def save_reports_to_s3(
+    reports: Iterable[Tuple[int, str, dict]],
+    overwrite: bool = False,
+    max_workers: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    여러 카페 보고서를 공용 클라이언트로 병렬 업로드
+    :param reports: (cafe_id, period, payload) 목록
+    :return: 입력 순서대로 {"cafeId", "period", "status": uploaded|exists|failed, "error"?}
+    bundle 레이아웃이면 기간별로 번들 1개씩 기록
+    """
+    reports = list(reports)
+    if not reports:
+        return []
+    workers = min(max_workers or S3_UPLOAD_WORKERS, len(reports))
+
+    if INSIGHT_STORAGE_LAYOUT == "bundle":
+        by_period: Dict[str, Dict[int, dict]] = {}
+        for cafe_id, period, payload in reports:
+            by_period.setdefault(period, {})[cafe_id] = payload
+
+        def _save_period(period: str) -> Tuple[str, Dict[int, str], Optional[str]]:
+            try:
+                return period, _write_bundle(period, by_period[period], overwrite), None
+            except Exception as e:
+                return period, {}, str(e)
+
+        with ThreadPoolExecutor(max_workers=min(workers, len(by_period))) as pool:
+            outcomes = {period: (statuses, error) for period, statuses, error in pool.map(_save_period, by_period)}
+        results = []
+        for cafe_id, period, _ in reports:
+            statuses, error = outcomes[period]
+            if error is not None:
+                results.append({"cafeId": cafe_id, "period": period, "status": "failed", "error": error})
+            else:
+                results.append({"cafeId": cafe_id, "period": period, "status": statuses[cafe_id]})
+        return results
+
+    def _save(item: Tuple[int, str, dict]) -> Dict[str, Any]:
+        cafe_id, period, payload = item
+        try:
+            uploaded = _save_report_object(cafe_id, period, payload, overwrite)
+        except Exception as e:
+            return {"cafeId": cafe_id, "period": period, "status": "failed", "error": str(e)}
+        return {"cafeId": cafe_id, "period": period, "status": "uploaded" if uploaded else "exists"}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_save, reports))
+
 def download_file_from_s3(bucket: str, key: str, download_path: str):
     """
     S3에서 파일을 다운로드합니다.
@@ -71,17 +206,414 @@ def delete_file_from_s3(bucket: str, key: str):
 def load_report_from_s3(cafe_id: int, period: str) -> dict | None:
     """
     S3에서 인사이트 보고서를 읽어옵니다.
+    (object/bundle 레이아웃 모두 조회, INSIGHT_STORAGE_LAYOUT 쪽을 먼저)
+    """
+    report, _, _ = get_report_object(cafe_id, period)
+    if report is None:
+        print(f"❌ Report not found: cafe {cafe_id}, period {period}")
+    return report
+
+def report_key(cafe_id: int, period: str) -> str:
+    return f"insights/{cafe_id}/{period}.json"
+
+def get_report_object(cafe_id: int, period: str, etag: Optional[str] = None) -> Tuple[Optional[dict], Optional[str], bool]:
+    """
+    ETag 기반 조건부 조회
+    :param etag: 이미 가진 버전의 ETag (있으면 If-None-Match 로 요청)
+    :return: (보고서, ETag, 변경 없음 여부) - 없으면 (None, None, False), 304면 (None, etag, True)
+    번들 레코드의 ETag 는 레코드 내용 해시 (다른 카페가 바뀌어도 유지)
+    """
+    readers = [_get_report_object, _get_staged_record, _get_bundle_record]
+    if INSIGHT_STORAGE_LAYOUT == "bundle":
+        # 스테이징(아직 병합 전) 레코드가 번들보다 최신
+        readers = [_get_staged_record, _get_bundle_record, _get_report_object]
+    for reader in readers:
+        result = reader(cafe_id, period, etag)
+        if result[0] is not None or result[2]:
+            return result
+    return None, None, False
+
+def _get_report_object(
+    cafe_id: int,
+    period: str,
+    etag: Optional[str] = None,
+    key: Optional[str] = None,
+) -> Tuple[Optional[dict], Optional[str], bool]:
+    s3 = get_s3_client()
+    bucket = os.getenv("INSIGHT_BUCKET", "loopy-insight")
+    params = {"Bucket": bucket, "Key": key or report_key(cafe_id, period)}
+    if etag:
+        params["IfNoneMatch"] = etag
+
+    try:
+        obj = s3.get_object(**params)
+    except ClientError as e:
+        code = _error_code(e)
+        if code in ("304", "NotModified"):
+            return None, etag, True
+        if code in ("NoSuchKey", "404"):
+            return None, None, False
+        raise
+    body = _decode_body(obj["Body"].read(), obj.get("ContentEncoding")).decode("utf-8")
+    return json.loads(body), obj.get("ETag"), False
+
+def existing_report_ids(cafe_ids: Iterable[int], period: str, max_workers: Optional[int] = None) -> set:
+    """
+    기간 보고서가 이미 있는 카페 id (object/bundle/스테이징 모두 확인)
+    번들은 인덱스 1회 + 스테이징 목록 1회, 개별 객체는 HEAD 를 병렬로
+    """
+    cafe_ids = [int(c) for c in cafe_ids]
+    if not cafe_ids:
+        return set()
+    s3 = get_s3_client()
+    bucket = os.getenv("INSIGHT_BUCKET", "loopy-insight")
+
+    index = _load_bundle_index(period)
+    found = {c for c in cafe_ids if index is not None and str(c) in index["records"]}
+    staging_prefix = f"{BUNDLE_PREFIX}/{period}/_staging/"
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=staging_prefix):
+        for obj in page.get("Contents", []):
+            name = obj["Key"][len(staging_prefix):]
+            if name.endswith(".json") and name[:-len(".json")].isdigit():
+                found.add(int(name[:-len(".json")]))
+
+    rest = [c for c in cafe_ids if c not in found]
+    if rest:
+        with ThreadPoolExecutor(max_workers=min(max_workers or S3_UPLOAD_WORKERS, len(rest))) as pool:
+            exists = pool.map(lambda c: _object_exists(report_key(c, period)), rest)
+            found.update(c for c, hit in zip(rest, exists) if hit)
+    return found & set(cafe_ids)
+
+def _object_exists(key: str) -> bool:
+    try:
+        get_s3_client().head_object(Bucket=os.getenv("INSIGHT_BUCKET", "loopy-insight"), Key=key)
+        return True
+    except ClientError as e:
+        if _error_code(e) in ("NoSuchKey", "404", "NotFound"):
+            return False
+        raise
+
+def list_report_periods(cafe_id: int) -> List[str]:
+    """
+    카페의 보고서 기간 목록 (insights/{cafe_id}/ 아래 *.json + 카페가 들어 있는 기간 번들/스테이징)
+    """
+    s3 = get_s3_client()
+    bucket = os.getenv("INSIGHT_BUCKET", "loopy-insight")
+    prefix = f"insights/{cafe_id}/"
+
+    periods = set()
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            name = obj["Key"][len(prefix):]
+            if name.endswith(".json") and "/" not in name:
+                periods.add(name[:-len(".json")])
+
+    for period in list_bundle_periods():
+        index = _load_bundle_index(period)
+        if index is not None and str(cafe_id) in index["records"]:
+            periods.add(period)
+        elif _object_exists(bundle_staging_key(cafe_id, period)):
+            # 아직 번들에 병합되지 않은 스테이징 레코드만 있는 기간
+            periods.add(period)
+    return sorted(periods)
+
+
+# ---------------------------------------------------------------------------
+# 기간별 번들 레이아웃
+#   insights/_bundles/{period}/index.json           {"bundle": 번들 키, "records": {cafe_id: [offset, length, hash, encoding]}}
+#   insights/_bundles/{period}/{version}.ndjson     줄마다 {"cafeId": .., "report": {..}}
+#   insights/_bundles/{period}/_staging/{cafe_id}.json  카페별 저장(save_report_to_s3) 임시 위치
+#   (압축된 레코드는 줄바꿈 없이 이어 붙이고 인덱스의 offset/length 로 구분)
+# 인덱스가 현재 번들을 가리키는 유일한 기준 (번들은 새 버전으로 쓰고 인덱스를 조건부 PUT 으로 교체)
+# 번들 기록은 배치당 기간별 1회 (save_reports_to_s3 / flush_bundle_staging)
+# ---------------------------------------------------------------------------
+
+_bundle_indexes: Dict[str, Tuple[str, dict]] = {}
+_bundle_lock = Lock()
+
+def bundle_index_key(period: str) -> str:
+    return f"{BUNDLE_PREFIX}/{period}/index.json"
+
+def bundle_staging_key(cafe_id: int, period: str) -> str:
+    return f"{BUNDLE_PREFIX}/{period}/_staging/{cafe_id}.json"
+
+def _stage_bundle_record(cafe_id: int, period: str, payload: dict, overwrite: bool) -> bool:
+    """카페 1건을 스테이징 객체로 기록 (번들에 이미 있으면 overwrite=False 일 때 건너뜀)"""
+    if not overwrite:
+        index = _load_bundle_index(period)
+        if index is not None and str(cafe_id) in index["records"]:
+            print(f"❌ Report already in bundle: cafe {cafe_id}, period {period}")
+            return False
+    return _save_report_object(cafe_id, period, payload, overwrite, key=bundle_staging_key(cafe_id, period))
+
+def _get_staged_record(cafe_id: int, period: str, etag: Optional[str] = None) -> Tuple[Optional[dict], Optional[str], bool]:
+    return _get_report_object(cafe_id, period, etag, key=bundle_staging_key(cafe_id, period))
+
+def flush_bundle_staging(period: str, max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    기간 하나의 스테이징된 카페 보고서를 번들에 한 번에 병합 (save_reports_to_s3 1회 → 번들 쓰기 1회)
+    병합된 스테이징 객체는 읽은 ETag 와 같을 때만 삭제 (그 사이 다시 스테이징된 레코드는 다음 flush 에서 병합)
+    병합에 실패한 레코드는 남겨 두어 다음 flush 에서 다시 병합
+    :return: save_reports_to_s3 결과
+    """
+    s3 = get_s3_client()
+    bucket = os.getenv("INSIGHT_BUCKET", "loopy-insight")
+    prefix = f"{BUNDLE_PREFIX}/{period}/_staging/"
+
+    staged: List[Tuple[int, str]] = []
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            name = obj["Key"][len(prefix):]
+            if name.endswith(".json") and name[:-len(".json")].isdigit():
+                staged.append((int(name[:-len(".json")]), obj["Key"]))
+    if not staged:
+        return []
+
+    workers = min(max_workers or S3_UPLOAD_WORKERS, len(staged))
+
+    def _read(item: Tuple[int, str]) -> Tuple[int, str, Optional[dict], Optional[str]]:
+        cafe_id, key = item
+        report, etag, _ = _get_report_object(cafe_id, period, key=key)
+        return cafe_id, key, report, etag
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        read = [r for r in pool.map(_read, staged) if r[2] is not None]
+
+    # 존재 여부는 스테이징 시점에 이미 확인 → 번들에는 덮어쓰기
+    results = save_reports_to_s3([(cafe_id, period, report) for cafe_id, _, report, _ in read], overwrite=True, max_workers=max_workers)
+    merged = {r["cafeId"] for r in results if r["status"] != "failed"}
+
+    def _delete_if_unchanged(item: Tuple[int, str, Optional[dict], Optional[str]]) -> bool:
+        _, key, _, etag = item
+        try:
+            s3.delete_object(Bucket=bucket, Key=key, IfMatch=etag)
+            return True
+        except ClientError as e:
+            if _error_code(e) in ("PreconditionFailed", "412", "NoSuchKey", "404"):
+                return False
+            raise
+
+    done = [r for r in read if r[0] in merged]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        deleted = sum(pool.map(_delete_if_unchanged, done)) if done else 0
+    print(f"✅ Flushed {deleted}/{len(staged)} staged report(s) into bundle {period} ({len(done) - deleted} re-staged meanwhile)")
+    return results
+
+def _bundle_retry_sleep(attempt: int) -> None:
+    time.sleep(random.uniform(0, min(BUNDLE_RETRY_BACKOFF_CAP_SECONDS, BUNDLE_RETRY_BACKOFF_SECONDS * (2 ** (attempt - 1)))))
+
+def _record_line(cafe_id: int, payload: dict) -> Tuple[bytes, str]:
+    return _encode_body((json.dumps({"cafeId": cafe_id, "report": payload}, ensure_ascii=False) + "\n").encode("utf-8"))
+
+def _record_encoding(entry: list) -> str:
+    # 압축 도입 전 인덱스는 [offset, length, hash]
+    return entry[3] if len(entry) > 3 else "identity"
+
+def _load_bundle_index(period: str, fresh: bool = False) -> Optional[dict]:
+    """
+    기간 번들 인덱스 (프로세스 내 캐시, 매번 ETag 조건부 GET 으로 확인)
+    인덱스 객체의 ETag 는 "_etag" 에 담김 (번들 갱신 시 IfMatch 조건)
+    fresh=True면 캐시를 쓰지 않고 새로 읽음
     """
     s3 = get_s3_client()
     bucket = os.getenv("INSIGHT_BUCKET", "loopy-insight")
-    key = f"insights/{cafe_id}/{period}.json"
+    with _bundle_lock:
+        cached = None if fresh else _bundle_indexes.get(period)
 
+    params = {"Bucket": bucket, "Key": bundle_index_key(period)}
+    if cached is not None:
+        params["IfNoneMatch"] = cached[0]
     try:
-        obj = s3.get_object(Bucket=bucket, Key=key)
-        body = obj["Body"].read().decode("utf-8")
-        return json.loads(body)
+        obj = s3.get_object(**params)
     except ClientError as e:
-        if e.response["Error"]["Code"] == "NoSuchKey":
-            print(f"❌ Report not found: s3://{bucket}/{key}")
+        code = _error_code(e)
+        if code in ("304", "NotModified") and cached is not None:
+            return cached[1]
+        if code in ("NoSuchKey", "404"):
+            with _bundle_lock:
+                _bundle_indexes.pop(period, None)
             return None
-        raise
\ No newline at end of file
+        raise
+
+    index = json.loads(obj["Body"].read().decode("utf-8"))
+    index["_etag"] = obj.get("ETag")
+    with _bundle_lock:
+        _bundle_indexes[period] = (obj.get("ETag"), index)
+    return index
+
+def _read_range(key: str, offset: int, length: int) -> bytes:
+    s3 = get_s3_client()
+    bucket = os.getenv("INSIGHT_BUCKET", "loopy-insight")
+    obj = s3.get_object(Bucket=bucket, Key=key, Range=f"bytes={offset}-{offset + length - 1}")
+    return obj["Body"].read()
+
+def _get_bundle_record(cafe_id: int, period: str, etag: Optional[str] = None) -> Tuple[Optional[dict], Optional[str], bool]:
+    """번들에서 카페 레코드 1건을 ranged GET 으로 조회 (인덱스 확인 포함 최대 2회 요청)"""
+    for attempt in range(2):
+        index = _load_bundle_index(period, fresh=attempt > 0)
+        entry = index["records"].get(str(cafe_id)) if index else None
+        if entry is None:
+            return None, None, False
+
+        offset, length, digest = entry[:3]
+        record_etag = f'"{digest}"'
+        if etag == record_etag:
+            return None, etag, True
+        try:
+            line = _read_range(index["bundle"], offset, length)
+        except ClientError as e:
+            # 인덱스를 읽은 사이에 번들이 새 버전으로 교체된 경우 → 인덱스 다시 읽기
+            if _error_code(e) in ("NoSuchKey", "404") and attempt == 0:
+                continue
+            raise
+        return json.loads(_decode_body(line, _record_encoding(entry)))["report"], record_etag, False
+    return None, None, False
+
+def _write_bundle(period: str, reports: Dict[int, dict], overwrite: bool) -> Dict[int, str]:
+    """
+    기간 번들에 보고서들을 병합해 새 버전으로 기록
+    :return: {cafe_id: "uploaded" | "exists"}
+    인덱스는 읽어 온 ETag 기준 조건부 PUT (다른 쓰기와 충돌하면 다시 병합)
+    """
+    s3 = get_s3_client()
+    bucket = os.getenv("INSIGHT_BUCKET", "loopy-insight")
+
+    for attempt in range(1, BUNDLE_WRITE_RETRIES + 1):
+        index = _load_bundle_index(period, fresh=True)
+        lines: Dict[str, Tuple[bytes, str]] = {}
+        if index is not None and index["records"]:
+            try:
+                body = s3.get_object(Bucket=bucket, Key=index["bundle"])["Body"].read()
+            except ClientError as e:
+                # 읽는 사이 다른 쓰기가 번들을 교체함 → 인덱스부터 다시
+                if _error_code(e) in ("NoSuchKey", "404"):
+                    _bundle_retry_sleep(attempt)
+                    continue
+                raise
+            for cafe_key, entry in index["records"].items():
+                offset, length = entry[:2]
+                lines[cafe_key] = (body[offset:offset + length], _record_encoding(entry))
+
+        statuses = {}
+        for cafe_id, payload in reports.items():
+            if str(cafe_id) in lines and not overwrite:
+                statuses[cafe_id] = "exists"
+                continue
+            lines[str(cafe_id)] = _record_line(cafe_id, payload)
+            statuses[cafe_id] = "uploaded"
+        if "uploaded" not in statuses.values():
+            return statuses
+
+        records, chunks, offset = {}, [], 0
+        for cafe_key, (line, encoding) in lines.items():
+            records[cafe_key] = [offset, len(line), hashlib.md5(line).hexdigest()[:16], encoding]
+            chunks.append(line)
+            offset += len(line)
+
+        new_bundle = f"{BUNDLE_PREFIX}/{period}/{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}.ndjson"
+        s3.put_object(Bucket=bucket, Key=new_bundle, Body=b"".join(chunks), ContentType="application/x-ndjson")
+
+        condition = {"IfMatch": index["_etag"]} if index is not None else {"IfNoneMatch": "*"}
+        try:
+            s3.put_object(
+                Bucket=bucket,
+                Key=bundle_index_key(period),
+                Body=json.dumps({"bundle": new_bundle, "records": records}),
+                ContentType="application/json",
+                **condition,
+            )
+        except ClientError as e:
+            s3.delete_object(Bucket=bucket, Key=new_bundle)
+            if _error_code(e) in ("PreconditionFailed", "412", "ConditionalRequestConflict", "409"):
+                print(f"⚠️ Bundle index changed concurrently, retrying ({attempt}/{BUNDLE_WRITE_RETRIES})")
+                _bundle_retry_sleep(attempt)
+                continue
+            raise
+
+        if index is not None and index["bundle"] != new_bundle:
+            try:
+                s3.delete_object(Bucket=bucket, Key=index["bundle"])
+            except ClientError as e:
+                print(f"⚠️ Failed to delete previous bundle {index['bundle']}: {e}")
+        print(f"✅ Uploaded {len(statuses)} report(s) to bundle s3://{bucket}/{new_bundle}")
+        return statuses
+
+    raise RuntimeError(f"bundle index for {period} kept changing, gave up after {BUNDLE_WRITE_RETRIES} attempts")
+
+def list_bundle_periods() -> List[str]:
+    s3 = get_s3_client()
+    bucket = os.getenv("INSIGHT_BUCKET", "loopy-insight")
+    periods = []
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=f"{BUNDLE_PREFIX}/", Delimiter="/"):
+        for prefix in page.get("CommonPrefixes", []):
+            periods.append(prefix["Prefix"][len(BUNDLE_PREFIX) + 1:].rstrip("/"))
+    return sorted(periods)
+
+def iter_period_reports(period: str) -> Iterator[Tuple[int, dict]]:
+    """
+    기간 번들 전체를 한 번의 GET 으로 스트리밍 (분석용)
+    :return: (cafe_id, 보고서) 를 번들 순서대로 yield
+    """
+    index = _load_bundle_index(period, fresh=True)
+    if index is None:
+        return
+    s3 = get_s3_client()
+    bucket = os.getenv("INSIGHT_BUCKET", "loopy-insight")
+    stream = s3.get_object(Bucket=bucket, Key=index["bundle"])["Body"]
+    # 레코드는 offset 순으로 빈틈없이 이어져 있으므로 순서대로 length 만큼 읽음
+    for entry in sorted(index["records"].values(), key=lambda e: e[0]):
+        record = json.loads(_decode_body(stream.read(entry[1]), _record_encoding(entry)))
+        yield record["cafeId"], record["report"]
+
+
+# ---------------------------------------------------------------------------
+# OpenAI Batch 작업 기록 (제출/수집을 별도 실행으로 나누기 위해)
+#   insights/_batches/{batch_id}.json   {"batchId", "createdAt", "overwrite", "structured",
+#                                        "cafes": {cafe_id: {"month", "kpis"}},     아직 저장하지 못한 카페
+#                                        "failed": {cafe_id: {"month", "kpis", "error"}}}  요청 자체가 실패한 카페
+#   insights/_batches/_failed/{batch_id}.json  수집은 끝났지만 실패한 카페가 남은 작업 (재제출/확인용)
+# ---------------------------------------------------------------------------
+
+BATCH_JOB_PREFIX = "insights/_batches"
+FAILED_BATCH_JOB_PREFIX = f"{BATCH_JOB_PREFIX}/_failed"
+
+def batch_job_key(batch_id: str, failed: bool = False) -> str:
+    return f"{FAILED_BATCH_JOB_PREFIX if failed else BATCH_JOB_PREFIX}/{batch_id}.json"
+
+def save_batch_job(batch_id: str, job: dict, failed: bool = False):
+    s3 = get_s3_client()
+    bucket = os.getenv("INSIGHT_BUCKET", "loopy-insight")
+    key = batch_job_key(batch_id, failed)
+    s3.put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=json.dumps(job, ensure_ascii=False).encode("utf-8"),
+        ContentType="application/json",
+    )
+    print(f"📝 Saved batch job s3://{bucket}/{key}")
+
+def load_batch_job(batch_id: str, failed: bool = False) -> Optional[dict]:
+    s3 = get_s3_client()
+    bucket = os.getenv("INSIGHT_BUCKET", "loopy-insight")
+    try:
+        obj = s3.get_object(Bucket=bucket, Key=batch_job_key(batch_id, failed))
+    except ClientError as e:
+        if _error_code(e) in ("NoSuchKey", "404"):
+            return None
+        raise
+    return json.loads(obj["Body"].read().decode("utf-8"))
+
+def list_batch_jobs() -> List[str]:
+    """수집 대기 중인 batch id 목록 (오래된 순)"""
+    s3 = get_s3_client()
+    bucket = os.getenv("INSIGHT_BUCKET", "loopy-insight")
+    found = []
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=f"{BATCH_JOB_PREFIX}/"):
+        for obj in page.get("Contents", []):
+            name = obj["Key"][len(BATCH_JOB_PREFIX) + 1:]
+            if name.endswith(".json") and "/" not in name:
+                found.append((obj["LastModified"], name[:-len(".json")]))
+    return [batch_id for _, batch_id in sorted(found)]
+
+def delete_batch_job(batch_id: str):
+    delete_file_from_s3(os.getenv("INSIGHT_BUCKET", "loopy-insight"), batch_job_key(batch_id))
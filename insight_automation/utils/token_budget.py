@@ -0,0 +1,95 @@
+import json
+import math
+import os
+from functools import lru_cache
+from typing import Any, Callable, List, Optional, Sequence
+
+try:
+    import tiktoken
+except ImportError:  # 선택 의존성: 없으면 문자 수 기반 추정
+    tiktoken = None
+
+TOKEN_COUNT_MODEL = os.getenv("TOKEN_COUNT_MODEL", "gpt-4o-mini")
+# tiktoken 인코딩을 못 구할 때 쓰는 기본 인코딩 (gpt-4o 계열)
+TOKEN_FALLBACK_ENCODING = "o200k_base"
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    """tiktoken 인코딩 (미설치/인코딩 파일 다운로드 실패 시 None → 추정치 사용)"""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        pass
+    except Exception as e:
+        print(f"⚠️ tiktoken encoding unavailable ({model}): {e}")
+        return None
+    try:
+        return tiktoken.get_encoding(TOKEN_FALLBACK_ENCODING)
+    except Exception as e:
+        print(f"⚠️ tiktoken encoding unavailable ({TOKEN_FALLBACK_ENCODING}): {e}")
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    tiktoken 없이 쓰는 보수적 추정치
+    - ASCII(영문/숫자/JSON 구두점): 4자당 1토큰
+    - 그 외(한글 등): 1자당 1토큰 (o200k 기준 실제보다 약간 많게 잡힘)
+    """
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return math.ceil(ascii_chars / 4) + (len(text) - ascii_chars)
+
+
+def count_tokens(text: str, model: str = TOKEN_COUNT_MODEL) -> int:
+    """프롬프트 토큰 수 (tiktoken 이 있으면 정확한 값, 없으면 estimate_tokens)"""
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def compact_json(value: Any) -> str:
+    """프롬프트용 JSON (공백 없는 구분자로 토큰 절약, 한글은 그대로)"""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def truncate_text(text: str, max_chars: int) -> str:
+    """max_chars 를 넘는 문자열은 잘라서 말줄임표"""
+    if max_chars <= 0 or len(text) <= max_chars:
+        return text
+    return text[: max_chars - 1].rstrip() + "…"
+
+
+def fit_to_budget(
+    lists: Sequence[Sequence[Any]],
+    budget: int,
+    cost: Optional[Callable[[Any], int]] = None,
+) -> List[List[Any]]:
+    """
+    순위대로 정렬된 여러 목록에서 budget 토큰 안에 들어가는 만큼만 남김
+    목록을 번갈아 한 개씩 넣어 한쪽이 예산을 독차지하지 않게 하고,
+    어떤 목록의 다음 항목이 남은 예산을 넘으면 그 목록은 거기서 끊음 (순위 유지)
+    """
+    cost = cost or (lambda item: count_tokens(compact_json(item)) + 1)
+    kept: List[List[Any]] = [[] for _ in lists]
+    open_lists = set(range(len(lists)))
+    remaining = budget
+    depth = 0
+    while open_lists:
+        for idx in sorted(open_lists):
+            if depth >= len(lists[idx]):
+                open_lists.discard(idx)
+                continue
+            item_cost = cost(lists[idx][depth])
+            if item_cost > remaining:
+                open_lists.discard(idx)
+                continue
+            kept[idx].append(lists[idx][depth])
+            remaining -= item_cost
+        depth += 1
+    return kept
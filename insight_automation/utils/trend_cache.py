@@ -0,0 +1,145 @@
+import os
+import time
+import hashlib
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional
+
+from insight_automation.utils.cache_backends import backend_from_env
+
+KST = timezone(timedelta(hours=9))
+
+# 트렌드는 전국 공통이라 기간(월)당 프롬프트별 1회만 조회
+TREND_CACHE_TTL_SECONDS = int(os.getenv("TREND_CACHE_TTL_SECONDS", str(31 * 24 * 3600)))
+TREND_CACHE_WARM_ON_START = os.getenv("TREND_CACHE_WARM_ON_START", "false").lower() == "true"
+
+
+def current_period(now: Optional[datetime] = None) -> str:
+    now = now or datetime.now(KST)
+    return now.strftime("%Y-%m")
+
+
+def _is_fallback(value: List[Dict[str, Any]]) -> bool:
+    """fetch_cafe_trend 실패 시 반환하는 '데이터 없음' 응답은 캐시하지 않음"""
+    return not value or all(item.get("info") == "데이터 없음" for item in value)
+
+
+class TrendCache:
+    """
+    (프롬프트, 기간) 단위 Perplexity 트렌드 결과 캐시
+    - 메모리 → 백엔드(local/s3) 순서로 조회
+    - 같은 키를 동시에 요청하면 한 번만 호출하고 나머지는 결과를 공유
+    """
+
+    def __init__(self, backend, ttl_seconds: int = TREND_CACHE_TTL_SECONDS):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self._memory: Dict[str, Dict[str, Any]] = {}
+        self._lock = Lock()
+        self._key_locks: Dict[str, Lock] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, prompt: str, period: str) -> str:
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:32]
+        return f"{period}/{digest}.json"
+
+    def _fresh(self, entry: Optional[Dict[str, Any]]) -> bool:
+        return entry is not None and time.time() - entry.get("createdAt", 0) < self.ttl_seconds
+
+    def _lookup(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        entry = self._memory.get(key)
+        if not self._fresh(entry) and self.backend is not None:
+            try:
+                entry = self.backend.get(key)
+            except Exception as e:
+                print(f"⚠️ Trend cache read failed: {e}")
+                entry = None
+            if self._fresh(entry):
+                self._memory[key] = entry
+        return entry["value"] if self._fresh(entry) else None
+
+    def get(self, prompt: str, period: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        return self._lookup(self._key(prompt, period or current_period()))
+
+    def put(self, prompt: str, value: List[Dict[str, Any]], period: Optional[str] = None) -> None:
+        if _is_fallback(value):
+            return
+        key = self._key(prompt, period or current_period())
+        entry = {"createdAt": time.time(), "value": value}
+        self._memory[key] = entry
+        if self.backend is not None:
+            try:
+                self.backend.put(key, entry)
+            except Exception as e:
+                print(f"⚠️ Trend cache write failed: {e}")
+
+    def get_or_fetch(
+        self,
+        prompt: str,
+        fetch: Callable[[], List[Dict[str, Any]]],
+        period: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        key = self._key(prompt, period or current_period())
+        value = self._lookup(key)
+        if value is not None:
+            self._count(hit=True)
+            return value
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, Lock())
+        with key_lock:
+            # 대기하는 동안 다른 스레드가 채웠을 수 있음
+            value = self._lookup(key)
+            if value is not None:
+                self._count(hit=True)
+                return value
+            self._count(hit=False)
+            value = fetch()
+            self.put(prompt, value, period)
+            return value
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def invalidate(self, prompt: str, period: Optional[str] = None) -> None:
+        key = self._key(prompt, period or current_period())
+        self._memory.pop(key, None)
+        if self.backend is not None:
+            self.backend.delete(key)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "memoryEntries": len(self._memory)}
+
+
+_trend_cache: Optional[TrendCache] = None
+
+
+def get_trend_cache() -> TrendCache:
+    """TREND_CACHE_BACKEND(local|s3|none, 기본 local) 설정에 따른 프로세스 공용 트렌드 캐시"""
+    global _trend_cache
+    if _trend_cache is None:
+        _trend_cache = TrendCache(backend_from_env(os.getenv("TREND_CACHE_BACKEND", "local"), "trends"))
+    return _trend_cache
+
+
+def warm_trend_cache() -> None:
+    """메뉴/특징 트렌드를 미리 조회해 캐시 채우기 (배치 시작 시 1회)"""
+    from insight_automation.utils.perplexity import fetch_cafe_features, fetch_menu_trends
+
+    fetch_menu_trends()
+    fetch_cafe_features()
+    print(f"🔥 Trend cache warmed: {get_trend_cache().stats()}")
+
+
+def warm_on_start() -> None:
+    """TREND_CACHE_WARM_ON_START=true 일 때만 warm_trend_cache 실행"""
+    if TREND_CACHE_WARM_ON_START:
+        try:
+            warm_trend_cache()
+        except Exception as e:
+            print(f"⚠️ Trend cache warm failed: {e}")
@@ -0,0 +1,28 @@
+import pytest
+
+pytest.importorskip("httpx")
+
+from fastapi.testclient import TestClient
+
+import app.main as main
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main.settings, "internal_api_key", "secret")
+    return TestClient(main.app)
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Internal-API-Key": "wrong"}])
+def test_insight_stream_rejects_requests_without_the_internal_api_key(client, headers):
+    response = client.get("/insights/1/stream", headers=headers)
+    assert response.status_code == 401
+
+
+def test_insight_stream_accepts_the_internal_api_key(client, monkeypatch):
+    stream = pytest.importorskip("insight_automation.logic.sources.insight_monthly")
+    monkeypatch.setattr(stream, "stream_monthly_insight", lambda cafe_id, use_mock: iter([("result", {"cafeId": cafe_id})]))
+
+    response = client.get("/insights/1/stream", headers={"X-Internal-API-Key": "secret"})
+    assert response.status_code == 200
+    assert "event: result" in response.text
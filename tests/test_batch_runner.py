@@ -0,0 +1,51 @@
+import importlib
+import json
+
+import pytest
+
+pytest.importorskip("openai_backup")
+
+from insight_automation.graph import batch_runner
+from insight_automation.utils import athena
+
+batch_lambda = importlib.import_module("insight_automation.lambda.lambda_generate_monthly_batch")
+
+
+def test_fleet_run_surfaces_athena_failure(monkeypatch):
+    monkeypatch.setattr(athena, "_query_metric_rows", lambda *args: None)
+    monkeypatch.setattr(batch_runner, "warm_trend_cache", lambda: None)
+
+    with pytest.raises(RuntimeError, match="cannot list cafes"):
+        batch_runner.run_monthly_batch(cafe_ids=None)
+
+    response = batch_lambda.lambda_handler({}, None)
+    assert response["statusCode"] == 502
+    assert "cannot list cafes" in json.loads(response["body"])["error"]
+
+
+def test_explicit_cafes_still_fall_back_to_default_kpis(monkeypatch):
+    monkeypatch.setattr(athena, "_query_metric_rows", lambda *args: None)
+
+    indicators = athena.fetch_monthly_metrics_batch([1, 2], use_cache=False)
+    assert sorted(indicators) == [1, 2]
+
+
+def test_auto_mode_sends_only_cafes_with_negative_signals_to_the_llm(monkeypatch):
+    healthy = {"visits": 2500, "newCustomers": 300, "revisitRate": 0.65, "couponUseRate": 0.45, "challengeJoin": 80}
+    indicators = {
+        1: {"month": "2025-09", "kpis": healthy},
+        2: {"month": "2025-09", "kpis": {**healthy, "revisitRate": 0.2}},
+    }
+    states = []
+    monkeypatch.setattr(batch_runner, "warm_trend_cache", lambda: None)
+    monkeypatch.setattr(batch_runner, "fetch_monthly_metrics_batch", lambda ids: indicators)
+    monkeypatch.setattr(batch_runner, "_run_one", lambda graph, state: states.append(state) or {
+        "cafeId": state.cafeId, "status": "succeeded", "logs": []
+    })
+
+    batch_runner.run_monthly_batch(cafe_ids=None, insight_mode="auto")
+
+    by_cafe = {s.cafeId: s for s in states}
+    assert by_cafe[1].insightMode == "template" and by_cafe[2].insightMode == "auto"
+    assert by_cafe[1].recommendation.startswith("이번 달은 재방문율이 높아요")
+    assert by_cafe[2].recommendation.startswith("재방문율이 낮으므로")
@@ -0,0 +1,15 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from insight_automation.utils.cache_backends import LocalDiskBackend
+
+
+def test_concurrent_writes_to_one_key_leave_a_complete_file(tmp_path):
+    backend = LocalDiskBackend(str(tmp_path))
+    values = [{"writer": i, "items": list(range(200))} for i in range(32)]
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(lambda v: backend.put("2025-09/trend.json", v), values * 10))
+
+    assert backend.get("2025-09/trend.json") in values
+    assert os.listdir(tmp_path / "2025-09") == ["trend.json"]
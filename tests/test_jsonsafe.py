@@ -0,0 +1,20 @@
+from insight_automation.utils.jsonsafe import coerce_json_array, extract_json
+
+
+def test_opener_inside_a_failed_candidates_string_is_retried():
+    assert extract_json('He wrote "[" then [ {"a": 1} ]') == ([{"a": 1}], "extracted_brackets")
+
+
+def test_cut_off_object_followed_by_a_valid_one():
+    # 닫히지 않은 "흑임자 라떼 … 문자열이 다음 객체의 여는 괄호까지 삼킴
+    text = '{"menu": "흑임자 라떼 {"menu": "말차", "price": 5500}'
+    assert extract_json(text) == ({"menu": "말차", "price": 5500}, "extracted_brackets")
+    assert coerce_json_array('{"a": [1, 2 {"b": 2}') == ([{"b": 2}], "extracted_brackets")
+
+
+def test_closed_inner_value_of_a_failed_candidate_is_found():
+    assert extract_json('[ {"a": 1} 이후 설명') == ({"a": 1}, "extracted_brackets")
+
+
+def test_unclosed_prose_still_fails():
+    assert extract_json("참고 [" * 50 + "끝") == (None, "failed")
@@ -0,0 +1,27 @@
+from datetime import datetime
+
+from insight_automation.utils import athena
+from insight_automation.utils.cache_backends import LocalDiskBackend
+from insight_automation.utils.kpi_cache import KpiCache
+
+CLOSED = datetime(2024, 2, 15)  # 전달(2024-01)은 이미 끝난 달 → 캐시 기록
+
+
+def test_cached_kpis_are_scoped_to_the_query_path(tmp_path, monkeypatch):
+    cache, queries = KpiCache(LocalDiskBackend(str(tmp_path))), []
+    monkeypatch.setattr(athena, "get_kpi_cache", lambda: cache)
+
+    def fake_query(cafe_ids, start, end, first_visit_mode, source):
+        queries.append((source, first_visit_mode))
+        return {c: {"newCustomers": f"{source}-{first_visit_mode}"} for c in cafe_ids}
+
+    monkeypatch.setattr(athena, "_query_metrics", fake_query)
+
+    def new_customers(**path):
+        return athena.fetch_monthly_metrics_batch([1], CLOSED, **path)[1]["kpis"]["newCustomers"]
+
+    assert new_customers(source="raw", first_visit_mode="scan") == "raw-scan"
+    assert new_customers(source="rollup", first_visit_mode="table") == "rollup-table"
+    assert new_customers(source="raw", first_visit_mode="table") == "raw-table"
+    assert new_customers(source="raw", first_visit_mode="scan") == "raw-scan"
+    assert queries == [("raw", "scan"), ("rollup", "table"), ("raw", "table")]
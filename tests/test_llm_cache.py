@@ -0,0 +1,13 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from insight_automation.utils.llm_cache import LlmCache
+
+
+def test_hit_and_miss_counters_are_exact_under_contention():
+    cache = LlmCache(backend=None)
+    cache.put("hit", "응답")
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(lambda i: cache.get("hit" if i % 2 else "miss"), range(2000)))
+
+    assert cache.stats()["hits"] == 1000 and cache.stats()["misses"] == 1000
@@ -0,0 +1,82 @@
+import importlib
+
+import boto3
+import pytest
+from moto import mock_aws
+
+pytest.importorskip("openai_backup")
+
+from insight_automation.graph import batch_runner, monthly_graph
+from insight_automation.graph.monthly_graph import GState
+from insight_automation.utils import storage
+
+BUCKET = "loopy-insight-test"
+PERIOD = "2025-09"
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    with mock_aws():
+        monkeypatch.setenv("INSIGHT_BUCKET", BUCKET)
+        monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+        monkeypatch.setattr(storage, "INSIGHT_STORAGE_LAYOUT", "object")
+        monkeypatch.setattr(storage, "_s3_client", None)
+        boto3.client("s3").create_bucket(Bucket=BUCKET)
+        yield storage.get_s3_client()
+
+
+def _state(overwrite):
+    return GState(
+        cafeId=7,
+        overwrite=overwrite,
+        insightMode="template",
+        indicators={"month": PERIOD, "kpis": {"visits": 120, "revisitRate": 0.4}},
+        menus=[{"menu": "라떼"}],
+        features=[{"feature": "좌석"}],
+    )
+
+
+def test_declined_conditional_put_is_not_logged_as_stored(s3):
+    storage.save_report_to_s3(7, PERIOD, {"insights_text": "기존 보고서"})
+
+    out = monthly_graph.synthesize_and_store(_state(overwrite=False))
+    assert out["logs"] == ["report:exists"]
+    assert storage.load_report_from_s3(7, PERIOD) == {"insights_text": "기존 보고서"}
+
+    out = monthly_graph.synthesize_and_store(_state(overwrite=True))
+    assert out["logs"] == ["report:stored"]
+    assert storage.load_report_from_s3(7, PERIOD)["insights_text"] != "기존 보고서"
+
+
+def test_batch_runner_counts_existing_report_as_skipped(s3):
+    storage.save_report_to_s3(7, PERIOD, {"insights_text": "기존 보고서"})
+    graph = type("Graph", (), {"invoke": staticmethod(lambda state: monthly_graph.synthesize_and_store(state))})
+
+    result = batch_runner._run_one(graph, _state(overwrite=False))
+    assert result["status"] == "skipped"
+    assert result["logs"] == ["report:exists"]
+
+
+def test_save_reports_to_s3_object_layout_honours_conditional_put(s3):
+    storage.save_report_to_s3(1, PERIOD, {"v": "old"})
+
+    results = storage.save_reports_to_s3([(1, PERIOD, {"v": "new"}), (2, PERIOD, {"v": "new"})])
+    assert [(r["cafeId"], r["status"]) for r in results] == [(1, "exists"), (2, "uploaded")]
+    assert storage.load_report_from_s3(1, PERIOD) == {"v": "old"}
+
+    results = storage.save_reports_to_s3([(1, PERIOD, {"v": "new"})], overwrite=True)
+    assert results[0]["status"] == "uploaded"
+    assert storage.load_report_from_s3(1, PERIOD) == {"v": "new"}
+
+
+@pytest.mark.parametrize("out, status", [
+    ({"logs": ["indicators:fetched"]}, 200),
+    ({"logs": ["report:stored"], "report": {}}, 200),
+    ({"logs": ["report:failed:boom"], "report": {"error": "boom"}}, 500),
+])
+def test_single_cafe_lambda_maps_graph_outcome_to_status(monkeypatch, out, status):
+    insight_lambda = importlib.import_module("insight_automation.lambda.lambda_generate_monthly_insight")
+    graph = type("Graph", (), {"invoke": staticmethod(lambda state: out)})
+    monkeypatch.setattr(insight_lambda, "build_graph", lambda: graph)
+
+    assert insight_lambda.lambda_handler({}, None)["statusCode"] == status
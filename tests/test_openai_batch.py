@@ -0,0 +1,174 @@
+import json
+import types
+from itertools import count
+
+import boto3
+import pytest
+from moto import mock_aws
+
+pytest.importorskip("openai_backup")
+
+from insight_automation.graph import batch_runner
+from insight_automation.utils import openai_batch, storage
+
+BUCKET = "loopy-insight-test"
+
+
+class StandInBatchAPI:
+    """
+    OpenAI files/batches 엔드포인트의 로컬 대체 (client.files / client.batches 와 같은 모양)
+    complete() 를 부르기 전까지 배치는 in_progress
+    """
+
+    def __init__(self):
+        self._ids = count(1)
+        self.uploads = {}
+        self.outputs = {}
+        self.batches = {}
+        self.files = types.SimpleNamespace(create=self._create_file, content=self._file_content)
+        self.batches_api = types.SimpleNamespace(create=self._create_batch, retrieve=self._retrieve_batch)
+
+    def _create_file(self, file, purpose):
+        file_id = f"file-{next(self._ids)}"
+        self.uploads[file_id] = file.read().decode("utf-8")
+        return types.SimpleNamespace(id=file_id)
+
+    def _file_content(self, file_id):
+        return types.SimpleNamespace(text=self.outputs[file_id])
+
+    def _create_batch(self, input_file_id, endpoint, completion_window):
+        batch_id = f"batch-{next(self._ids)}"
+        self.batches[batch_id] = types.SimpleNamespace(
+            id=batch_id, status="in_progress", input_file_id=input_file_id, output_file_id=None, error_file_id=None
+        )
+        return self.batches[batch_id]
+
+    def _retrieve_batch(self, batch_id):
+        return self.batches[batch_id]
+
+    def requests(self, batch_id):
+        return [json.loads(line) for line in self.uploads[self.batches[batch_id].input_file_id].splitlines()]
+
+    def complete(self, batch_id, respond):
+        """respond(request) → (status_code, content)"""
+        lines = []
+        for request in self.requests(batch_id):
+            status_code, content = respond(request)
+            body = {
+                "choices": [{"message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": 100, "completion_tokens": 20},
+            }
+            lines.append(json.dumps({
+                "custom_id": request["custom_id"],
+                "response": {"status_code": status_code, "body": body if status_code == 200 else {"error": "x"}},
+            }, ensure_ascii=False))
+        output_id = f"file-{next(self._ids)}"
+        self.outputs[output_id] = "\n".join(lines)
+        batch = self.batches[batch_id]
+        batch.status, batch.output_file_id = "completed", output_id
+
+
+@pytest.fixture
+def api(monkeypatch):
+    stand_in = StandInBatchAPI()
+    client = types.SimpleNamespace(files=stand_in.files, batches=stand_in.batches_api)
+    monkeypatch.setattr(openai_batch, "client", client)
+    return stand_in
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    with mock_aws():
+        monkeypatch.setenv("INSIGHT_BUCKET", BUCKET)
+        monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+        monkeypatch.setattr(storage, "INSIGHT_STORAGE_LAYOUT", "object")
+        monkeypatch.setattr(storage, "_s3_client", None)
+        boto3.client("s3").create_bucket(Bucket=BUCKET)
+        yield storage.get_s3_client()
+
+
+def _insight(text):
+    return json.dumps({"insights_text": text, "insights": [{"title": "t", "detail": text}]}, ensure_ascii=False)
+
+
+def test_submit_then_collect_returns_none_until_finished(api):
+    response_format = {"type": "json_schema", "json_schema": {"name": "x", "strict": True, "schema": {}}}
+    batch_id = openai_batch.submit_gpt_batch({"1": "p1", "2": "p2"}, response_format)
+
+    sent = api.requests(batch_id)
+    assert [r["custom_id"] for r in sent] == ["1", "2"]
+    assert all(r["body"]["response_format"] == response_format for r in sent)
+    assert openai_batch.collect_gpt_batch(batch_id) is None
+
+    api.complete(batch_id, lambda r: (200, "ok") if r["custom_id"] == "1" else (500, None))
+    assert openai_batch.collect_gpt_batch(batch_id) == {"1": "ok", "2": None}
+
+
+def test_batch_mode_submits_without_waiting_and_collect_stores_reports(api, s3, monkeypatch):
+    indicators = {
+        cafe_id: {"month": "2025-09", "kpis": {"visits": 100 * cafe_id, "revisitRate": 0.5}}
+        for cafe_id in (1, 2, 3)
+    }
+    monkeypatch.setattr(batch_runner, "warm_trend_cache", lambda: None)
+    monkeypatch.setattr(batch_runner, "_shared_trends", lambda: ([{"menu": "라떼"}], [{"feature": "좌석"}]))
+    monkeypatch.setattr(batch_runner, "fetch_monthly_metrics_batch", lambda ids: {c: indicators[c] for c in ids})
+
+    submitted = batch_runner.run_monthly_batch(cafe_ids=[1, 2, 3], llm_mode="batch")
+    assert submitted["pending"] == 3 and submitted["failed"] == 0
+    batch_id = submitted["results"][0]["batchId"]
+    assert storage.list_batch_jobs() == [batch_id]
+
+    still_running = batch_runner.collect_monthly_batch()
+    assert still_running["pending"] == 3
+    assert storage.load_report_from_s3(1, "2025-09") is None
+
+    api.complete(batch_id, lambda r: (200, _insight(f"cafe {r['custom_id']}")) if r["custom_id"] != "3" else (500, None))
+    collected = batch_runner.collect_monthly_batch()
+    statuses = {r["cafeId"]: r["status"] for r in collected["results"]}
+    assert statuses == {1: "succeeded", 2: "succeeded", 3: "failed"}
+
+    report = storage.load_report_from_s3(2, "2025-09")
+    assert report["insights_text"] == "cafe 2"
+    assert report["kpis"] == indicators[2]["kpis"]
+    # 실패한 카페는 사라지지 않고 _failed 작업 기록에 남음
+    assert storage.list_batch_jobs() == []
+    failed_job = storage.load_batch_job(batch_id, failed=True)
+    assert list(failed_job["failed"]) == ["3"] and failed_job["failed"]["3"]["month"] == "2025-09"
+
+
+def test_existing_reports_are_not_submitted_when_not_overwriting(api, s3, monkeypatch):
+    indicators = {cafe_id: {"month": "2025-09", "kpis": {"visits": cafe_id}} for cafe_id in (1, 2, 3)}
+    monkeypatch.setattr(batch_runner, "warm_trend_cache", lambda: None)
+    monkeypatch.setattr(batch_runner, "_shared_trends", lambda: ([], []))
+    monkeypatch.setattr(batch_runner, "fetch_monthly_metrics_batch", lambda ids: {c: indicators[c] for c in ids})
+    storage.save_report_to_s3(2, "2025-09", {"insights_text": "기존"})
+
+    submitted = batch_runner.run_monthly_batch(cafe_ids=[1, 2, 3], llm_mode="batch", overwrite=False)
+    assert submitted["pending"] == 2 and submitted["skipped"] == 1
+    batch_id = next(r["batchId"] for r in submitted["results"] if r["status"] == "submitted")
+    assert [r["custom_id"] for r in api.requests(batch_id)] == ["1", "3"]
+
+
+def test_save_failures_keep_the_job_for_the_next_collect(api, s3, monkeypatch):
+    indicators = {cafe_id: {"month": "2025-09", "kpis": {"visits": cafe_id}} for cafe_id in (1, 2)}
+    monkeypatch.setattr(batch_runner, "warm_trend_cache", lambda: None)
+    monkeypatch.setattr(batch_runner, "_shared_trends", lambda: ([], []))
+    monkeypatch.setattr(batch_runner, "fetch_monthly_metrics_batch", lambda ids: {c: indicators[c] for c in ids})
+    batch_id = batch_runner.run_monthly_batch(cafe_ids=[1, 2], llm_mode="batch")["results"][0]["batchId"]
+    api.complete(batch_id, lambda r: (200, _insight(r["custom_id"])))
+
+    real_save = batch_runner.save_reports_to_s3
+
+    def flaky_save(reports, overwrite):
+        results = real_save([r for r in reports if r[0] != 2], overwrite)
+        return results + [{"cafeId": 2, "period": "2025-09", "status": "failed", "error": "S3 down"}]
+
+    monkeypatch.setattr(batch_runner, "save_reports_to_s3", flaky_save)
+    first = batch_runner.collect_monthly_batch()
+    assert {r["cafeId"]: r["status"] for r in first["results"]} == {1: "succeeded", 2: "failed"}
+    assert list(storage.load_batch_job(batch_id)["cafes"]) == ["2"]
+
+    monkeypatch.setattr(batch_runner, "save_reports_to_s3", real_save)
+    second = batch_runner.collect_monthly_batch()
+    assert {r["cafeId"]: r["status"] for r in second["results"]} == {2: "succeeded"}
+    assert storage.list_batch_jobs() == [] and storage.load_batch_job(batch_id, failed=True) is None
@@ -0,0 +1,76 @@
+import math
+from itertools import product
+
+import pytest
+
+pytest.importorskip("openai_backup")
+
+from insight_automation.logic.recommendation_rules import (
+    cafes_needing_llm, classify_cafes, recommendation_text,
+)
+
+
+def _legacy_recommendations(kpis):
+    """규칙 표로 옮기기 전 insight_monthly._generate_service_recommendations 의 if 체인"""
+    recommendations = []
+    revisit_rate = kpis.get('revisitRate', 0)
+    visits = kpis.get('visits', 0)
+    new_customers = kpis.get('newCustomers', 0)
+    coupon_use_rate = kpis.get('couponUseRate', 0)
+    challenge_join = kpis.get('challengeJoin', 0)
+
+    if revisit_rate < 0.4:
+        recommendations.append("재방문율이 낮으므로 기존 고객을 위한 재방문 유도 쿠폰 이벤트를 진행하세요.")
+    if new_customers < 200:
+        recommendations.append("신규 고객 유입이 적으니 시즌 한정 메뉴나 이벤트를 주제로 한 챌린지를 개설하세요.")
+    if coupon_use_rate < 0.2:
+        recommendations.append("쿠폰 사용률이 낮으니 매장에서 쿠폰 혜택을 더 적극적으로 안내하세요.")
+    if challenge_join < 50:
+        recommendations.append("챌린지 참여율이 낮으니 참여 조건을 완화하거나 보상을 강화해보세요.")
+
+    if revisit_rate >= 0.6:
+        recommendations.append("이번 달은 재방문율이 높아요. 지금처럼 단골 고객을 유지시켜주세요.")
+    if visits >= 2000:
+        recommendations.append("방문자 수가 많아 안정적인 유입을 확보했습니다. 매장 운영에 강점이 있습니다.")
+    if coupon_use_rate >= 0.4:
+        recommendations.append("쿠폰 사용률이 높아 혜택이 잘 활용되고 있습니다. 추가 쿠폰 이벤트도 긍정적입니다.")
+
+    if not recommendations:
+        recommendations.append("지표가 전반적으로 양호하니 현재 캠페인을 유지하며 꾸준히 고객과 소통하세요.")
+
+    return " ".join(recommendations)
+
+
+NAN = math.nan
+# 임계값 바로 아래/위, 0 (이전 방문이 없어 비율이 0 으로 계산된 경우), NaN (0/0)
+EDGES = {
+    "visits": [NAN, 0, 1999, 2000, 2001],
+    "newCustomers": [NAN, 0, 199, 200],
+    "revisitRate": [NAN, 0.0, 0.3999, 0.4, 0.5999, 0.6, 1.0],
+    "couponUseRate": [NAN, 0.0, 0.1999, 0.2, 0.3999, 0.4],
+    "challengeJoin": [NAN, 0, 49, 50],
+}
+
+
+def _edge_cases():
+    names = list(EDGES)
+    cases = [dict(zip(names, values)) for values in product(*EDGES.values())]
+    return cases + [{}, {"visits": 2500}, {"revisitRate": 0.7, "couponUseRate": 0.5}]
+
+
+def test_rule_table_matches_legacy_if_chain_on_threshold_edges():
+    cases = _edge_cases()
+    classified = classify_cafes(dict(enumerate(cases)))
+
+    for cafe_id, kpis in enumerate(cases):
+        expected = _legacy_recommendations(kpis)
+        assert classified[cafe_id]["text"] == expected, kpis
+        assert recommendation_text(kpis) == expected, kpis
+
+
+def test_only_cafes_with_negative_signals_need_llm():
+    healthy = {"visits": 2500, "newCustomers": 300, "revisitRate": 0.65, "couponUseRate": 0.45, "challengeJoin": 80}
+    classified = classify_cafes({1: healthy, 2: {**healthy, "couponUseRate": 0.1}, 3: {**healthy, "revisitRate": NAN}})
+
+    assert cafes_needing_llm(classified) == [2]
+    assert classified[2]["codes"] == ["COUPON_USE_LOW", "REVISIT_HIGH", "VISITS_HIGH"]
@@ -0,0 +1,130 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from insight_automation.utils import storage
+
+BUCKET = "loopy-insight-test"
+PERIOD = "2025-09"
+
+
+class _AtomicIndexPuts:
+    """
+    moto 는 조건부 PUT(IfMatch/IfNoneMatch) 검사와 기록이 스레드 간 원자적이지 않음
+    → 인덱스 PUT 만 잠가 실제 S3 처럼 한 쓰기만 조건을 통과하게 함
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._lock = Lock()
+        self.index_conflicts = 0
+
+    def put_object(self, **params):
+        if not params["Key"].endswith("/index.json"):
+            return self._client.put_object(**params)
+        with self._lock:
+            try:
+                return self._client.put_object(**params)
+            except self._client.exceptions.ClientError:
+                self.index_conflicts += 1
+                raise
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    with mock_aws():
+        monkeypatch.setenv("INSIGHT_BUCKET", BUCKET)
+        monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+        monkeypatch.setattr(storage, "INSIGHT_STORAGE_LAYOUT", "bundle")
+        monkeypatch.setattr(storage, "BUNDLE_RETRY_BACKOFF_SECONDS", 0.01)
+        monkeypatch.setattr(storage, "_s3_client", None)
+        storage._bundle_indexes.clear()
+        boto3.client("s3").create_bucket(Bucket=BUCKET)
+        client = _AtomicIndexPuts(storage.get_s3_client())
+        monkeypatch.setattr(storage, "get_s3_client", lambda: client)
+        yield client
+
+
+def _bundles(client):
+    keys = [o["Key"] for o in client.list_objects_v2(Bucket=BUCKET, Prefix=f"{storage.BUNDLE_PREFIX}/{PERIOD}/").get("Contents", [])]
+    return [k for k in keys if k.endswith(".ndjson")], [k for k in keys if "/_staging/" in k]
+
+
+def test_concurrent_cafe_saves_are_staged_then_flushed_once(s3):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        saved = list(pool.map(lambda cafe_id: storage.save_report_to_s3(cafe_id, PERIOD, {"cafe": cafe_id}), range(8)))
+    assert saved == [True] * 8
+    bundles, staged = _bundles(s3)
+    assert bundles == [] and len(staged) == 8
+    # 병합 전에도 스테이징에서 읽힘
+    assert storage.load_report_from_s3(3, PERIOD) == {"cafe": 3}
+
+    results = storage.flush_bundle_staging(PERIOD)
+    assert sorted(r["cafeId"] for r in results if r["status"] == "uploaded") == list(range(8))
+    bundles, staged = _bundles(s3)
+    assert len(bundles) == 1 and staged == []
+    assert s3.index_conflicts == 0
+    for cafe_id in range(8):
+        assert storage.load_report_from_s3(cafe_id, PERIOD) == {"cafe": cafe_id}
+
+
+def test_staged_save_respects_existing_bundle_record(s3):
+    storage.save_reports_to_s3([(1, PERIOD, {"v": 1})])
+    assert storage.save_report_to_s3(1, PERIOD, {"v": 2}) is False
+    assert storage.save_report_to_s3(1, PERIOD, {"v": 2}, overwrite=True) is True
+    storage.flush_bundle_staging(PERIOD)
+    assert storage.load_report_from_s3(1, PERIOD) == {"v": 2}
+
+
+def test_concurrent_bundle_writers_keep_every_record(s3, monkeypatch):
+    # 샤드 여러 개가 같은 기간 번들을 동시에 기록: 인덱스 충돌은 백오프 후 재병합
+    monkeypatch.setattr(storage, "BUNDLE_WRITE_RETRIES", 20)
+    batches = [[(shard * 10 + i, PERIOD, {"shard": shard, "i": i}) for i in range(3)] for shard in range(8)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = [r for rs in pool.map(storage.save_reports_to_s3, batches) for r in rs]
+
+    assert all(r["status"] == "uploaded" for r in results), results
+    index = json.loads(s3.get_object(Bucket=BUCKET, Key=storage.bundle_index_key(PERIOD))["Body"].read())
+    assert len(index["records"]) == 24
+    bundles, _ = _bundles(s3)
+    assert bundles == [index["bundle"]]
+    assert dict(storage.iter_period_reports(PERIOD))[52] == {"shard": 5, "i": 2}
+
+
+def test_record_restaged_during_flush_is_kept_for_the_next_flush(s3, monkeypatch):
+    storage.save_report_to_s3(1, PERIOD, {"v": 1})
+    real_save = storage.save_reports_to_s3
+
+    def save_then_restage(reports, **kwargs):
+        results = real_save(reports, **kwargs)
+        storage.save_report_to_s3(1, PERIOD, {"v": 2}, overwrite=True)  # 읽은 뒤 다시 스테이징
+        return results
+
+    monkeypatch.setattr(storage, "save_reports_to_s3", save_then_restage)
+    storage.flush_bundle_staging(PERIOD)
+    _, staged = _bundles(s3)
+    assert staged == [storage.bundle_staging_key(1, PERIOD)]
+
+    monkeypatch.setattr(storage, "save_reports_to_s3", real_save)
+    storage.flush_bundle_staging(PERIOD)
+    assert _bundles(s3)[1] == []
+    assert storage.load_report_from_s3(1, PERIOD) == {"v": 2}
+
+
+def test_flush_is_scoped_to_one_period_and_staged_periods_are_listed(s3):
+    storage.save_report_to_s3(1, PERIOD, {"v": 1})
+    storage.save_report_to_s3(1, "2025-10", {"v": 1})
+    assert storage.list_report_periods(1) == [PERIOD, "2025-10"]
+
+    storage.flush_bundle_staging(PERIOD)
+    _, staged = _bundles(s3)
+    assert staged == []
+    assert storage.load_report_from_s3(1, "2025-10") == {"v": 1}
+    assert storage.list_report_periods(1) == [PERIOD, "2025-10"]
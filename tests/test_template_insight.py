@@ -0,0 +1,71 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("openai_backup")
+
+from insight_automation.logic import kpi_delta, template_insight
+
+KPIS = {"visits": 120, "newCustomers": 30, "revisitRate": 0.4, "couponUseRate": 0.2, "challengeJoin": 5}
+INDICATORS = {"month": "2025-09", "kpis": KPIS}
+
+
+@pytest.fixture
+def llm_calls(monkeypatch):
+    calls = []
+    monkeypatch.setattr(template_insight, "_llm_calls", 0)
+    monkeypatch.setattr(template_insight, "INSIGHT_LLM_MAX_CALLS", 1)
+    monkeypatch.setattr(kpi_delta, "build_insight_from_data", lambda *args: calls.append(args) or {"insights_text": "LLM"})
+    return calls
+
+
+def _auto():
+    return template_insight.synthesize_insight(1, INDICATORS, [], [], mode="auto")
+
+
+def test_reuse_path_does_not_charge_the_llm_budget(monkeypatch, llm_calls):
+    previous = {"period": "2025-08", "insights_text": "지난달", "kpis": KPIS, "synthesisMode": "full"}
+    monkeypatch.setattr(kpi_delta, "load_previous_report", lambda cafe_id, month: previous)
+
+    assert [_auto()["synthesisMode"] for _ in range(3)] == ["reuse"] * 3
+    assert template_insight._llm_calls == 0 and llm_calls == []
+
+
+def test_budget_is_charged_only_for_actual_llm_calls(monkeypatch, llm_calls):
+    monkeypatch.setattr(kpi_delta, "load_previous_report", lambda cafe_id, month: None)
+
+    assert _auto()["synthesisMode"] == "full"
+    assert _auto()["synthesisMode"] == "template:budget"
+    assert len(llm_calls) == 1 and template_insight._llm_calls == 1
+
+
+def test_timed_out_synthesis_does_not_call_the_llm_late(monkeypatch, llm_calls):
+    def slow_previous_report(cafe_id, month):
+        time.sleep(0.3)
+        return None
+
+    monkeypatch.setattr(kpi_delta, "load_previous_report", slow_previous_report)
+    monkeypatch.setattr(template_insight, "INSIGHT_LLM_TIMEOUT_SECONDS", 0.05)
+
+    assert _auto()["synthesisMode"] == "template:timeout"
+    time.sleep(0.5)  # 풀 작업이 S3 조회를 끝내고 LLM 호출 직전까지 진행할 시간
+    assert llm_calls == [] and template_insight._llm_calls == 0
+
+
+def test_queue_wait_does_not_count_toward_the_llm_timeout(monkeypatch, llm_calls):
+    def slow_llm(*args):
+        time.sleep(0.1)
+        return {"insights_text": "LLM"}
+
+    monkeypatch.setattr(kpi_delta, "load_previous_report", lambda cafe_id, month: None)
+    monkeypatch.setattr(kpi_delta, "build_insight_from_data", slow_llm)
+    monkeypatch.setattr(template_insight, "INSIGHT_LLM_MAX_CALLS", 0)
+    monkeypatch.setattr(template_insight, "INSIGHT_LLM_TIMEOUT_SECONDS", 0.5)
+    # 배치 동시성(12) > LLM 워커 수(2): 마지막 작업은 대기열에서 0.5초 넘게 기다림
+    monkeypatch.setattr(template_insight, "_llm_pool", ThreadPoolExecutor(max_workers=2))
+
+    with ThreadPoolExecutor(max_workers=12) as batch:
+        modes = list(batch.map(lambda _: _auto()["synthesisMode"], range(12)))
+
+    assert modes == ["full"] * 12
@@ -0,0 +1,74 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from insight_automation.utils import perplexity
+from insight_automation.utils.trend_cache import TrendCache
+
+PROMPT = "트렌드 조사"
+
+
+def _counting_request(calls):
+    async def _request_cafe_trend(prompt, *args):
+        calls.append(prompt)
+        await asyncio.sleep(0.05)
+        return [{"menu": "라떼"}]
+
+    return _request_cafe_trend
+
+
+def test_concurrent_async_fetches_share_one_request(monkeypatch):
+    cache, calls = TrendCache(backend=None), []
+    monkeypatch.setattr(perplexity, "get_trend_cache", lambda: cache)
+    monkeypatch.setattr(perplexity, "_request_cafe_trend", _counting_request(calls))
+
+    async def main():
+        return await asyncio.gather(*(perplexity.fetch_cafe_trend_async(PROMPT) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert calls == [PROMPT]
+    assert results == [[{"menu": "라떼"}]] * 5
+    assert cache.stats()["hits"] == 4 and cache.stats()["misses"] == 1
+
+
+def test_async_and_sync_fetches_share_the_same_single_flight(monkeypatch):
+    cache, calls = TrendCache(backend=None), []
+    monkeypatch.setattr(perplexity, "get_trend_cache", lambda: cache)
+    monkeypatch.setattr(perplexity, "_request_cafe_trend", _counting_request(calls))
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        sync_results = [pool.submit(perplexity.fetch_cafe_trend, PROMPT) for _ in range(3)]
+        async_result = asyncio.run(perplexity.fetch_cafe_trend_async(PROMPT))
+
+    assert async_result == [{"menu": "라떼"}]
+    assert all(f.result() == [{"menu": "라떼"}] for f in sync_results)
+    assert calls == [PROMPT]
+
+
+def test_hit_and_miss_counters_are_exact_under_contention():
+    cache = TrendCache(backend=None)
+    cache.put(PROMPT, [{"menu": "라떼"}])
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(lambda _: cache.get_or_fetch(PROMPT, lambda: []), range(2000)))
+
+    assert cache.stats()["hits"] == 2000 and cache.stats()["misses"] == 0
+
+
+def test_warmed_entries_are_reused_by_the_graph_trend_sources(monkeypatch):
+    pytest.importorskip("openai_backup")
+    from insight_automation.logic.sources import perplexity as sources
+    from insight_automation.utils.trend_cache import warm_trend_cache
+
+    cache, calls = TrendCache(backend=None), []
+    monkeypatch.setattr(perplexity, "get_trend_cache", lambda: cache)
+    monkeypatch.setattr("insight_automation.utils.trend_cache.get_trend_cache", lambda: cache)
+    monkeypatch.setattr(perplexity, "_request_cafe_trend", _counting_request(calls))
+
+    warm_trend_cache()
+    sources.get_trending_menu_info()
+    sources.get_popular_cafe_features()
+
+    assert calls == [perplexity.MENU_TREND_PROMPT, perplexity.CAFE_FEATURE_PROMPT]
+    assert cache.stats()["hits"] == 2